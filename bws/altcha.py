@@ -1,18 +1,234 @@
 # ALTCHA server endpoint:
 # GET /altcha - use this endpoint as the challenge attribute for the widget
+from collections import deque
 import datetime
 import logging
+import threading
+import time
 
-from altcha import create_challenge
+from altcha import Payload, VerifySolutionResult, create_challenge, verify_solution
 from django.conf import settings
+from django.core.cache import cache as default_cache
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from drf_spectacular.utils import extend_schema
+
+import bws.metrics as metrics
+from bws.schema import extend_schema
 
 
 logger = logging.getLogger(__name__)
 
 
+def get_challenge_settings():
+    ''' Settings used to create a challenge, a pooled challenge is only issued if they are unchanged. '''
+    return (settings.ALTCHA_ALGORITHM, settings.ALTCHA_COST, settings.ALTCHA_EXPIRY_SECONDS,
+            settings.ALTCHA_HMAC_KEY)
+
+
+def new_challenge(challenge_settings=None):
+    """
+    Create a new signed challenge.
+    @keyword challenge_settings: algorithm, cost, expiry and HMAC key, see L{get_challenge_settings}
+    @return: challenge dictionary
+    """
+    algorithm, cost, expiry, hmac_key = challenge_settings or get_challenge_settings()
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expiry)
+    challenge = create_challenge(algorithm=algorithm, cost=cost, expires_at=expires_at, hmac_secret=hmac_key)
+    return challenge.to_dict()
+
+
+class ChallengePool(object):
+    """
+    Bounded pool of pre-generated signed challenges, refilled by a background thread, so that a
+    burst of widget loads does not create the challenges in the request workers. Each challenge
+    is issued once. Challenges older than max_age are discarded, so that an issued challenge
+    has at least ALTCHA_EXPIRY_SECONDS - max_age left to be solved in, as are challenges
+    created with settings that have since changed.
+    """
+    METRICS = ["altcha_pool_hit", "altcha_pool_miss", "altcha_pool_generated", "altcha_pool_discarded"]
+
+    def __init__(self, size, max_age, creator=new_challenge, timer=time.time):
+        """
+        @param size: maximum number of challenges in the pool
+        @param max_age: maximum age in seconds of a challenge issued from the pool
+        @keyword creator: function to create a challenge from the challenge settings
+        @keyword timer: clock function
+        """
+        self.size = size
+        self.max_age = max_age
+        self.creator = creator
+        self.timer = timer
+        self._challenges = deque()      # (creation time, settings, challenge), oldest first
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._generated = 0
+        self._generate_time = 0.0
+
+    def pop(self):
+        """
+        Get a challenge from the pool.
+        @return: challenge dictionary, or None if the pool has no valid challenge
+        """
+        current = get_challenge_settings()
+        oldest = self.timer() - self.max_age
+        discarded = 0
+        challenge = None
+        with self._lock:
+            while self._challenges:
+                created, challenge_settings, c = self._challenges.popleft()
+                if created >= oldest and challenge_settings == current:
+                    challenge = c
+                    break
+                discarded += 1
+            if len(self._challenges) < self.size // 2:
+                self._wake.set()
+        if discarded:
+            metrics.incr("altcha_pool_discarded", discarded)
+        metrics.incr("altcha_pool_miss" if challenge is None else "altcha_pool_hit")
+        return challenge
+
+    def fill(self):
+        """
+        Discard the old challenges and generate new ones until the pool is full.
+        @return: number of challenges generated
+        """
+        challenge_settings = get_challenge_settings()
+        oldest = self.timer() - self.max_age
+        with self._lock:
+            n = len(self._challenges)
+            while self._challenges and (self._challenges[0][0] < oldest or
+                                        self._challenges[0][1] != challenge_settings):
+                self._challenges.popleft()
+            discarded = n - len(self._challenges)
+            needed = self.size - len(self._challenges)
+        start = time.perf_counter()
+        challenges = [(self.timer(), challenge_settings, self.creator(challenge_settings)) for _i in range(needed)]
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._challenges.extend(challenges[:self.size - len(self._challenges)])
+            self._generated += len(challenges)
+            self._generate_time += elapsed
+        if discarded:
+            metrics.incr("altcha_pool_discarded", discarded)
+        if challenges:
+            metrics.incr("altcha_pool_generated", len(challenges))
+        return len(challenges)
+
+    def start(self):
+        ''' Start the refill thread if it is not running. '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="altcha-pool", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.fill():
+                    self.log_stats()
+            except Exception as e:
+                logger.error("Failed to fill the ALTCHA challenge pool: %s", e)
+            # refill when half the pool has been used, or to replace challenges as they age
+            self._wake.wait(timeout=max(self.max_age / 4, 1))
+            self._wake.clear()
+
+    def stats(self):
+        """
+        Get the pool depth and the challenge generation rate of this process.
+        @return: dictionary of the depth, number generated and the challenges generated per
+        second of generation time
+        """
+        with self._lock:
+            return {
+                "depth": len(self._challenges),
+                "generated": self._generated,
+                "rate": (self._generated / self._generate_time) if self._generate_time > 0 else None
+            }
+
+    def log_stats(self):
+        ''' Log the pool depth and generation rate of this process, when the pool is refilled. '''
+        stats = self.stats()
+        rate = f"{stats['rate']:.0f}/s" if stats['rate'] is not None else "-"
+        logger.info(f"ALTCHA challenge pool: depth={stats['depth']}; generated={stats['generated']}; rate={rate}")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    ''' Get the challenge pool of this process, None if ALTCHA_POOL_SIZE is 0. '''
+    global _pool
+    size = getattr(settings, 'ALTCHA_POOL_SIZE', 0)
+    if not size:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ChallengePool(size, settings.ALTCHA_POOL_MAX_AGE)
+    _pool.start()       # e.g. not running in a forked worker
+    return _pool
+
+
+class SpentChallenges(object):
+    """
+    Store of the challenges whose solutions have been accepted, so that a solved challenge can
+    not be replayed until it expires. Each spent challenge is a key in the Django cache, added
+    atomically with cache.add and kept only until the challenge expires, so a check is a single
+    cache operation and the memory used is bounded by the number of challenges solved within
+    ALTCHA_EXPIRY_SECONDS. Only challenges with a verified signature and solution are stored.
+    """
+    key_prefix = "altcha_spent:"
+    digest_length = 32      # hex characters of the challenge signature used in the key
+
+    def __init__(self, cache=default_cache, timer=time.time):
+        """
+        @keyword cache: Django cache
+        @keyword timer: clock function
+        """
+        self.cache = cache
+        self.timer = timer
+
+    def spend(self, challenge):
+        """
+        Mark a challenge as spent.
+        @param challenge: altcha Challenge
+        @return: True if the challenge had not already been spent
+        """
+        expires_at = challenge.parameters.expires_at
+        ttl = (expires_at - self.timer()) if expires_at else settings.ALTCHA_EXPIRY_SECONDS
+        key = self.key_prefix + challenge.signature[:self.digest_length]
+        return self.cache.add(key, 1, timeout=max(int(ttl), 0) + 1)
+
+
+spent_challenges = SpentChallenges()
+
+
+def verify_payload(payload, hmac_secret=None, store=spent_challenges):
+    """
+    Verify the ALTCHA payload posted with a form and spend its challenge, so that the same
+    solution is not accepted again (see AltchaFormMixin).
+    @param payload: base64 encoded payload or altcha Payload
+    @keyword hmac_secret: HMAC key the challenge was signed with, defaults to ALTCHA_HMAC_KEY
+    @keyword store: store of the spent challenges
+    @return: altcha VerifySolutionResult, not verified if the challenge has already been spent
+    """
+    if isinstance(payload, str):
+        try:
+            payload = Payload.from_base64(payload)
+        except (ValueError, KeyError, TypeError):
+            return VerifySolutionResult(expired=False, invalid_signature=None, invalid_solution=None,
+                                        time=0, verified=False, error="Invalid altcha payload")
+    result = verify_solution(payload, hmac_secret or settings.ALTCHA_HMAC_KEY)
+    if result.verified and not store.spend(payload.challenge):
+        metrics.incr("altcha_replayed")
+        result.verified = False
+        result.error = "Challenge has already been used"
+    return result
+
+
 class ChallengeView(APIView):
 
     @extend_schema(exclude=True)    # exclude from the swagger docs
@@ -21,17 +237,15 @@ class ChallengeView(APIView):
         Fetches a new random proof-of-work (v2) challenge to be used by the ALTCHA widget.
         The challenge is signed with the shared HMAC key so that the solution posted back
         with a form can be verified as one this site issued (see AltchaFormMixin).
+        The challenge is taken from the pool of pre-generated challenges if it is enabled
+        (ALTCHA_POOL_SIZE) and has one, otherwise it is created for the request.
         '''
         try:
-            expires_at = (datetime.datetime.now(datetime.timezone.utc) +
-                          datetime.timedelta(seconds=settings.ALTCHA_EXPIRY_SECONDS))
-            challenge = create_challenge(
-                algorithm=settings.ALTCHA_ALGORITHM,
-                cost=settings.ALTCHA_COST,
-                expires_at=expires_at,
-                hmac_secret=settings.ALTCHA_HMAC_KEY,
-            )
-            return Response(challenge.to_dict())
+            pool = get_pool()
+            challenge = pool.pop() if pool is not None else None
+            if challenge is None:
+                challenge = new_challenge()
+            return Response(challenge)
         except Exception as e:
             logger.error("Failed to create ALTCHA challenge: %s", e)
             return Response({"error": f"Failed to create challenge: {str(e)}"}, status=500)
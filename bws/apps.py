@@ -0,0 +1,43 @@
+"""
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import importlib.util
+import os
+import sys
+
+from django.apps import AppConfig
+from django.conf import settings
+
+
+def is_management_command(argv=None):
+    """
+    Check if the process is running a management command, other than the development server,
+    e.g. ./manage.py migrate or python -m django shell.
+    @keyword argv: command line arguments, defaults to sys.argv
+    @return: True if running a management command
+    """
+    argv = sys.argv if argv is None else argv
+    if not argv:
+        return False
+    prog = argv[0]
+    is_manage = (os.path.basename(prog) in ('manage.py', 'django-admin', 'django-admin.py') or
+                 prog.endswith(os.path.join('django', '__main__.py')))
+    return is_manage and argv[1:2] != ['runserver']
+
+
+class BwsConfig(AppConfig):
+    name = 'bws'
+    verbose_name = 'CanRisk web-services'
+
+    def ready(self):
+        from bws.authentication import connect_signals
+        connect_signals()
+
+        # parse the PRS reference files once at start up of the web-services, if vcf2prs is installed
+        if (getattr(settings, 'PRS_MODEL_CACHE_WARM', False) and not is_management_command() and
+                importlib.util.find_spec('vcf2prs') is not None):
+            from bws.prs_cache import prs_models
+            from bws.settings import BC_MODEL, OC_MODEL, PC_MODEL
+            prs_models.warm([BC_MODEL, OC_MODEL, PC_MODEL])
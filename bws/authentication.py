@@ -0,0 +1,189 @@
+"""
+Authentication with an optional cache of verified API credentials and of user permissions, for
+API clients making many requests. Basic authentication otherwise runs the password hasher and
+token authentication queries the database for every request, and the permission checks can
+query the permission tables.
+
+Caching is enabled by setting AUTH_CACHE_TIMEOUT to the number of seconds to keep the entries.
+Credentials are cached under a HMAC of the credentials rather than the credentials themselves.
+Entries are invalidated with a generation number for each user, incremented when the user, its
+groups or permissions or its token are changed, and a global generation incremented when the
+permissions of a group are changed.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import hashlib
+import hmac
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+
+KEY_PREFIX = "bws_auth:"
+GLOBAL_GENERATION = KEY_PREFIX + "gen"
+
+
+def get_timeout():
+    ''' Seconds to cache credentials and permissions for, None if caching is not enabled. '''
+    return getattr(settings, 'AUTH_CACHE_TIMEOUT', None)
+
+
+def _generation_key(user_pk):
+    return f"{KEY_PREFIX}gen:{user_pk}"
+
+
+def _get_generations(user_pk):
+    ''' Get the global and user generation numbers. '''
+    keys = [GLOBAL_GENERATION, _generation_key(user_pk)]
+    values = cache.get_many(keys)
+    return tuple(values.get(k, 0) for k in keys)
+
+
+def invalidate(user_pk=None):
+    """
+    Invalidate the cached credentials and permissions of a user.
+    @keyword user_pk: user primary key, or None for all users
+    """
+    key = GLOBAL_GENERATION if user_pk is None else _generation_key(user_pk)
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except ValueError:          # expired between add and incr
+        cache.add(key, 1, timeout=None)
+
+
+def credential_key(kind, *credentials):
+    """
+    Get the cache key of a set of credentials.
+    @param kind: type of credentials, e.g. 'basic'
+    @param credentials: credentials, e.g. the user name and password
+    @return: cache key
+    """
+    digest = hmac.new(settings.SECRET_KEY.encode('utf-8'), "\0".join(credentials).encode('utf-8'),
+                      hashlib.sha256).hexdigest()
+    return f"{KEY_PREFIX}{kind}:{digest}"
+
+
+def get_cached(key):
+    """
+    Get the cached result of authenticating credentials.
+    @param key: credential cache key
+    @return: tuple of the user and the authentication, or None if not cached or invalidated
+    """
+    if get_timeout() is None:
+        return None
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    generations, user, auth = entry
+    if generations != _get_generations(user.pk) or not user.is_active:
+        return None
+    return user, auth
+
+
+def set_cached(key, user, auth=None):
+    """
+    Cache the result of authenticating credentials.
+    @param key: credential cache key
+    @param user: authenticated user
+    @keyword auth: authentication, e.g. the token
+    """
+    timeout = get_timeout()
+    if timeout is not None:
+        cache.set(key, (_get_generations(user.pk), user, auth), timeout=timeout)
+
+
+def has_any_perm(user, perms):
+    """
+    Check if a user has any of the permissions, using a cached set of the user's permissions.
+    @param user: user
+    @param perms: list of permission names, e.g. 'boadicea_auth.can_risk'
+    @return: True if the user has one of the permissions
+    """
+    timeout = get_timeout()
+    if timeout is None or not user.is_active or user.is_superuser:
+        return any(user.has_perm(perm) for perm in perms)
+    key = f"{KEY_PREFIX}perms:{user.pk}"
+    generations = _get_generations(user.pk)
+    entry = cache.get(key)
+    if entry is None or entry[0] != generations:
+        entry = (generations, frozenset(user.get_all_permissions()))
+        cache.set(key, entry, timeout=timeout)
+    return any(perm in entry[1] for perm in perms)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """ HTTP basic authentication, caching the verified user name and password if enabled. """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = credential_key('basic', userid, password)
+        cached = get_cached(key)
+        if cached is not None:
+            return cached
+        user, auth = super().authenticate_credentials(userid, password, request)
+        set_cached(key, user, auth)
+        return (user, auth)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ Token authentication, caching the verified token if enabled. """
+
+    def authenticate_credentials(self, key):
+        ckey = credential_key('token', key)
+        cached = get_cached(ckey)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        set_cached(ckey, user, token)
+        return (user, token)
+
+
+def _user_changed(sender, instance, **kwargs):
+    invalidate(instance.pk)
+
+
+def _token_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+def _user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    ''' Permissions or groups of a user changed. '''
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate(instance.pk)
+    elif pk_set:
+        for pk in pk_set:
+            invalidate(pk)
+    else:
+        invalidate()
+
+
+def _group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate()
+
+
+def connect_signals():
+    ''' Connect the signals that invalidate cached credentials and permissions, see BwsConfig.ready. '''
+    User = get_user_model()
+    post_save.connect(_user_changed, sender=User, dispatch_uid='bws_auth_user_saved')
+    post_delete.connect(_user_changed, sender=User, dispatch_uid='bws_auth_user_deleted')
+    if hasattr(User, 'user_permissions'):
+        m2m_changed.connect(_user_m2m_changed, sender=User.user_permissions.through,
+                            dispatch_uid='bws_auth_user_permissions')
+    if hasattr(User, 'groups'):
+        m2m_changed.connect(_user_m2m_changed, sender=User.groups.through, dispatch_uid='bws_auth_user_groups')
+    m2m_changed.connect(_group_permissions_changed, sender=Group.permissions.through,
+                        dispatch_uid='bws_auth_group_permissions')
+    if apps.is_installed('rest_framework.authtoken'):
+        from rest_framework.authtoken.models import Token
+        post_save.connect(_token_changed, sender=Token, dispatch_uid='bws_auth_token_saved')
+        post_delete.connect(_token_changed, sender=Token, dispatch_uid='bws_auth_token_deleted')
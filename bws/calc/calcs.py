@@ -8,7 +8,6 @@ SPDX-License-Identifier: GPL-3.0-or-later
 """
 
 from bws.exceptions import TimeOutException, ModelError
-from collections import OrderedDict
 from django.conf import settings
 from django.http.request import HttpRequest
 from rest_framework.exceptions import ValidationError
@@ -20,7 +19,9 @@ import bws.consts as consts
 import resource
 import tempfile
 import time
+import bws.calc.model_files as model_files
 from bws.calc.model import ModelParams, ModelOpts
+from bws.calc.results import CarrierProbabilities, RiskCurve
 from bws.calc.risks import Risk, RemainingLifetimeBaselineRisk, RiskBaseline
 from bws.pedigree import Pedigree
 
@@ -28,25 +29,48 @@ from bws.pedigree import Pedigree
 logger = logging.getLogger(__name__)
 
 
+class CostMeter():
+    """
+    Estimated CPU-seconds of the model runs of a request, see L{ModelOpts.get_cost}. The cost
+    of a run is added before it is run, so runs that fail or time out are included.
+    """
+
+    def __init__(self):
+        self.cost = 0
+
+    def add(self, cost):
+        self.cost += cost
+
+
 class Predictions():
+    cost = 0            # estimated CPU-seconds of the model runs, see ModelOpts.get_cost
+    cost_meter = None   # CostMeter of the request the cost is also added to
 
-    def __init__(self, pedi, model_params=ModelParams(),
-                 risk_factor_code=0, hgt=-1, mdensity=None, prs=None, cwd=None, request=Request(HttpRequest()),
-                 run_risks=True, model_settings=settings.BC_MODEL, calcs=None):
+    def __init__(self, pedi, model_params=None,
+                 risk_factor_code=0, hgt=-1, mdensity=None, prs=None, cwd=None, request=None,
+                 run_risks=True, model_settings=None, calcs=None, cost_meter=None):
         """
         Run cancer risk and mutation probability prediction calculations.
         @param pedi: L{Pedigree} used in prediction calculations
-        @keyword model_params: L{ModelParams}, model parameters
+        @keyword model_params: L{ModelParams}, model parameters, default ModelParams()
         @keyword risk_factor_code: risk factor code
         @keyword hgt: height
         @keyword mdensity: mammographic density  
         @keyword prs: polygenic risk alpha & beta values calculated from VCF file
         @keyword cwd: working directory
-        @keyword request: HTTP request
+        @keyword request: HTTP request, default an anonymous request
         @keyword run_risks: run risk calculations, default True
-        @keyword model_settings: cancer model settings
+        @keyword model_settings: cancer model settings, default settings.BC_MODEL
         @keyword calcs: list of calculations to run, e.g. ['carrier_probs', 'remaining_lifetime']
+        @keyword cost_meter: L{CostMeter} the cost of each model run is added to before it is run
         """
+        # defaults are built here rather than when the module is imported
+        if model_params is None:
+            model_params = ModelParams()
+        if request is None:
+            request = Request(HttpRequest())
+        if model_settings is None:
+            model_settings = settings.BC_MODEL
         assert isinstance(pedi, Pedigree), "%r is not a Pedigree" % pedi
         assert isinstance(model_params, ModelParams), "%r is not a ModelParams" % model_params
         self.pedi = pedi
@@ -59,6 +83,7 @@ class Predictions():
         self.prs = prs
         self.model_settings = model_settings
         self.calcs = self.model_settings['CALCS'] if calcs is None else calcs
+        self.cost_meter = cost_meter
 
         for c in self.calcs:
             if c not in settings.ALLOWED_CALCS:     # check calculations are in the allowed list
@@ -84,21 +109,25 @@ class Predictions():
         @return: list of risks for each age
         """
         p = risk.get_pedigree()
+        cost = model_opts.get_cost(len(p.people))
+        self.cost += cost
+        if self.cost_meter is not None:
+            self.cost_meter.add(cost)
         pf = p.write_pedigree_file(risk_factor_code=risk.get_risk_factor_code(),
                                    hgt=risk.get_hgt(),
                                    mdensity=risk.get_md(),
                                    prs=risk.get_prs(),
                                    filepath=os.path.join(self.cwd, risk.type()+"_risk.ped"),
                                    model_settings=self.model_settings)
-        bf = p.write_batch_file(pf,
-                                filepath=os.path.join(self.cwd, risk.type()+"_risk.bat"),
-                                model_settings=self.model_settings,
-                                calc_ages=risk.risk_age)
-        paramf = p.write_param_file(filepath=os.path.join(self.cwd, risk.type()+"_risk.params"),
-                                    model_settings=self.model_settings,
-                                    mutation_freq=risk.get_mutation_frequency(),
-                                    isashk=self.model_params.isashk,
-                                    sensitivity=self.model_params.mutation_sensitivity)
+        bf = model_files.get_batch_file(p, pf,
+                                        filepath=os.path.join(self.cwd, risk.type()+"_risk.bat"),
+                                        model_settings=self.model_settings,
+                                        calc_ages=risk.risk_age)
+        paramf = model_files.get_param_file(p, filepath=os.path.join(self.cwd, risk.type()+"_risk.params"),
+                                            model_settings=self.model_settings,
+                                            mutation_freq=risk.get_mutation_frequency(),
+                                            isashk=self.model_params.isashk,
+                                            sensitivity=self.model_params.mutation_sensitivity)
         risks = Predictions.run(self.request, bf,
                                 model_opts=model_opts,
                                 model_params=self.model_params,
@@ -153,6 +182,7 @@ class Predictions():
             f"{name} CALCULATIONS: user={self.request.user.id}; "
             f"elapsed time={time.time() - start}; "
             f"pedigree size={len(self.pedi.people)}; "
+            f"estimated cost={self.cost:.2f}s; "
             f"version={getattr(self, 'version', 'N/A')}")
 
     def _parse_risks_output(self, risks, model_opts):
@@ -165,15 +195,9 @@ class Predictions():
                  ry, 10-yr cancer risk calculation (proband's age set at 40y, censor age set at 50y)
                  rj, 10-yr cancer risk calculation (NHS protocol for young women at high risk)
                  mp, mutation carrier probabilities
+                 as L{RiskCurve} and L{CarrierProbabilities}, or None if not calculated
         """
         lines = risks.split(sep="\n")
-        rr_arr = [] if model_opts.rr else None      # remaining lifetime risk
-        rl_arr = [] if model_opts.rl else None      # lifetime risk
-        ry_arr = [] if model_opts.ry else None      # 10 yr risk (40-50y)
-        rj_arr = [] if model_opts.rj else None      # 10 yr risk (NHS protocol)
-
-        rr, rl, ry, rj, mp = False, False, False, False, False
-        mp_lines = ""
         model_settings = self.model_settings
 
         if model_settings['NAME'] == 'BC':
@@ -182,6 +206,15 @@ class Predictions():
             ctype = "ovarian"
         else:
             ctype = "prostate"
+        name = ctype+" cancer risk"
+
+        rr_arr = RiskCurve(name) if model_opts.rr else None      # remaining lifetime risk
+        rl_arr = RiskCurve(name) if model_opts.rl else None      # lifetime risk
+        ry_arr = RiskCurve(name) if model_opts.ry else None      # 10 yr risk (40-50y)
+        rj_arr = RiskCurve(name) if model_opts.rj else None      # 10 yr risk (NHS protocol)
+
+        rr, rl, ry, rj, mp = False, False, False, False, False
+        mp_lines = ""
 
         for _idx, line in enumerate(lines):
             if line.startswith('##'):
@@ -191,21 +224,16 @@ class Predictions():
 
             if rr or rl or ry or rj:
                 prts = line.split(sep=",")
-                plen = len(prts)
-                v = float(prts[plen-1])
-                od = OrderedDict([
-                        ("age", int(prts[plen-2])),
-                        (ctype+" cancer risk", {"decimal": v, "percent": round(v*100, 1)})
-                    ])
+                age, v = int(prts[-2]), float(prts[-1])
 
                 if rr:
-                    rr_arr.append(od)
+                    rr_arr.append(age, v)
                 elif rl:
-                    rl_arr.append(od)
+                    rl_arr.append(age, v)
                 elif ry and ry_arr is not None:
-                    ry_arr.append(od)
+                    ry_arr.append(age, v)
                 elif rj:
-                    rj_arr.append(od)
+                    rj_arr.append(age, v)
             elif mp:
                 mp_lines += line+"\n"
 
@@ -229,9 +257,9 @@ class Predictions():
         Parse computed mutation carrier probability results.
         @param probs: mutation probability text from fortran output
         @param model_settings: cancer model settings
-        @return: list of containing dictionaries of the mutaion probability results
+        @return: L{CarrierProbabilities}, a list of dictionaries of the mutation probability results
         """
-        probs_arr = []
+        probs_arr = CarrierProbabilities()
         gene_columns = []
 
         mname = str(model_settings.get('NAME', ""))
@@ -240,20 +268,15 @@ class Predictions():
                 gene_columns = line.strip().split(sep=",")
             elif not line.startswith('#'):
                 parts = line.strip().split(sep=",")
-                probs_arr.append({"no mutation": {"decimal": float(parts[0]),
-                                                  "percent": round(float(parts[0])*100, 2)}})
-                
+                probs_arr.append("no mutation", float(parts[0]))
+
                 if mname != 'PC':
                     for i, gene in enumerate(model_settings['GENES'], 1):   # 1-based loop
                         assert gene == gene_columns[i], "MUTATION CARRIER PROB - RESULTS COLUMN MISMATCH FOR: "+gene_columns[i]
-                        probs_arr.append({gene:
-                                          {"decimal": float(parts[i]),
-                                           "percent": round(float(parts[i])*100, 2)}})
+                        probs_arr.append(gene, float(parts[i]))
                 else:
                     for i, gene in enumerate(gene_columns[1:], 1):   # 1-based loop
-                        probs_arr.append({gene:
-                                          {"decimal": float(parts[i]),
-                                           "percent": round(float(parts[i])*100, 2)}})
+                        probs_arr.append(gene, float(parts[i]))
         return probs_arr
 
     @classmethod
@@ -277,12 +300,14 @@ class Predictions():
         return niceness
 
     @classmethod
-    def _get_version(cls, model=settings.BC_MODEL, cwd="/tmp"):
+    def _get_version(cls, model=None, cwd="/tmp"):
         """
         Get the model version.
         @keyword model_settings: cancer model settings
         @keyword cwd: working directory
         """
+        if model is None:
+            model = settings.BC_MODEL
         try:
             process = Popen(
                 [os.path.join(model['HOME'], model['EXE']), "-v"],
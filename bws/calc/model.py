@@ -43,6 +43,16 @@ class ModelOpts():
             cmd.extend(["-ry"])
         return cmd
 
+    def get_cost(self, npeople):
+        """
+        Estimate the CPU-seconds used by a model run with these options, see MODEL_RUN_COST.
+        @param npeople: number of people in the pedigree
+        @return: estimated CPU-seconds
+        """
+        cost = settings.MODEL_RUN_COST
+        ncalcs = sum([self.probs, self.rj, self.rl, self.rr, self.ry])
+        return cost['RUN'] + cost['PERSON_CALC'] * npeople * ncalcs
+
     @classmethod
     def factory(cls, calc):
         """
@@ -0,0 +1,141 @@
+"""
+Content-addressed store of fortran model parameter and batch files. Files are named by a
+hash of their contents, written once and then shared read-only by all calculations, as most
+requests use the default model parameters and risk ages.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+_stored = set()     # paths known to exist in the store
+
+
+def get_store_dir():
+    """
+    Get the model file store directory, None if the store is disabled.
+    @return: directory path
+    """
+    return getattr(settings, 'MODEL_FILE_STORE', None)
+
+
+def _is_private_dir(store_dir):
+    """
+    Create the store directory, if it does not exist, and check it is a directory (not a
+    symbolic link) owned by this user and not writable by other users, so that the files
+    in it can not be replaced by another user, e.g. when the store is in a shared /tmp.
+    @param store_dir: store directory
+    @return: True if the directory can be used for the store
+    """
+    os.makedirs(store_dir, mode=0o700, exist_ok=True)
+    st = os.lstat(store_dir)
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.geteuid() and not st.st_mode & 0o022
+
+
+def _is_own_file(path):
+    """
+    @param path: file path
+    @return: True if the path is a regular file owned by this user
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_uid == os.geteuid()
+
+
+def get_stored_file(content, suffix, store_dir=None):
+    """
+    Get the path of a read-only file in the store with the given contents, writing
+    it if it is not already in the store.
+    @param content: file contents
+    @param suffix: file name suffix, e.g. '.params'
+    @keyword store_dir: store directory, defaults to settings.MODEL_FILE_STORE
+    @return: file path or None if the file could not be stored
+    """
+    store_dir = get_store_dir() if store_dir is None else store_dir
+    if store_dir is None:
+        return None
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    path = os.path.join(store_dir, digest + suffix)
+    if path in _stored:
+        if _is_own_file(path):
+            return path
+        _stored.discard(path)       # e.g. removed by a tmp cleaner, so check and write it again
+
+    try:
+        if not _is_private_dir(store_dir):
+            logger.warning(f"model file store {store_dir} is not a directory private to this user")
+            return None
+    except OSError as e:
+        logger.warning(f"model file store {store_dir} not writable: {e}")
+        return None
+
+    if os.path.exists(path):
+        # check an existing file, e.g. written by another process, before trusting it
+        try:
+            with open(path, 'r') as f:
+                if f.read() != content:
+                    logger.warning(f"model file store {path} does not match its hash")
+                    return None
+        except OSError:
+            return None
+        _stored.add(path)
+        return path
+
+    try:
+        # write to a temporary file and rename so that a partly written file is never used
+        fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=store_dir)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"model file store {store_dir} not writable: {e}")
+        return None
+    _stored.add(path)
+    return path
+
+
+def get_param_file(pedigree, filepath, **kwargs):
+    """
+    Get a model parameters file from the store, falling back to writing it to filepath.
+    @param pedigree: L{Pedigree}
+    @param filepath: path to write the model parameters file to if it can not be stored
+    @param kwargs: model parameters passed to L{Pedigree.get_param_file_content}
+    @return: file path
+    """
+    content = pedigree.get_param_file_content(**kwargs)
+    path = get_stored_file(content, ".params")
+    if path is None:
+        with open(filepath, "w") as f:
+            f.write(content)
+        path = filepath
+    return path
+
+
+def get_batch_file(pedigree, pedigree_file_name, filepath, **kwargs):
+    """
+    Get a fortran batch file from the store, falling back to writing it to filepath. The
+    pedigree file name is written relative to the working directory of the calculation so
+    that the batch file only depends on the risk ages.
+    @param pedigree: L{Pedigree}
+    @param pedigree_file_name: path to fortran pedigree file in the working directory
+    @param filepath: path to write the batch file to if it can not be stored
+    @param kwargs: passed to L{Pedigree.get_batch_file_content}
+    @return: file path
+    """
+    content = pedigree.get_batch_file_content(os.path.basename(pedigree_file_name), **kwargs)
+    path = get_stored_file(content, ".bat")
+    if path is None:
+        return pedigree.write_batch_file(pedigree_file_name, filepath=filepath, **kwargs)
+    return path
@@ -0,0 +1,118 @@
+"""
+Columnar cancer risk and mutation carrier probability results, parsed from the model output
+into arrays rather than a dictionary for each age or gene. The results behave as the list of
+dictionaries used by the OutputSerializer, which is only built if it is used.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
+
+
+class ColumnarResult(Sequence, ABC):
+    """
+    Base class of the columnar results, a sequence of the legacy dictionary rows which
+    are built from the columns when they are first used.
+    """
+    __slots__ = ('_rows', )
+
+    @abstractmethod
+    def _build_rows(self):
+        ''' @return: list of the row dictionaries built from the columns '''
+
+    def _get_rows(self):
+        rows = self._rows
+        if rows is None or len(rows) != len(self):
+            rows = self._rows = self._build_rows()
+        return rows
+
+    def tolist(self):
+        ''' Legacy list of dictionaries, also used by the DRF JSON encoder. '''
+        return self._get_rows()
+
+    def __getitem__(self, idx):
+        return self._get_rows()[idx]
+
+    def __iter__(self):
+        return iter(self._get_rows())
+
+    def __eq__(self, other):
+        if isinstance(other, (list, ColumnarResult)):
+            return self._get_rows() == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._get_rows()!r})"
+
+
+class RiskCurve(ColumnarResult):
+    """
+    Cancer risks at a list of ages. As a sequence each row is
+    {"age": 50, "breast cancer risk": {"decimal": 0.01, "percent": 1.0}}.
+    """
+    __slots__ = ('name', 'ages', 'decimals')
+
+    def __init__(self, name):
+        """
+        @param name: risk name, e.g. "breast cancer risk"
+        """
+        self.name = name
+        self.ages = []
+        self.decimals = []
+        self._rows = None
+
+    def append(self, age, decimal):
+        """
+        Add the risk at an age.
+        @param age: age
+        @param decimal: risk
+        """
+        self.ages.append(age)
+        self.decimals.append(decimal)
+
+    def _build_rows(self):
+        name = self.name
+        return [OrderedDict([("age", a), (name, {"decimal": d, "percent": round(d*100, 1)})])
+                for a, d in zip(self.ages, self.decimals)]
+
+    def to_columns(self):
+        ''' Arrays of the ages and decimal risks, see L{bws.renderers.to_columns}. '''
+        return {"ages": self.ages, "decimal": {self.name: self.decimals}}
+
+    def __len__(self):
+        return len(self.ages)
+
+
+class CarrierProbabilities(ColumnarResult):
+    """
+    Pathogenic variant carrier probabilities. As a sequence each row is
+    {"BRCA1": {"decimal": 0.0012, "percent": 0.12}}.
+    """
+    __slots__ = ('genes', 'decimals')
+
+    def __init__(self):
+        self.genes = []
+        self.decimals = []
+        self._rows = None
+
+    def append(self, gene, decimal):
+        """
+        Add the carrier probability of a gene.
+        @param gene: gene name, or "no mutation"
+        @param decimal: probability
+        """
+        self.genes.append(gene)
+        self.decimals.append(decimal)
+
+    def _build_rows(self):
+        return [{g: {"decimal": d, "percent": round(d*100, 2)}} for g, d in zip(self.genes, self.decimals)]
+
+    def to_columns(self):
+        ''' Arrays of the genes and probabilities. '''
+        return {"genes": self.genes, "decimal": self.decimals}
+
+    def __len__(self):
+        return len(self.genes)
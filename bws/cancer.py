@@ -7,10 +7,28 @@ SPDX-License-Identifier: GPL-3.0-or-later
 """
 from collections import namedtuple
 import re
-import bws.consts as consts
 from django.conf import settings
-from django.utils.translation import gettext_lazy as _
-from bws.exceptions import GeneticTestError, PathologyError, CancerError
+from bws.exceptions import GeneticTestError, PathologyError, CancerError  # noqa: F401
+import bws.validation as validation
+
+
+def encode_field(val):
+    '''
+    Integer code a numeric pedigree field (e.g. age, year of birth or a 0/1 flag). Values that
+    are not canonical integer strings are kept as given so that validation can report them.
+    '''
+    if isinstance(val, int):
+        return val
+    try:
+        code = int(val)
+    except (TypeError, ValueError):
+        return val
+    return code if str(code) == val else val
+
+
+def decode_field(code):
+    ''' String view of a field coded with encode_field(). '''
+    return str(code) if isinstance(code, int) else code
 
 
 class Genes():
@@ -51,11 +69,29 @@ class PathologyTest(object):
     REGEX_PATHOLOGY_TEST_OPTION = re.compile("^([1-5])$")
     REGEX_PATHOLOGY_STATUS = re.compile("^[0NP]$")
 
+    RESULTS = ("0", "N", "P")          # results stored as an index into this tuple
+
+    __slots__ = ('test_type', 'description', '_result')
+
     def __init__(self, test_type, result="0", description="pathology test"):
         self.test_type = test_type
         self.description = description
         self.result = result
 
+    @property
+    def result(self):
+        r = self._result
+        return PathologyTest.RESULTS[r] if isinstance(r, int) else r
+
+    @result.setter
+    def result(self, result):
+        self._result = PathologyTest.RESULTS.index(result) if result in PathologyTest.RESULTS else result
+
+    def is_valid_result(self):
+        """ Pathology result is '0' for unknown, 'N' for negative or 'P' for positive. """
+        r = self._result
+        return isinstance(r, int) or PathologyTest.REGEX_PATHOLOGY_STATUS.match(r) is not None
+
     @classmethod
     def factory_default(cls):
         return PathologyTests(
@@ -96,86 +132,10 @@ class PathologyTest(object):
 
     @classmethod
     def validate(cls, person):
-        """ Validate pathology data. """
-        warnings = []
-        tests = person.pathology
-        for t in tests:
-            # Check that the pathology results are correctly set (0, N, P)
-            if not PathologyTest.REGEX_PATHOLOGY_STATUS.match(t.result):
-                raise PathologyError("Family member '" + person.pid + "' has been assigned an invalid " + t.test_type +
-                                     " status. It must be 'N' for negative, 'P' for positive, or '0' for unknown.",
-                                     person.famid)
-            # Check that pathology test results are only provided for family members with a first breast cancer
-            if t.result != '0' and person.cancers.diagnoses.bc1.age == '-1':
-                raise PathologyError("Family member '" + person.pid + "' has not developed breast cancer but has " +
-                                     "been assigned a breast cancer pathology test result (" + t.test_type + "). " +
-                                     "Pathology test results can only be assigned to family members who have " +
-                                     "developed breast cancer.", person.famid)
-
-        # if the individual has had breast cancer
-        if person.cancers.diagnoses.bc1.age != "-1":
-            rules = _("Please note the following rules for breast cancer pathology data: "
-                      "(1) if an individual's ER status is unspecified, no pathology information for that individual "
-                      "will be taken into account in the calculation; "
-                      "(2) if a breast cancer is ER positive, no other pathology information for that individual will "
-                      "be taken into account in the calculation; "
-                      "(3) if a breast cancer is ER negative, information on PR and HER2 are only employed jointly: "
-                      "i.e. either the cancer is triple negative (ER-/PR-/HER2-) or it's not (i.e. ER-/PR-/HER2+ or "
-                      "ER-/PR+/HER2- or ER-/PR+/HER2+), no other options are considered; and "
-                      "(4) an individual's CK14 and CK5/6 status will only be taken into account in the calculation "
-                      "if both CK14 and CK5/6 are specified and the breast cancer is triple negative (ER negative, PR "
-                      "negative and HER2 negative). ")
-
-            # If ER is unspecified but another pathology parameter has been specified,
-            # report that no pathology data will be used
-            if(tests.er.result == "0" and (tests.pr.result != "0" or tests.her2.result != "0" or
-                                           tests.ck14.result != "0" or tests.ck56.result != "0")):
-                warnings.append(
-                    _("Incomplete data record in the pedigree: family member \"%(id)s\" has an unspecified ER status, "
-                      "but another pathology parameter (PR, HER2, CK14 or CK5/6) has been specified. %(rules)s As a "
-                      "result, this individual's pathology information will not be taken into account in this case.")
-                    % {'id': person.pid, 'rules': rules})
-
-            # If ER negative and PR status is specified but HER2 status is unspecified (or vice versa) report a warning
-            if(tests.er.result == "N" and
-               (tests.pr.result != "0" and tests.her2.result == "0") or
-               (tests.pr.result == "0" and tests.her2.result != "0")):
-                warnings.append(
-                    _("Incomplete data record in the pedigree: family member \"%(id)s\" has a breast cancer "
-                      "pathology where PR status is specified but HER2 status is unspecified (or vice versa). %(rules)s"
-                      "As a result, PR and HER2 status will not be taken into account in this case.")
-                    % {'id': person.pid, 'rules': rules})
-
-            # If either CK14 or CK5/6 has been specified (one without the other) generate a warning
-            if((tests.ck14.result != "0" and tests.ck56.result == "0") or
-               (tests.ck14.result == "0" and tests.ck56.result != "0")):
-                warnings.append(
-                    _("Incomplete data record in the pedigree: family member \"%(id)s\" has a breast cancer "
-                      "pathology where only CK14 or CK5/6 status has been specified. %(rules)s As a result, CK14 and "
-                      "CK5/6 status will not be taken into account in this case.")
-                    % {'id': person.pid, 'rules': rules})
-
-            # If not Triple Negative but CK14 and CK5/6 are specified generate a warning
-            if((tests.er.result != "N" or tests.pr.result != "N" or tests.her2.result != "N") and
-               (tests.ck14.result != "0" and tests.ck56.result != "0")):
-                warnings.append(
-                    _("Incomplete data record in your pedigree: family member \"%(id)s\" has a breast cancer "
-                      "pathology where CK14 or CK5/6 status is specified but the breast cancer pathology is not triple "
-                      "negative (ER negative, PR negative and HER2 negative). %(rules)s As a result, CK14 and CK5/6 "
-                      "status will not be taken into account in this case.")
-                    % {'id': person.pid, 'rules': rules})
-
-            # If ER positive, and PR or HER2 or CK14 or CK5/6 specified generate a warning
-            if(tests.er.result == "P" and (tests.pr.result != "0" or tests.her2.result != "0" or
-                                           tests.ck14.result != "0" or tests.ck56.result != "0")):
-                warnings.append(
-                    _("Incomplete data record in your pedigree: family member \"%(id)s\" has a breast cancer pathology "
-                      "that is ER positive, where an additional pathology parameter (PR, HER2, CK14 or CK5/6) "
-                      "has been specified. %(rules)s As a result, only ER positive status will be taken into account "
-                      "in this case.")
-                    % {'id': person.pid, 'rules': rules})
-
-        return warnings
+        """ Validate pathology data.
+        @return: list of warnings
+        """
+        return validation.check(validation.PATHOLOGY_RULES, person)
 
 
 class GeneticTest(object):
@@ -188,6 +148,11 @@ class GeneticTest(object):
     REGEX_GENETIC_TEST_RESULT_HOXB13 = re.compile("^([0N])|(H((OM)|(ET)))$")
     REGEX_GENETIC_TEST_TYPE_IS_TESTED = re.compile("^[ST]$")
 
+    TYPES = ("0", "S", "T")                     # test types stored as an index into this tuple
+    RESULTS = ("0", "N", "P", "HET", "HOM")     # test results stored as an index into this tuple
+
+    __slots__ = ('_test_type', '_result', 'isHOXB13')
+
     def __init__(self, test_type="0", result="0", isHOXB13=False):
         """
         Genetic test.
@@ -200,36 +165,41 @@ class GeneticTest(object):
         self.result = result
         self.isHOXB13 = isHOXB13
 
+    @property
+    def test_type(self):
+        t = self._test_type
+        return GeneticTest.TYPES[t] if isinstance(t, int) else t
+
+    @test_type.setter
+    def test_type(self, test_type):
+        self._test_type = GeneticTest.TYPES.index(test_type) if test_type in GeneticTest.TYPES else test_type
+
+    @property
+    def result(self):
+        r = self._result
+        return GeneticTest.RESULTS[r] if isinstance(r, int) else r
+
+    @result.setter
+    def result(self, result):
+        self._result = GeneticTest.RESULTS.index(result) if result in GeneticTest.RESULTS else result
+
+    def is_valid_type(self):
+        """ Genetic test type is '0', 'S' or 'T', any type is allowed for HOXB13. """
+        t = self._test_type
+        return isinstance(t, int) or self.isHOXB13 or GeneticTest.REGEX_GENETIC_TEST_TYPE.match(t) is not None
+
+    def is_valid_result(self):
+        """ Genetic test result is '0', 'N' or 'P', or 'HET' or 'HOM' for HOXB13. """
+        r = self._result
+        if isinstance(r, int):
+            return r <= 2 or self.isHOXB13
+        return (GeneticTest.REGEX_GENETIC_TEST_RESULT.match(r) is not None or
+                (self.isHOXB13 and GeneticTest.REGEX_GENETIC_TEST_RESULT_HOXB13.match(r) is not None))
+
     @classmethod
     def validate(cls, person):
         """ Validate genetic test data. """
-        gtests = person.gtests
-        for t in gtests:
-            # Check that the genetic test type is valid
-            if not GeneticTest.REGEX_GENETIC_TEST_TYPE.match(t.test_type) and not t.isHOXB13:
-                raise GeneticTestError(_("Family member \"%(id)s\" has been assigned an invalid "
-                                         "genetic test type. It must be specified with '0' for untested, "
-                                         "'S' for mutation search or 'T' for direct gene test.")
-                                       % {'id': person.pid}, person.famid)
-            # Check that the mutation status is valid
-            if not GeneticTest.REGEX_GENETIC_TEST_RESULT.match(t.result):
-                if t.isHOXB13 and GeneticTest.REGEX_GENETIC_TEST_RESULT_HOXB13.match(t.result):
-                    pass
-                else:
-                    raise GeneticTestError(_("Family member \"%(id)s\" has been assigned an invalid "
-                                             "genetic test result. Genetic test results must be '0' for untested, "
-                                             "'N' for no mutation, 'P' mutation detected.")
-                                             % {'id': person.pid}, person.famid)
-            # If tested, check that there us a test result
-            if t.test_type != "0" and t.result == '0':
-                raise GeneticTestError(_("Family member \"%(id)s\" has had a genetic test but the "
-                                         "corresponding test result has not been specified.")
-                                       % {'id': person.pid}, person.famid)
-            # If there is a genetic test result check the test type is specified
-            if t.test_type == "0" and t.result != '0':
-                raise GeneticTestError(_("Family member \"%(id)s\" has been assigned a genetic test " +
-                                       "result, but the corresponding genetic test type has not been specified.")
-                                       % {'id': person.pid}, person.famid)
+        validation.check(validation.GENETIC_TEST_RULES, person)
 
     @classmethod
     def compareTestResults(cls, person1, person2):
@@ -330,28 +300,49 @@ class CanRiskGeneticTests(namedtuple('CanRiskGeneticTests',
 
 class Cancer(object):
     """
-    Basic object for cancer.
+    Basic object for cancer. The age at diagnosis is integer coded, with
+    'AU' (affected unknown age) stored as AFFECTED_UNKNOWN.
     """
+    AFFECTED_UNKNOWN = -2
+
+    __slots__ = ('_age',)
+
     def __init__(self, age="-1"):
         self.age = age
 
+    @property
+    def age(self):
+        return 'AU' if self._age == Cancer.AFFECTED_UNKNOWN else decode_field(self._age)
+
+    @age.setter
+    def age(self, age):
+        if age == 'AU':
+            self._age = Cancer.AFFECTED_UNKNOWN
+        else:
+            code = encode_field(age)
+            self._age = code if not isinstance(code, int) or code >= -1 else str(age)
+
+
+# cancer types stored for CanRisk and the named tuple used to hold their diagnoses
+CANCER_TYPES = ['bc1', 'bc2', 'oc', 'prc', 'pac']
+CancerDiagnoses = namedtuple('CancerDiagnoses', CANCER_TYPES)
+
 
 class Cancers():
     """
     Store diagnosis for each cancer and age of last follow up.
     """
+    __slots__ = ('diagnoses',)
 
     def __init__(self, **kwargs):
         """
         @keyword kwargs: list of Cancer objects
         """
-        cancer_types = Cancers.get_cancers()
-        for ctype in cancer_types:
+        for ctype in CANCER_TYPES:
             if ctype not in kwargs:
                 kwargs[ctype] = Cancer()
 
         # cancer diagnoses stored in named tuple
-        CancerDiagnoses = namedtuple('CancerDiagnoses', cancer_types)
         self.diagnoses = CancerDiagnoses(**kwargs)
 
     @classmethod
@@ -359,72 +350,7 @@ class Cancers():
         """
         Validate a person's cancer types and diagnoses ages.
         """
-        cancer_types = Cancers.get_cancers()
-        diagnoses = person.cancers.diagnoses
-        REGEX_AGE = consts.REGEX_AGE
-        for idx, ctype in enumerate(cancer_types):
-            diagnoses_age = diagnoses[idx].age
-            # Check that the age at cancer diagnosis is an unsigned integer or set to 'AU'
-            # and is within range i.e. 0-110 (-1 for unaffected)
-            if((not REGEX_AGE.match(diagnoses_age) and diagnoses_age != 'AU' and diagnoses_age != '-1') or
-               (REGEX_AGE.match(diagnoses_age) and int(diagnoses_age) > settings.MAX_AGE)):
-                    raise CancerError(_("Family member \"%(id)s\" has an age at cancer diagnosis (%(ctype)s) "
-                                        "specified as %(dage)s. Age at cancer diagnosis " +
-                                        "must be set to '0' for unaffected, 'AU' for affected at unknown age, or " +
-                                        "specified with an integer in the range 1-%(max_age)s.")
-                                      % {'id': person.pid, 'ctype': ctype, 'dage': diagnoses_age,
-                                         'max_age': settings.MAX_AGE}, person.famid)
-
-            # Check that the age at last follow up is greater or equal to that of all cancer diagnoses
-            if(diagnoses_age != 'AU' and diagnoses_age != '-1' and int(person.age) < int(diagnoses_age)):
-                raise CancerError(_("Family member \"%(id)s\" has been assigned an age at cancer " +
-                                    "diagnosis that exceeds age at last follow up. An age at cancer " +
-                                    "diagnosis must not exceed an age at last follow up.")
-                                  % {'id': person.pid}, person.famid)
-
-            # Check that males don't have an ovarian cancer diagnosis
-            if ctype == 'oc' and person.sex() == 'M' and diagnoses_age != '-1':
-                raise CancerError(_("Family member \"%(id)s\" is male but has been assigned an " +
-                                    "ovarian cancer diagnosis.")
-                                  % {'id': person.pid}, person.famid)
-
-            # Check that females don't have a prostate cancer diagnosis
-            if ctype == 'prc' and person.sex() == 'F' and diagnoses_age != '-1':
-                raise CancerError(_("Family member \"%(id)s\" is female but has been assigned an " +
-                                    "prostate cancer diagnosis.")
-                                  % {'id': person.pid}, person.famid)
-
-        # Check that individuals who have cancer have both a valid age at last follow up and year of birth
-        cancers = person.cancers
-        if cancers.is_cancer_diagnosed():
-            if person.yob == '0':
-                raise CancerError(_("Family member \"%(id)s\" has been diagnosed with cancer but " +
-                                    "has no year of birth specified. All family members with cancer must " +
-                                    "have a valid year of birth. If an affected family member's year of " +
-                                    "birth is unknown, it is always better to provide some estimate of " +
-                                    "it so that risks are not underestimated.")
-                                  % {'id': person.pid}, person.famid)
-
-        # Check that the age of a second breast cancer exceeds that of the first.
-        bc1 = getattr(cancers.diagnoses, "bc1", None)
-        bc2 = getattr(cancers.diagnoses, "bc2", None)
-        if bc1 is not None and bc2 is not None:
-            if(REGEX_AGE.match(bc2.age) and bc2.age != '-1'):
-                if bc1.age == '-1':
-                    raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
-                                        "but the age at diagnosis of the first breast cancer is missing.")
-                                      % {'id': person.pid}, person.famid)
-                elif(REGEX_AGE.match(bc1.age) and int(bc1.age) > int(bc2.age)):
-                    raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
-                                        "but the age at diagnosis of the first breast cancer exceeds that " +
-                                        "of the second breast cancer.")
-                                      % {'id': person.pid}, person.famid)
-
-            # Check that a 2BC set to affected unknown (AU) is accompanied by a 1BC
-            if(bc2.age == 'AU' and bc1.age == '-1'):
-                raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
-                                    "but the age at diagnosis of the first breast cancer is missing.")
-                                  % {'id': person.pid}, person.famid)
+        validation.check(validation.CANCER_RULES, person)
 
     def write(self, cancers=None, age=-1):
         """
@@ -441,11 +367,11 @@ class Cancers():
         """
         d = self.diagnoses
         for c in d:
-            if c.age != "-1":
+            if c._age != -1:
                 return True
         return False
 
     @classmethod
     def get_cancers(cls):
         """ Get a list of the cancer types stored for CanRisk. """
-        return ['bc1', 'bc2', 'oc', 'prc', 'pac']
+        return list(CANCER_TYPES)
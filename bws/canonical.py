@@ -0,0 +1,142 @@
+"""
+Canonical form of a pedigree and a stable digest of it, so that logically identical pedigrees
+(e.g. re-submissions with different names, IndivIDs, row order or whitespace) compare equal.
+
+Names, family and individual identifiers are dropped. Family members are relabelled by their
+position in the pedigree structure, found by iteratively refining a label from their own data
+and the labels of their parents, children and MZ twin until the labels no longer change. Risk
+factors and PRS from the CanRisk header are taken from their parsed and encoded values.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections import defaultdict
+import hashlib
+import json
+
+
+NO_PARENT = -1          # founder
+MISSING_PARENT = -2     # parent not found in the pedigree
+
+
+def _number(val):
+    ''' Normalise a numeric field, e.g. an age of '045' to '45'. '''
+    return str(int(val)) if val.isdigit() else val
+
+
+def get_person_data(person):
+    """
+    Get a person's data without their name or identifiers.
+    @param person: family member
+    @return: tuple of normalised data items
+    """
+    cancers = tuple(c.age if c.age in ('AU', '-1') else _number(c.age) for c in person.cancers.diagnoses)
+    gtests = tuple((gene, t.test_type, t.result) for gene, t in zip(person.gtests._fields, person.gtests)
+                   if t.test_type != '0' or t.result != '0')
+    pathology = tuple(t.result for t in person.pathology)
+    return (person.sex(), _number(person.target), _number(person.dead), _number(person.age),
+            _number(person.yob), _number(person.ashkn), person.mztwin != '0', cancers, gtests, pathology)
+
+
+def _rank(signatures):
+    ''' Replace each signature with the rank of its value. '''
+    ranks = {s: idx for idx, s in enumerate(sorted(set(signatures)))}
+    return [ranks[s] for s in signatures]
+
+
+def get_labels(pedigree):
+    """
+    Label the family members by their data and position in the pedigree. Family members with
+    the same label can not be distinguished without their names or identifiers.
+    @param pedigree: pedigree
+    @return: list of labels in the order of pedigree.people
+    """
+    people = pedigree.people
+    idx = {p.pid: i for i, p in enumerate(people)}
+    children = defaultdict(list)
+    twins = defaultdict(list)
+    for i, p in enumerate(people):
+        for parent in (p.mothid, p.fathid):
+            if parent in idx:
+                children[idx[parent]].append(i)
+        if p.mztwin != '0':
+            twins[p.mztwin].append(i)
+
+    def parent_idx(pid):
+        return idx.get(pid, MISSING_PARENT) if pid != '0' else NO_PARENT
+
+    parents = [(parent_idx(p.mothid), parent_idx(p.fathid)) for p in people]
+    cotwins = [[j for j in twins[p.mztwin] if j != i] if p.mztwin != '0' else [] for i, p in enumerate(people)]
+
+    labels = _rank([get_person_data(p) for p in people])
+    nlabels = len(set(labels))
+    for _i in range(len(people)):
+        signatures = [(labels[i],
+                       tuple(labels[j] if j >= 0 else j for j in parents[i]),
+                       tuple(sorted(labels[j] for j in children[i])),
+                       tuple(sorted(labels[j] for j in cotwins[i])))
+                      for i in range(len(people))]
+        labels = _rank(signatures)
+        if len(set(labels)) == nlabels:
+            break
+        nlabels = len(set(labels))
+    return labels
+
+
+def get_header_data(pedigree):
+    """
+    Get the risk factors, PRS, mammographic density and ethnicity given in the CanRisk header.
+    @param pedigree: pedigree
+    @return: dictionary of normalised values
+    """
+    header = {}
+    for rf in ('bc_risk_factor_code', 'oc_risk_factor_code'):
+        if getattr(pedigree, rf, None) is not None:
+            header[rf] = int(getattr(pedigree, rf))
+    hgt = getattr(pedigree, 'hgt', -1)
+    if hgt is not None and hgt != -1:
+        header['hgt'] = float(hgt)
+    for prs in ('bc_prs', 'oc_prs', 'pc_prs'):
+        if getattr(pedigree, prs, None) is not None:
+            header[prs] = [float(getattr(pedigree, prs).alpha), float(getattr(pedigree, prs).zscore)]
+    if getattr(pedigree, 'mdensity', None) is not None:
+        header['mdensity'] = [type(pedigree.mdensity).__name__, pedigree.mdensity.get_pedigree_str()]
+    if getattr(pedigree, 'ons_ethnicity', None) is not None:
+        header['ethnicity'] = pedigree.ons_ethnicity.get_string().lower()
+    return header
+
+
+def get_canonical_form(pedigree):
+    """
+    Get the canonical form of a pedigree. Family members are ordered and relabelled by their
+    labels from L{get_labels}, and their parents and MZ twins referenced by these labels.
+    @param pedigree: pedigree
+    @return: dictionary of the header data and family member records
+    """
+    people = pedigree.people
+    labels = get_labels(pedigree)
+    by_pid = {p.pid: labels[i] for i, p in enumerate(people)}
+    twins = defaultdict(list)
+    for i, p in enumerate(people):
+        if p.mztwin != '0':
+            twins[p.mztwin].append(labels[i])
+
+    def parent_label(pid):
+        return by_pid.get(pid, MISSING_PARENT) if pid != '0' else NO_PARENT
+
+    records = sorted([labels[i], parent_label(p.mothid), parent_label(p.fathid),
+                      sorted(twins[p.mztwin]) if p.mztwin != '0' else [],
+                      list(get_person_data(p))]
+                     for i, p in enumerate(people))
+    return {'header': get_header_data(pedigree), 'people': records}
+
+
+def get_digest(pedigree):
+    """
+    Get a stable SHA-256 digest of the canonical form of a pedigree.
+    @param pedigree: pedigree
+    @return: hex digest
+    """
+    canonical = json.dumps(get_canonical_form(pedigree), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
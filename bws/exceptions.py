@@ -15,6 +15,32 @@ class CanRiskError(ValidationError):
         detail = ('['+famid+'] - ' if famid != "XXXX" and famid is not None else '') + detail
         super().__init__({self.__class__.err: detail})
 
+    @property
+    def errors(self):
+        """ List of the errors reported, see L{CanRiskErrors}. """
+        return [self]
+
+
+class CanRiskErrors(CanRiskError):
+    """
+    CanRiskErrors raised to report all the errors found in a pedigree together. The
+    detail gives the first error of each type and a list of all the errors.
+    @param errors: list of CanRiskError
+    """
+
+    def __init__(self, errors):
+        self._errors = errors
+        self.err = errors[0].err
+        detail = {}
+        for e in errors:
+            detail.setdefault(e.err, e.detail[e.err])
+        detail['errors'] = [f"{e.err}: {e.detail[e.err]}" for e in errors]
+        ValidationError.__init__(self, detail)
+
+    @property
+    def errors(self):
+        return self._errors
+
 
 class PersonError(CanRiskError):
     """
@@ -0,0 +1,38 @@
+"""
+Command line utility.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from django.core.management.base import BaseCommand
+
+import bws.metrics as metrics
+
+
+def get_metric_groups():
+    ''' Web-service counters shared by the worker processes, grouped by feature. '''
+    from bws.altcha import ChallengePool
+    from bws.pedigree_file import PedigreeFile
+    from bws.prs_cache import PrsModelCache
+    return {
+        'ALTCHA': ChallengePool.METRICS + ["altcha_replayed"],
+        'Pedigree pre-validation': PedigreeFile.PREVALIDATION_METRICS,
+        'PRS model cache': PrsModelCache.METRICS,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Report the web-service counters, e.g. the ALTCHA challenge pool hits, misses and the number '
+            'of challenges generated, e.g ./manage.py bws_metrics --reset')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='reset the counters after they are reported')
+
+    def handle(self, *args, **options):
+        for group, names in get_metric_groups().items():
+            self.stdout.write(f"{group}:")
+            for name, value in metrics.get_counts(names).items():
+                self.stdout.write(f"  {name}: {value}")
+            if options['reset']:
+                metrics.reset(names)
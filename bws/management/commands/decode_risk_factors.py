@@ -5,19 +5,81 @@ Command line utility.
 SPDX-FileCopyrightText: 2023 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
-from django.core.management.base import BaseCommand
+import csv
+import io
+from itertools import islice
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from bws.exceptions import RiskFactorError
 from bws.risk_factors.bc import BCRiskFactors
+from bws.risk_factors.oc import OCRiskFactors
+
+
+MODELS = {'BC': BCRiskFactors, 'OC': OCRiskFactors}
 
 
 class Command(BaseCommand):
-    help = 'Decode risk factors into categories, e.g ./manage.py decode_risk_factors 112005'
+    help = ('Decode risk factors into categories, e.g ./manage.py decode_risk_factors 112005, or '
+            'stream codes one per line from a file or stdin to CSV, e.g. ./manage.py decode_risk_factors --input codes.txt')
 
     def add_arguments(self, parser):
-        parser.add_argument('factor', type=int)
+        parser.add_argument('factor', type=int, nargs='?')
+        parser.add_argument('--model', choices=list(MODELS.keys()), default='BC',
+                            help='cancer model of the risk factor codes (default: BC)')
+        parser.add_argument('--input', help="file of risk factor codes, one per line, or '-' for stdin")
+        parser.add_argument('--chunk-size', type=int, default=100000, dest='chunk_size',
+                            help='number of codes decoded at a time when streaming')
 
     def handle(self, *args, **options):
+        rfs = MODELS[options['model']]
+        if options['input'] is not None:
+            self.stream(rfs, options['input'], options['chunk_size'])
+            return
+        if options['factor'] is None:
+            raise CommandError("Provide a risk factor code or --input")
+
         risk_factor_code = options['factor']
-        categories = BCRiskFactors.decode(risk_factor_code)
+        categories = rfs.decode(risk_factor_code)
         for idx, cat in enumerate(categories):
-            name = BCRiskFactors.risk_factors[idx].__name__
-            print(name + " idx: " + str(cat) + " category: " + BCRiskFactors.risk_factors[idx].cats[cat])
+            name = rfs.risk_factors[idx].__name__
+            print(name + " idx: " + str(cat) + " category: " + rfs.risk_factors[idx].cats[cat])
+
+    def stream(self, rfs, path, chunk_size):
+        """
+        Decode risk factor codes from a file or stdin and write the categories as CSV.
+        @param rfs: risk factors class, e.g. L{BCRiskFactors}
+        @param path: input file path or '-' for stdin
+        @param chunk_size: number of codes decoded at a time
+        """
+        fin = sys.stdin if path == '-' else open(path, 'r')
+        try:
+            self.stdout.write(",".join(["code"] + list(rfs.categories.keys())))
+            lineno = 0
+            while True:
+                lines = list(islice(fin, chunk_size))
+                if not lines:
+                    break
+                codes = []
+                for line in lines:
+                    lineno += 1
+                    line = line.strip()
+                    if line == '':
+                        continue
+                    try:
+                        codes.append(int(line))
+                    except ValueError:
+                        raise CommandError(f"Invalid risk factor code on line {lineno}: {line}")
+                try:
+                    cats = rfs.decode_many(codes)
+                except RiskFactorError as e:
+                    raise CommandError(f"{e.err}: {e.detail[e.err]}")
+
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator='\n')
+                for code, row in zip(codes, cats.tolist()):
+                    writer.writerow([code] + row)
+                self.stdout.write(buf.getvalue(), ending='')
+        finally:
+            if fin is not sys.stdin:
+                fin.close()
@@ -0,0 +1,62 @@
+"""
+Command line utility to measure the duplicate rate in a directory of pedigree files,
+e.g. ./manage.py pedigree_duplicates /path/to/pedigrees
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections import Counter
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bws.exceptions import CanRiskError
+from bws.pedigree_file import PedigreeFile
+
+
+class Command(BaseCommand):
+    help = 'Report the number of logically identical pedigrees in a directory of pedigree files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=str)
+        parser.add_argument('--verbose-duplicates', action='store_true', dest='verbose_duplicates',
+                            help='list the files containing each duplicated pedigree')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+
+        digests = Counter()
+        files_by_digest = {}
+        nfiles = nskipped = 0
+        for root, _dirs, files in os.walk(directory):
+            for fname in sorted(files):
+                path = os.path.join(root, fname)
+                try:
+                    with open(path, 'r') as f:
+                        pedigree_file = PedigreeFile(f.read())
+                except (CanRiskError, UnicodeDecodeError, ValueError, IndexError):
+                    nskipped += 1
+                    continue
+                nfiles += 1
+                for pedigree in pedigree_file.pedigrees:
+                    digest = pedigree.get_digest()
+                    digests[digest] += 1
+                    files_by_digest.setdefault(digest, []).append(path)
+
+        npedigrees = sum(digests.values())
+        nduplicates = npedigrees - len(digests)
+        rate = (nduplicates / npedigrees * 100) if npedigrees > 0 else 0
+        self.stdout.write(f"files: {nfiles}")
+        self.stdout.write(f"skipped: {nskipped}")
+        self.stdout.write(f"pedigrees: {npedigrees}")
+        self.stdout.write(f"unique: {len(digests)}")
+        self.stdout.write(f"duplicates: {nduplicates}")
+        self.stdout.write(f"duplicate rate: {rate:.1f}%")
+        if options['verbose_duplicates']:
+            for digest, count in digests.most_common():
+                if count < 2:
+                    break
+                self.stdout.write(f"{digest} ({count}): " + ", ".join(files_by_digest[digest]))
@@ -0,0 +1,37 @@
+"""
+Command line utility.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bws.prs_alpha import write_index
+from bws.settings import get_alpha
+
+
+class Command(BaseCommand):
+    help = ('Generate the PRS alpha index file of the reference files of the cancer models, '
+            'e.g ./manage.py prs_alpha_index --output /tmp/bws_prs_alpha.json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='index file path (default: settings.PRS_ALPHA_INDEX)')
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'PRS_ALPHA_INDEX', None)
+        if path is None:
+            raise CommandError("Provide --output or set PRS_ALPHA_INDEX")
+
+        alphas = {}
+        for model in (settings.BC_MODEL, settings.OC_MODEL, settings.PC_MODEL):
+            for ref_files in model['PRS_REFERENCE_FILES'].values():
+                for _name, ref_file in ref_files:
+                    if isinstance(ref_file, str) and ref_file not in alphas:
+                        alphas[ref_file] = get_alpha(ref_file)
+        try:
+            n = write_index(path, alphas)
+        except (ImportError, OSError) as e:
+            raise CommandError(f"PRS alpha index not written: {e}")
+        self.stdout.write(f"PRS alpha index {path}: {n} reference files")
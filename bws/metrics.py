@@ -0,0 +1,48 @@
+"""
+Counters for the web-services, e.g. the number of uploads rejected by the pre-validation.
+The counters are held in the default Django cache so that they are shared by the worker
+processes.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import logging
+
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+KEY_PREFIX = "bws_metrics:"
+
+
+def incr(name, delta=1):
+    """
+    Increment a counter.
+    @param name: counter name
+    @keyword delta: amount to increment by
+    """
+    key = KEY_PREFIX + name
+    try:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+    except Exception as e:          # never fail a request because a counter can not be updated
+        logger.warning(f"metrics counter {name} not updated: {e}")
+
+
+def get_counts(names):
+    """
+    Get the current value of a list of counters.
+    @param names: counter names
+    @return: dictionary of counter name to value
+    """
+    values = cache.get_many([KEY_PREFIX + name for name in names])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in names}
+
+
+def reset(names):
+    """
+    Reset a list of counters.
+    @param names: counter names
+    """
+    cache.delete_many([KEY_PREFIX + name for name in names])
@@ -13,11 +13,13 @@ import re
 
 from django.conf import settings
 
-from bws.cancer import GeneticTest, PathologyTest, BWSGeneticTests, Genes
-import bws.consts as consts
-from bws.exceptions import PedigreeError
+from bws.cancer import GeneticTest, BWSGeneticTests, Genes
+from bws.exceptions import CanRiskErrors, PedigreeError
+from bws.pedigree_renderer import PedigreeFileFormat
 from bws.person import Person, Male, Female
 from bws.risk_factors.mdensity import Volpara, Stratus, Birads
+import bws.canonical as canonical
+import bws.validation as validation
 
 
 logger = logging.getLogger(__name__)
@@ -93,115 +95,35 @@ class Pedigree(metaclass=abc.ABCMeta):
             if pc_prs is not None:
                 self.pc_prs = pc_prs
 
-    def validateAll(self):
-        """ Validation check for pedigree, people, cancers, pathology and genetic tests. """
-        warnings = []
-        self.validate()                                 # Validate pedigree input data
-        for p in self.people:
-            p.validate(self)                            # Validate person data
-            type(p.cancers).validate(p)                 # Validate cancer diagnoses
-            warnings.extend(PathologyTest.validate(p))  # Validate pathology status
-            GeneticTest.validate(p)                     # Validate genetic tests
-        return warnings
+    def validateAll(self, collect=False):
+        """
+        Validation check for pedigree, people, cancers, pathology and genetic tests.
+        @keyword collect: if True collect all the errors found and raise them together
+        as L{CanRiskErrors}, otherwise raise the first error found.
+        @return: list of warnings
+        """
+        report = validation.validate_pedigree(self)
+        if collect and len(report.errors) > 1:
+            raise CanRiskErrors(report.errors)
+        return report.raise_first()
 
     def validate(self):
         """ Validation check for pedigree input. """
-        if(len(self.famid) > settings.MAX_LENGTH_PEDIGREE_NUMBER_STR or
-           not consts.REGEX_ALPHANUM_HYPHENS.match(self.famid) or       # must be alphanumeric plus hyphen
-           consts.REGEX_ONLY_HYPHENS.match(self.famid) or               # but not just hyphens
-           consts.REGEX_ONLY_ZEROS.match(self.famid)):                  # and not just zeros
-            raise PedigreeError(
-                "Family ID (1st data column) has been set to '" + self.famid +
-                "'. Family IDs must be specified with between 1 and "+str(settings.MAX_LENGTH_PEDIGREE_NUMBER_STR) +
-                " non-zero number or alphanumeric characters.", self.famid)
-
-        unconnected = self.unconnected()
-        if len(unconnected) > 0:
-            raise PedigreeError("Pedigree (" + self.famid + ") family members are not physically " +
-                                "connected to the target: " + str(unconnected), self.famid)
-
-        # Check that the index's parameters are valid
-        target = self.get_target()
-        if target.yob == '0':
-            raise PedigreeError("The target's year of birth has been set to '" + target.yob +
-                                "'. This person must be assigned a valid year of birth.", target.famid)
-        if target.age == '0':
-            raise PedigreeError("The target's age has been set to '" + target.age +
-                                "'. This person must be assigned an age.", target.famid)
-
-        # Check that carrier probabilities / cancer risks can be computed
-        carrier_probs = self.is_carrier_probs_viable(target=target)
-        cancer_risks = self.is_risks_calc_viable(target=target)
-        if(not carrier_probs and not cancer_risks):
-            raise PedigreeError(
-                "BOADICEA cannot compute mutation carrier probabilities because the target '" + target.pid +
-                "' has a positive genetic test. Also BOADICEA cannot compute breast and ovarian cancer "
-                "risks because the target is: (1) over " + str(settings.MAX_AGE_FOR_RISK_CALCS) +
-                " years old or (2) male, or (3) an affected female who has developed contralateral "
-                "breast cancer, ovarian cancer or pancreatic cancer, or (4) deceased.", target.famid)
-
-        # Volpara and Stratus are currently not configured for all ethnic groups.
-        if hasattr(self, 'ons_ethnicity') and hasattr(self, 'mdensity'):
-            if self.ons_ethnicity is not None and self.mdensity is not None:
-                if self.ons_ethnicity.ethnicity != 'white':
-                    if isinstance(self.mdensity, Volpara) or isinstance(self.mdensity, Stratus):
-                        raise PedigreeError("Volpara and Stratus are currently not configured for all ethnic groups.")
-        #
-        # Check monozygotic (MZ) twin data
-        twin_store = self.get_twins()
-
-        # Check that MZ siblings are only specified as twins, no identical triplets etc
-        for t in twin_store:
-            twins = twin_store[t]
-            if len(twins) != 2:
-                raise PedigreeError(
-                    "MZ twin identifier [mztwin=" + str(twins[0].mztwin) + "] does not appear twice in the pedigree file. "
-                    "Only MZ twins are permitted in the pedigree, MZ triplets or quads are not allowed.",
-                    twins[0].famid)
-
-            # Check MZ twin characters are valid
-            if len(t) != 1 or t not in settings.UNIQUE_TWIN_IDS:
-                raise PedigreeError("Invalid MZ twin character '" + t + "'. MZ twins must be identified using one " +
-                                    "of the following ASCII characters: " + str(settings.UNIQUE_TWIN_IDS) + ".",
-                                    twins[0].famid)
-
-            # Check that monozygotic (MZ) twin data are consistent
-            if(twins[0].mothid != twins[1].mothid or
-               twins[0].fathid != twins[1].fathid):
-                raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
-                                    "parents. MZ twins must have the same parents.", twins[0].famid)
-            if(twins[0].yob != twins[1].yob):
-                raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
-                                    "years of birth. MZ twins must have the same year of birth.", twins[0].famid)
-
-            # Check that living MZ twins have the same age at last follow up
-            if(twins[0].dead == '0' and twins[1].dead == '0' and twins[0].age != twins[1].age):
-                raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
-                                    "ages. If both MZ twins are alive, they must have the same age at last follow up.",
-                                    twins[0].famid)
-
-            if twins[0].sex() != twins[1].sex():
-                raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have a different "
-                                    "sex. MZ twins must have the same sex.", twins[0].famid)
-
-            # Check that the MZ twins have the same genetic status
-            if not GeneticTest.compareTestResults(twins[0], twins[1]):
-                raise PedigreeError("Monozygotic (MZ) twins have both had a genetic test, but the genetic test results "
-                                    "for these individuals are different. Under these circumstances, the genetic test "
-                                    "results must be the same.", twins[0].famid)
-
-        # Check to ensure that the maximum number of MZ twin pairs per pedigree has not been exceeded
-        if len(twin_store.keys()) > settings.MAX_NUMBER_MZ_TWIN_PAIRS:
-            raise PedigreeError("Maximum number of MZ twin pairs has been exceeded. Input pedigrees must have a "
-                                "maximum of " + str(settings.MAX_NUMBER_MZ_TWIN_PAIRS) + " MZ twin pairs.", self.famid)
-
-    def add_parents(self, person, gtests=BWSGeneticTests.default_factory()):
+        index = validation.PedigreeIndex(self)
+        report = validation.ValidationReport().apply(validation.PEDIGREE_RULES, self, index)
+        for twins in index.twins.values():
+            report.apply(validation.MZTWIN_RULES, twins, index)
+        report.raise_first()
+
+    def add_parents(self, person, gtests=None):
         """
         Add parents for a given person to the pedigree.
         @param person: Person in the pedigree to add parents to
-        @keyword gtests: genetic test results
+        @keyword gtests: genetic test results, default untested BWS genetic tests
         @return: father and mother
         """
+        if gtests is None:
+            gtests = BWSGeneticTests.default_factory()
         if person.fathid == "0" and person.mothid == "0":
             n = randint(1000, 9999)
             person.fathid = person.pid + str(n)
@@ -293,26 +215,21 @@ class Pedigree(metaclass=abc.ABCMeta):
         that are not connected.
         @return: return a list of individuals that aren't connected to the target
         """
-        target = self.get_target()
-        connected = [target.pid]
-        change = True
-        while change:
-            change = False
-            for p in self.people:
-                # If the person is in the connected group, but their parents aren't, then add them
-                if p.pid in connected:
-                    if((p.mothid != '0') and (p.mothid not in connected)):
-                        connected.append(p.mothid)
-                        change = True
-                    if((p.fathid != '0') and (p.fathid not in connected)):
-                        connected.append(p.fathid)
-                        change = True
-                # If the person parents is in the connected group, but they aren't, then add them
-                elif ((p.mothid in connected) or (p.fathid in connected)):
-                    connected.append(p.pid)
-                    change = True
-        # list of the individuals not connected to the target.
-        return [p.pid for p in self.people if p.pid not in connected]
+        return validation.PedigreeIndex(self).unconnected()
+
+    def get_canonical_form(self):
+        """
+        Get the canonical form of the pedigree, independent of names, identifiers and row order.
+        @return: dictionary of the header data and family member records
+        """
+        return canonical.get_canonical_form(self)
+
+    def get_digest(self):
+        """
+        Get a stable content hash of the pedigree, equal for logically identical pedigrees.
+        @return: hex digest
+        """
+        return canonical.get_digest(self)
 
     def is_risks_calc_viable(self, target=None, allowMale=None):
         """
@@ -340,7 +257,7 @@ class Pedigree(metaclass=abc.ABCMeta):
             return False
         return True
 
-    def is_carrier_probs_viable(self, target=None, genes=Genes.get_all_model_genes()):
+    def is_carrier_probs_viable(self, target=None, genes=None):
         """
         Return true if the target does not have a positive genetic test carrier probs
         cannot be calculated.
@@ -348,6 +265,8 @@ class Pedigree(metaclass=abc.ABCMeta):
         """
         if target is None:
             target = self.get_target()
+        if genes is None:
+            genes = Genes.get_all_model_genes()
         gtests = target.gtests
         for g in genes:
             t = getattr(gtests, g.lower(), GeneticTest())
@@ -359,6 +278,12 @@ class Pedigree(metaclass=abc.ABCMeta):
                             model_settings=settings.BC_MODEL):
         """
         Write input pedigree file for fortran.
+        @keyword risk_factor_code: risk factor code of the target
+        @keyword hgt: height of the target
+        @keyword mdensity: mammographic density of the target
+        @keyword prs: polygenic risk score of the target
+        @keyword filepath: path to write the pedigree file to
+        @keyword model_settings: model settings
         """
 
         if (mdensity is not None):
@@ -367,85 +292,36 @@ class Pedigree(metaclass=abc.ABCMeta):
             elif mdensity.md.lower() == "na":
                 mdensity = None
         
-        f = open(filepath, "w")
-        
-        mname = model_settings['NAME']
-        num = "5"
-        if mname == "OC":
-            num = "4"
-        elif mname == "PC":
-            num = "2"
-        print("(I3,X,A8)", file=f)
-
-        print("(3(A7,X),2(A1,X),2(A3,X)," +
-              str(len(model_settings['CANCERS'])+1) + "(A3,X)," +
-              str(len(model_settings['GENES'])) + "(A2,X)," +
-              "A4,X," +                             # yob 
-              ("A2,X," if mname != "PC" else "") +  # pathology
-              "A1," +                               # proband status
-              num + "(X,A8))", file=f)
-
-        print("%-3d %-8s" % (len(self.people), self.people[0].famid), file=f)
-
-        for p in self.people:
-            # IndivID FathID MothID Sex MZ Genotype, Polygene 1BC 2BC OC
-            genotype = ''
-            print("%-7s %-7s %-7s %-1s %-1s %3s %-3s " %
-                  (p.pid,
-                   p.fathid if p.fathid != "0" else '',
-                   p.mothid if p.mothid != "0" else '',
-                   p.sex(),
-                   p.mztwin if p.mztwin != "0" else '',
-                   genotype,
-                   '   '), file=f, end="")
-
-            print(p.cancers.write(model_settings['CANCERS'], p.age), file=f, end="")
-            print("%3s " % p.age, file=f, end="")
-
-            # Gene Tests
-            gtests = p.gtests
-            for g in model_settings['GENES']:
-                try:
-                    print("%2s " % getattr(gtests, g.lower()).get_genetic_test_data(), file=f, end="")
-                except AttributeError:
-                    # check if gene not in BC model
-                    if mname == "OC" and isinstance(gtests, BWSGeneticTests):
-                        if g in Genes.get_unique_oc_genes():
-                            print("%2s " % GeneticTest().get_genetic_test_data(), file=f, end="")
-                    elif mname == "PC" and isinstance(gtests, BWSGeneticTests):
-                        logger.debug(g+" ==== "+mname)
-                        if g in Genes.get_unique_pc_genes():
-                            print("%2s " % GeneticTest().get_genetic_test_data(), file=f, end="")
-                    else:
-                        logger.debug(g+" "+mname)
-                        raise
-
-            print("%4s " % (p.yob if p.yob != "0" else settings.MENDEL_NULL_YEAR_OF_BIRTH), file=f, end="")
-            if mname != "PC":
-                print(PathologyTest.write(p.pathology), file=f, end="")
-
-                # ProbandStatus RiskFactor
-                print("%1s %8s " % (p.target, (risk_factor_code if p.target != "0" else "00000000")),
-                  file=f, end="")
-
-                # Height
-                print(("%8.4f " % hgt) if p.target != "0" else ("%8s " % "-1"), file=f, end="")
-
-                # Mammographic density
-                if mname == "BC":
-                    print(("%8s " % mdensity.get_pedigree_str()) if p.target != "0" and mdensity is not None else ("%8s " % "00000000"), file=f, end="")
-            else:
-                # ProbandStatus
-                print("%1s " % p.target, file=f, end="")
-
-            # PolygStanDev PolygLoad
-            print("%8.5f %8.5f" % (prs.alpha if p.target != "0" and prs is not None and prs.alpha else 0,
-                                   prs.zscore if p.target != "0" and prs is not None and prs.zscore else 0,),
-                  file=f)
-
-        f.close()
+        rendered = PedigreeFileFormat.get(model_settings).render(self, risk_factor_code=risk_factor_code, hgt=hgt,
+                                                                 mdensity=mdensity, prs=prs)
+        with open(filepath, "w") as f:
+            f.write(rendered)
         return filepath
 
+    @classmethod
+    def get_param_file_content(cls, model_settings=settings.BC_MODEL,
+                               mutation_freq=settings.BC_MODEL['MUTATION_FREQUENCIES']['UK'],
+                               sensitivity=settings.BC_MODEL['GENETIC_TEST_SENSITIVITY']['DEFAULT'],
+                               isashk=False):
+        """
+        Get the contents of the model parameters file.
+        @param model_settings: model settings
+        @param mutation_freq: mutation frequencies
+        @param sensitivity: genetic test sensitivity
+        @param isashk: true if AJ
+        @return: model parameters file contents
+        """
+        # Note: population allele frequencies are used to compute the incidence rates
+        # for each genotype, from the overall population incidences
+        allele_freq = "PEDIGREE_ALLELE_FRQ" if isashk else "POPULATION_ALLELE_FRQ"
+        lines = ["&settings\n"]
+        for idx, gene in enumerate(model_settings['GENES'], start=1):
+            lines.append(f"{allele_freq}( {idx} ) = {mutation_freq[gene]}")
+        for idx, gene in enumerate(model_settings['GENES'], start=1):
+            lines.append(f"SCREENING_SENSITIVITIES( {idx} ) = {sensitivity[gene]}")
+        lines.append("/")
+        return "\n".join(lines) + "\n"
+
     def write_param_file(self, filepath="/tmp/params",
                          model_settings=settings.BC_MODEL,
                          mutation_freq=settings.BC_MODEL['MUTATION_FREQUENCIES']['UK'],
@@ -459,32 +335,20 @@ class Pedigree(metaclass=abc.ABCMeta):
         @param sensitivity: genetic test sensitivity
         @param isashk: true if AJ
         """
-        # Note: population allele frequencies are used to compute the incidence rates
-        # for each genotype, from the overall population incidences
-        allele_freq = "PEDIGREE_ALLELE_FRQ" if isashk else "POPULATION_ALLELE_FRQ"
-        f = open(filepath, "w")
-        print("&settings", file=f, end='\n\n')
-        for idx, gene in enumerate(model_settings['GENES'], start=1):
-            print(f"{allele_freq}( {idx} ) = {mutation_freq[gene]}", file=f)
-        for idx, gene in enumerate(model_settings['GENES'], start=1):
-            print(f"SCREENING_SENSITIVITIES( {idx} ) = {sensitivity[gene]}", file=f)
-        print("/", file=f)
-        f.close()
+        with open(filepath, "w") as f:
+            f.write(self.get_param_file_content(model_settings=model_settings, mutation_freq=mutation_freq,
+                                                sensitivity=sensitivity, isashk=isashk))
         return filepath
 
-    def write_batch_file(self, pedigree_file_name, filepath="/tmp/test.bat",
-                         model_settings=settings.BC_MODEL, calc_ages=None):
+    def get_batch_file_content(self, pedigree_file_name, model_settings=settings.BC_MODEL, calc_ages=None):
         """
-        Write fortran input batch file.
+        Get the contents of the fortran input batch file.
         @param pedigree_file_name: path to fortran pedigree file
-        @param filepath: path to write the batch file to
         @param model_settings: model settings
         @param calc_ages: list of ages to calculate a cancer risk at
+        @return: batch file contents
         """
-        f = open(filepath, "w")
-
-        print("2", file=f)
-        print(os.path.join(model_settings['HOME'], "Data/locus.loc"), file=f)
+        lines = ["2", os.path.join(model_settings['HOME'], "Data/locus.loc")]
 
         target = self.get_target()
         tage = int(target.age)      # target age at last follow up
@@ -508,18 +372,24 @@ class Pedigree(metaclass=abc.ABCMeta):
             calc_ages.append(0)
         if calc_ages[0] != 0:
             calc_ages.insert(0, 0)
-        print("3", file=f)
-        print(pedigree_file_name, file=f)
+        lines.extend(["3", pedigree_file_name])
         for i, age in enumerate(calc_ages):
-            print("9", file=f)
-            print((age-tage if age != 0 else 0), file=f)
-
-            print("22", file=f)
-            if i < len(calc_ages)-1:
-                print("yes", file=f)
-            else:
-                print("no", file=f)
-        f.close()
+            lines.extend(["9", str(age-tage if age != 0 else 0),
+                          "22", "yes" if i < len(calc_ages)-1 else "no"])
+        return "\n".join(lines) + "\n"
+
+    def write_batch_file(self, pedigree_file_name, filepath="/tmp/test.bat",
+                         model_settings=settings.BC_MODEL, calc_ages=None):
+        """
+        Write fortran input batch file.
+        @param pedigree_file_name: path to fortran pedigree file
+        @param filepath: path to write the batch file to
+        @param model_settings: model settings
+        @param calc_ages: list of ages to calculate a cancer risk at
+        """
+        with open(filepath, "w") as f:
+            f.write(self.get_batch_file_content(pedigree_file_name, model_settings=model_settings,
+                                                calc_ages=calc_ages))
         return filepath
 
     def get_columns(self):
@@ -12,12 +12,15 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 import bws.consts as consts
-from bws.exceptions import PedigreeFileError
+from bws.exceptions import CanRiskError, PedigreeError, PedigreeFileError
+import bws.metrics as metrics
 from bws.pedigree import BwaPedigree, CanRiskPedigree, Pedigree
+from bws.person import Female, Male
 from bws.risk_factors.bc import BCRiskFactors
 from bws.risk_factors.mdensity import Birads, Volpara, Stratus
 from bws.risk_factors.oc import OCRiskFactors
 from bws.risk_factors.ethnicity import ONSEthnicity
+import bws.validation as validation
 import re
 
 
@@ -115,6 +118,12 @@ class PedigreeFile(object):
     """
     CanRisk and BOADICEA import pedigree file.
     """
+    # target checks made by the pre-validation
+    TARGET_RULES = [validation.target_yob_rule, validation.target_age_rule, validation.viable_rule]
+    # pre-validation rejection metrics
+    PREVALIDATION_METRICS = ["prevalidation_header", "prevalidation_fields", "prevalidation_target",
+                             "prevalidation_size", "prevalidation_viability"]
+
     def __init__(self, pedigree_data):
         self.pedigree_data = pedigree_data
         pedigrees_records = [[]]
@@ -128,25 +137,7 @@ class PedigreeFile(object):
 
         for idx, line in enumerate(pedigree_data.splitlines()):
             if idx == 0:
-                if consts.REGEX_CANRISK1_PEDIGREE_FILE_HEADER.match(line):
-                    file_type = 'canrisk1'
-                    nfields = settings.CANRISK_FORMAT_ONE_DATA_FIELDS
-                elif consts.REGEX_CANRISK2_PEDIGREE_FILE_HEADER.match(line):
-                    file_type = 'canrisk2'
-                    nfields = settings.CANRISK_FORMAT_TWO_DATA_FIELDS
-                elif consts.REGEX_CANRISK3_PEDIGREE_FILE_HEADER.match(line):
-                    file_type = 'canrisk3'
-                    nfields = settings.CANRISK_FORMAT_TWO_DATA_FIELDS
-                elif consts.REGEX_CANRISK4_PEDIGREE_FILE_HEADER.match(line):
-                    file_type = 'canrisk4'
-                    nfields = settings.CANRISK_FORMAT_FOUR_DATA_FIELDS
-                elif consts.REGEX_BWA_PEDIGREE_FILE_HEADER_ONE.match(line):
-                    file_type = 'bwa'
-                    nfields = settings.BOADICEA_PEDIGREE_FORMAT_FOUR_DATA_FIELDS
-                else:
-                    raise PedigreeFileError(
-                        "The first header record in the pedigree file has unexpected characters. " +
-                        "The first header record must be '##CanRisk 4.0'." + line)
+                file_type, nfields = PedigreeFile.get_file_type(line)
             elif (idx == 1 and file_type == 'bwa') or line.startswith('##FamID'):
                 self.column_names = line.replace("##FamID", "FamID").split()
                 if (((self.column_names[0] != 'FamID') or
@@ -174,26 +165,7 @@ class PedigreeFile(object):
                     pid += 1
                 famid = record[0]
 
-                if file_type == 'bwa' and len(record) != nfields:
-                    raise PedigreeFileError("A data record has an unexpected number of data items. " +
-                                            "BOADICEA format 4 pedigree files should have " +
-                                            str(nfields) +
-                                            " data items per line.")
-                elif file_type == 'canrisk1' and len(record) != nfields:
-                    raise PedigreeFileError("A data record has an unexpected number of data items. " +
-                                            "CanRisk format 1 pedigree files should have " +
-                                            str(nfields) +
-                                            " data items per line.")
-                elif ((file_type == 'canrisk2' or file_type == 'canrisk3') and len(record) != nfields):
-                    raise PedigreeFileError("A data record has an unexpected number of data items. " +
-                                            "CanRisk format 2 and 3 pedigree files should have " +
-                                            str(nfields) +
-                                            " data items per line.")
-                elif ((file_type == 'canrisk4') and len(record) != nfields):
-                    raise PedigreeFileError("A data record has an unexpected number of data items. " +
-                                            "CanRisk format 4 pedigree files should have " +
-                                            str(nfields) +
-                                            " data items per line.")
+                PedigreeFile.check_nfields(record, file_type, nfields)
                 pedigrees_records[pid].append(line)
 
         self.pedigrees = []
@@ -209,6 +181,127 @@ class PedigreeFile(object):
                                     hgt=hgt, mdensity=mdensity, ons_ethnicity=ons_ethnicity,
                                     biobank_ethnicity=biobank_ethnicity))
 
+    @classmethod
+    def prevalidate(cls, pedigree_data, mname=None):
+        """
+        Cheap checks of the raw pedigree data made before it is parsed and before any
+        temporary directory is created or model is run. Uploads with an unexpected header,
+        number of data items, family size or number of targets are rejected with the same
+        errors as the full parsing. For a single pedigree the target record is parsed to
+        check the target's year of birth, age and that risks or carrier probabilities
+        can be calculated. Rejections are counted in the 'prevalidation_<reason>' metrics.
+        @param pedigree_data: pedigree file contents
+        @keyword mname: model name (BC, OC or PC), if set the target's viability is checked
+        """
+        lines = pedigree_data.splitlines()
+        try:
+            file_type, nfields = PedigreeFile.get_file_type(lines[0] if len(lines) > 0 else "")
+        except PedigreeFileError:
+            metrics.incr("prevalidation_header")
+            raise
+
+        families = []                       # family ID, size, target records and their delimiters
+        for idx, line in enumerate(lines):
+            if (idx == 0 or (idx == 1 and file_type == 'bwa') or line.startswith('##') or
+               consts.BLANK_LINE.match(line)):
+                continue
+            delim = ("\t" if line.count("\\t") == nfields-1 else r'\s+')
+            record = re.split(delim, line.rstrip())
+            try:
+                PedigreeFile.check_nfields(record, file_type, nfields)
+            except PedigreeFileError:
+                metrics.incr("prevalidation_fields")
+                raise
+            if len(families) == 0 or families[-1][0] != record[0]:
+                families.append([record[0], 0, []])
+            families[-1][1] += 1
+            if record[2] != '0' and record[2] != '1':
+                metrics.incr("prevalidation_target")
+                raise PedigreeError("A value in the Target data column has been set to '" + record[2] +
+                                    "'. Target column parameters must be set to '0' or '1'.", record[0])
+            if record[2] == '1':
+                families[-1][2].append((line, delim))
+
+        for famid, size, targets in families:
+            if len(targets) != 1:
+                metrics.incr("prevalidation_target")
+                raise PedigreeError("Pedigree (" + famid + ") has either no index or more than 1 " +
+                                    "index individuals. Only one target can be specified.", famid)
+            if size > settings.MAX_PEDIGREE_SIZE or size < settings.MIN_BASELINE_PEDIGREE_SIZE:
+                metrics.incr("prevalidation_size")
+                raise PedigreeError("Pedigree (" + famid + ") has unexpected number of family members " +
+                                    str(size), famid)
+
+        if mname is not None and len(families) == 1:
+            line, delim = families[0][2][0]
+            PedigreeFile._prevalidate_target(line, file_type, delim, mname)
+
+    @classmethod
+    def _prevalidate_target(cls, line, file_type, delim, mname):
+        """
+        Check the target of a single pedigree, see L{ModelWebServiceMixin.post_to_model}
+        for the targets that are not validated as no calculation is run.
+        """
+        try:
+            if file_type == 'bwa':
+                pedigree = BwaPedigree(pedigree_records=[line], file_type=file_type)
+            else:
+                pedigree = CanRiskPedigree(pedigree_records=[line], file_type=file_type, delim=delim)
+        except CanRiskError:
+            return                          # reported when the pedigree file is parsed
+        target = pedigree.get_target()
+        if isinstance(target, Male) and mname != "PC" and not pedigree.is_carrier_probs_viable():
+            return
+        elif isinstance(target, Female) and mname == "PC":
+            return
+        try:
+            validation.check(PedigreeFile.TARGET_RULES, pedigree, validation.PedigreeIndex(pedigree))
+        except CanRiskError:
+            metrics.incr("prevalidation_viability")
+            raise
+
+    @classmethod
+    def get_file_type(cls, line):
+        """
+        Get the file type and number of data items per record from the first header record.
+        @param line: first line of the pedigree file
+        @return: file type and number of data items per line
+        """
+        if consts.REGEX_CANRISK1_PEDIGREE_FILE_HEADER.match(line):
+            return ('canrisk1', settings.CANRISK_FORMAT_ONE_DATA_FIELDS)
+        elif consts.REGEX_CANRISK2_PEDIGREE_FILE_HEADER.match(line):
+            return ('canrisk2', settings.CANRISK_FORMAT_TWO_DATA_FIELDS)
+        elif consts.REGEX_CANRISK3_PEDIGREE_FILE_HEADER.match(line):
+            return ('canrisk3', settings.CANRISK_FORMAT_TWO_DATA_FIELDS)
+        elif consts.REGEX_CANRISK4_PEDIGREE_FILE_HEADER.match(line):
+            return ('canrisk4', settings.CANRISK_FORMAT_FOUR_DATA_FIELDS)
+        elif consts.REGEX_BWA_PEDIGREE_FILE_HEADER_ONE.match(line):
+            return ('bwa', settings.BOADICEA_PEDIGREE_FORMAT_FOUR_DATA_FIELDS)
+        raise PedigreeFileError(
+            "The first header record in the pedigree file has unexpected characters. " +
+            "The first header record must be '##CanRisk 4.0'." + line)
+
+    @classmethod
+    def check_nfields(cls, record, file_type, nfields):
+        """
+        Check a data record has the expected number of data items.
+        @param record: data record split into data items
+        @param file_type: file type
+        @param nfields: number of data items expected
+        """
+        if len(record) == nfields:
+            return
+        if file_type == 'bwa':
+            fmt = "BOADICEA format 4 pedigree files"
+        elif file_type == 'canrisk1':
+            fmt = "CanRisk format 1 pedigree files"
+        elif file_type == 'canrisk2' or file_type == 'canrisk3':
+            fmt = "CanRisk format 2 and 3 pedigree files"
+        else:
+            fmt = "CanRisk format 4 pedigree files"
+        raise PedigreeFileError("A data record has an unexpected number of data items. " + fmt +
+                                " should have " + str(nfields) + " data items per line.")
+
     @classmethod
     def get_incomplete_age_yob(cls, pedigrees):
         if isinstance(pedigrees, Pedigree):
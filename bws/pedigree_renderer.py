@@ -0,0 +1,153 @@
+"""
+Render the fortran input pedigree file. The record layout for each cancer model is compiled
+once from the model settings and the whole pedigree is rendered into a single string.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from django.conf import settings
+
+from bws.cancer import CANCER_TYPES, BWSGeneticTests, GeneticTest, Genes, PathologyTest
+
+
+class PedigreeFileFormat(object):
+    """
+    Fortran pedigree file record layout for a cancer model.
+    """
+    DEFAULT_GENE = -1                   # gene not in the genetic tests, written as untested
+    _formats = {}
+
+    def __init__(self, model_settings):
+        """
+        @param model_settings: model settings
+        """
+        self.mname = mname = model_settings['NAME']
+        self.genes = list(model_settings['GENES'])
+        self.cancer_idx = [CANCER_TYPES.index(c) for c in model_settings['CANCERS']]
+        self._gene_columns = {}
+
+        num = "5"
+        if mname == "OC":
+            num = "4"
+        elif mname == "PC":
+            num = "2"
+        self.header = ("(I3,X,A8)\n" +
+                       "(3(A7,X),2(A1,X),2(A3,X)," +
+                       str(len(model_settings['CANCERS'])+1) + "(A3,X)," +
+                       str(len(model_settings['GENES'])) + "(A2,X)," +
+                       "A4,X," +                             # yob
+                       ("A2,X," if mname != "PC" else "") +  # pathology
+                       "A1," +                               # proband status
+                       num + "(X,A8))\n")
+
+        # IndivID FathID MothID Sex MZ Genotype, Polygene
+        self.person_fmt = "%-7s %-7s %-7s %-1s %-1s " + ("%3s %-3s " % ('', '   '))
+        self.default_gtest = "%2s " % GeneticTest().get_genetic_test_data()
+        self.null_yob = "%4s " % settings.MENDEL_NULL_YEAR_OF_BIRTH
+
+        # ProbandStatus RiskFactor Height Mammographic_density PolygStanDev PolygLoad of non-target family members
+        if mname != "PC":
+            self.non_target_tail = ("%1s %8s " % ("0", "00000000")) + ("%8s " % "-1")
+            if mname == "BC":
+                self.non_target_tail += "%8s " % "00000000"
+        else:
+            self.non_target_tail = "%1s " % "0"
+        self.non_target_tail += "%8.5f %8.5f\n" % (0, 0)
+
+    @classmethod
+    def get(cls, model_settings):
+        """
+        Get the compiled record layout for a cancer model.
+        @param model_settings: model settings
+        @return: L{PedigreeFileFormat}
+        """
+        key = (model_settings['NAME'], tuple(model_settings['CANCERS']), tuple(model_settings['GENES']))
+        fmt = cls._formats.get(key)
+        if fmt is None:
+            fmt = cls._formats[key] = cls(model_settings)
+        return fmt
+
+    def get_gene_columns(self, gtests_cls):
+        """
+        Get the index of each model gene in a genetic tests named tuple. Genes specific to the
+        OC or PC model and missing from the BOADICEA genetic tests are written as untested.
+        @param gtests_cls: genetic tests class, e.g. L{BWSGeneticTests}
+        @return: list of the field index of each gene or DEFAULT_GENE
+        """
+        columns = self._gene_columns.get(gtests_cls)
+        if columns is not None:
+            return columns
+        columns = []
+        fields = gtests_cls._fields
+        for g in self.genes:
+            if g.lower() in fields:
+                columns.append(fields.index(g.lower()))
+            elif self.mname == "OC" and issubclass(gtests_cls, BWSGeneticTests):
+                if g in Genes.get_unique_oc_genes():
+                    columns.append(PedigreeFileFormat.DEFAULT_GENE)
+            elif self.mname == "PC" and issubclass(gtests_cls, BWSGeneticTests):
+                if g in Genes.get_unique_pc_genes():
+                    columns.append(PedigreeFileFormat.DEFAULT_GENE)
+            else:
+                raise AttributeError(f"'{gtests_cls.__name__}' object has no attribute '{g.lower()}'")
+        self._gene_columns[gtests_cls] = columns
+        return columns
+
+    def render(self, pedigree, risk_factor_code='0', hgt=-1, mdensity=None, prs=None):
+        """
+        Render the fortran input pedigree file.
+        @param pedigree: pedigree
+        @keyword risk_factor_code: risk factor code of the target
+        @keyword hgt: height of the target
+        @keyword mdensity: mammographic density of the target
+        @keyword prs: polygenic risk score of the target
+        @return: pedigree file contents
+        """
+        people = pedigree.people
+        mname = self.mname
+        out = [self.header, "%-3d %-8s\n" % (len(people), people[0].famid)]
+
+        target_tail = None
+        for p in people:
+            target = p.target
+            out.append(self.person_fmt % (p.pid,
+                                          p.fathid if p.fathid != "0" else '',
+                                          p.mothid if p.mothid != "0" else '',
+                                          p.sex(),
+                                          p.mztwin if p.mztwin != "0" else ''))
+
+            # cancer ages, with affected unknown (AU) set to the age of last follow up
+            age = p.age
+            diagnoses = p.cancers.diagnoses
+            for idx in self.cancer_idx:
+                cage = diagnoses[idx].age
+                out.append("%3s " % (cage if cage != 'AU' else age))
+            out.append("%3s " % age)
+
+            # gene tests
+            gtests = p.gtests
+            for idx in self.get_gene_columns(type(gtests)):
+                out.append(("%2s " % gtests[idx].get_genetic_test_data()) if idx >= 0 else self.default_gtest)
+
+            yob = p.yob
+            out.append(("%4s " % yob) if yob != "0" else self.null_yob)
+            if mname != "PC":
+                out.append(PathologyTest.write(p.pathology))
+
+            if target == "0":
+                out.append(self.non_target_tail)
+                continue
+
+            if target_tail is None:
+                if mname != "PC":
+                    target_tail = "%8s " % risk_factor_code + ("%8.4f " % hgt)
+                    if mname == "BC":
+                        target_tail += ("%8s " % mdensity.get_pedigree_str()) if mdensity is not None else \
+                            ("%8s " % "00000000")
+                else:
+                    target_tail = ""
+                target_tail += "%8.5f %8.5f\n" % (prs.alpha if prs is not None and prs.alpha else 0,
+                                                  prs.zscore if prs is not None and prs.zscore else 0)
+            out.append(("%1s " % target) + target_tail)
+        return "".join(out)
@@ -0,0 +1,38 @@
+"""
+Convert PRS z-scores to percentiles, i.e. the percentage of the population with a lower PRS,
+for a single z-score or a list of z-scores in one call.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from math import erf, sqrt
+
+
+_SQRT2 = sqrt(2.0)
+
+
+def get_percentage(zscore):
+    """
+    Cumulative standard normal distribution as a percentage, computed as in
+    statistics.NormalDist().cdf.
+    @param zscore: standard normal PRS which is normally distributed in the general
+    population with mean of 0 and standard deviation of 1
+    @return: PRS represented as a percentage of those with a lower PRS
+    """
+    return 0.5 * (1.0 + erf(zscore / _SQRT2)) * 100.0
+
+
+def get_percentages(zscores, alphas=None):
+    """
+    Convert a list of z-scores to percentages in a single pass.
+    @param zscores: list of z-scores, or of alpha-adjusted scores (alpha * z-score) if alphas are given
+    @keyword alphas: list of the alpha of each score, used to recover the z-score
+    @return: list of PRS represented as a percentage of those with a lower PRS
+    @raise ValueError: if the number of alphas does not match the number of scores
+    """
+    if alphas is not None:
+        if len(alphas) != len(zscores):
+            raise ValueError(f"{len(alphas)} alphas given for {len(zscores)} scores")
+        return [50.0 * (1.0 + erf(s / a / _SQRT2)) for s, a in zip(zscores, alphas)]
+    return [50.0 * (1.0 + erf(z / _SQRT2)) for z in zscores]
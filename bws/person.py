@@ -6,19 +6,23 @@ SPDX-FileCopyrightText: 2023 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 
-from datetime import date
 from django.conf import settings
 
 from bws.cancer import Cancer, GeneticTest, PathologyTests, PathologyTest, Cancers, \
-    BWSGeneticTests, CanRiskGeneticTests, Genes
-import bws.consts as consts
-from bws.exceptions import PedigreeError, PersonError
+    BWSGeneticTests, CanRiskGeneticTests, Genes, encode_field, decode_field
+from bws.exceptions import PedigreeError
 import bws.pedigree as pedigree
+import bws.validation as validation
 import re
 
 
 class Person(object):
-    """ Person class. """
+    """
+    Person class. Ages, year of birth and the target, dead and Ashkenazi flags
+    are stored integer coded and read back as strings.
+    """
+    __slots__ = ('famid', 'name', 'pid', 'fathid', 'mothid', '_target', '_dead', '_age', '_yob', '_ashkn',
+                 'mztwin', 'cancers', 'gtests', 'pathology')
 
     def __init__(self, famid, name, pid, fathid, mothid, target="0", dead="0", age="0", yob="0", ashkn="0", mztwin="0",
                  cancers=Cancers(),
@@ -67,93 +71,51 @@ class Person(object):
         self.gtests = gtests    # genetic tests
         self.pathology = pathology
 
+    @property
+    def target(self):
+        return decode_field(self._target)
+
+    @target.setter
+    def target(self, target):
+        self._target = encode_field(target)
+
+    @property
+    def dead(self):
+        return decode_field(self._dead)
+
+    @dead.setter
+    def dead(self, dead):
+        self._dead = encode_field(dead)
+
+    @property
+    def age(self):
+        return decode_field(self._age)
+
+    @age.setter
+    def age(self, age):
+        self._age = encode_field(age)
+
+    @property
+    def yob(self):
+        return decode_field(self._yob)
+
+    @yob.setter
+    def yob(self, yob):
+        self._yob = encode_field(yob)
+
+    @property
+    def ashkn(self):
+        return decode_field(self._ashkn)
+
+    @ashkn.setter
+    def ashkn(self, ashkn):
+        self._ashkn = encode_field(ashkn)
+
     def validate(self, pedigree):
         """ Validation check for people input.
         @param pedigree: Pedigree the person belongs to.
         """
-        if(self.name == '' or
-           not consts.REGEX_ALPHANUM_HYPHENS.match(self.name)):
-            raise PersonError("A name '"+self.name+"' is unspecified or is not an alphanumeric string.", self.famid)
-
-        if(len(self.pid) < settings.MIN_FAMILY_ID_STR_LENGTH or
-           len(self.pid) > settings.MAX_FAMILY_ID_STR_LENGTH or
-           consts.REGEX_ONLY_ZEROS.match(self.pid) or
-           not consts.REGEX_ALPHANUM_HYPHENS.match(self.pid)):
-            raise PersonError("An individual identifier (IndivID column) was specified as '" + self.pid +
-                              ". Individual identifiers must be alphanumeric strings with a maximum of " +
-                              str(settings.MAX_FAMILY_ID_STR_LENGTH)+"characters.", self.famid)
-
-        if(len(self.fathid) < settings.MIN_FAMILY_ID_STR_LENGTH or
-           len(self.fathid) > settings.MAX_FAMILY_ID_STR_LENGTH or
-           not consts.REGEX_ALPHANUM_HYPHENS.match(self.fathid)):
-            raise PersonError("Father identifier ('" + self.fathid + "', FathID column) has unexpected characters. "
-                              "It must be alphanumeric strings with a maximum of " +
-                              str(settings.MAX_FAMILY_ID_STR_LENGTH) + " characters", self.famid)
-
-        if(len(self.mothid) < settings.MIN_FAMILY_ID_STR_LENGTH or
-           len(self.mothid) > settings.MAX_FAMILY_ID_STR_LENGTH or
-           not consts.REGEX_ALPHANUM_HYPHENS.match(self.mothid)):
-            raise PersonError("Mother identifier ('" + self.mothid + "', MothID column) has unexpected characters. "
-                              "It must be alphanumeric strings with a maximum of " +
-                              str(settings.MAX_FAMILY_ID_STR_LENGTH) + " characters", self.famid)
-
-        if(self.fathid == '0' and self.mothid != '0') or (self.fathid != '0' and self.mothid == '0'):
-            raise PersonError("Family member '"+self.name+"' has only one parent specified. All family members must "
-                              "have no parents specified (i.e. they must be founders) or both parents specified.",
-                              self.famid)
-
-        # check for missing parents
-        if self.mothid != '0' and pedigree.get_person(self.mothid) is None:
-            raise PersonError("The mother '"+self.mothid+"' of family member '" + self.pid +
-                              "' is missing from the pedigree.", self.famid)
-        elif self.fathid != '0' and pedigree.get_person(self.fathid) is None:
-            raise PersonError("The father '"+self.fathid+"' of family member '" + self.pid +
-                              "' is missing from the pedigree.", self.famid)
-
-        # check all fathers are male
-        if self.fathid != '0' and pedigree.get_person(self.fathid).sex() != 'M':
-            raise PersonError("The father of family member '" + self.pid + "' is not specified as male. " +
-                              "All fathers in the pedigree must have sex specified as 'M'.", self.famid)
-        # check all mothers are female
-        if self.mothid != '0' and pedigree.get_person(self.mothid).sex() != 'F':
-            raise PersonError("The mother of family member '" + self.pid + "' is not specified as female. " +
-                              "All mothers in the pedigree must have sex specified as 'F'.", self.famid)
-        # check if the dead attribute has been correctly set
-        if self.dead != '0' and self.dead != '1':
-            raise PersonError("The family member '" + self.pid + "' has an invalid vital status " +
-                              "(alive must be specified as '0', and dead specified as '1')", self.famid)
-        # check that age of last follow up set to either 0 (unknown) or in range 1-110
-        if not consts.REGEX_AGE.match(self.age) or int(self.age) > settings.MAX_AGE:
-            raise PersonError("The age specified for family member '" + self.pid + "' has unexpected " +
-                              "characters. Ages must be specified with as '0' for unknown, or in the " +
-                              "range 1-" + str(settings.MAX_AGE), self.famid)
-
-        # validate year of birth
-        current_year = date.today().year
-        if self.yob != "0":
-            if(not consts.REGEX_YEAR_OF_BIRTH.match(self.yob) or
-               int(self.yob) < settings.MIN_YEAR_OF_BIRTH or
-               int(self.yob) > current_year):
-                raise PersonError("The year of birth '" + self.yob + "' specified for family member '" + self.pid +
-                                  "' is out of range. Years of birth must be in the range " +
-                                  str(settings.MIN_YEAR_OF_BIRTH) + "-" + str(current_year))
-
-        # Check that we have valid data values for the Ashkenazi flag
-        if(not consts.REGEX_ASHKENAZI_STATUS.match(self.ashkn)):
-            raise PersonError("Family member '" + self.pid + "' has been assigned an invalid Ashkenazi "
-                              "origin parameter. The Ashkenazi origin parameter must be set to '1' "
-                              "for Ashkenazi origin, or '0' for not Ashkenazi origin.")
-
-        # Check max no. of siblings not exceeded
-        (siblings, siblings_same_yob) = pedigree.get_siblings(self)
-        if len(siblings) > settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY:
-            raise PersonError("Family member '" + self.pid + "' exceeded the maximum number of siblings (" +
-                              str(settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY) + ".")
-        # Check has siblings with the same year of birth
-        if len(siblings_same_yob) > settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY_WITH_SAME_YOB:
-            raise PersonError("Family member '" + self.pid + "' exceeded the maximum number of siblings " +
-                              "with the same year of birth exceeded (" +
-                              str(settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY_WITH_SAME_YOB) + ")")
+        validation.check(validation.PERSON_RULES, self, validation.PedigreeIndex(pedigree))
 
     @staticmethod
     def factory(ped_file_line, file_type=None, delim=r'\s+'):
@@ -229,17 +191,18 @@ class Person(object):
         in order for that person to be included in a calculation. As a result, family members
         lacking this information will be excluded from the calculation.
         """
-        if self.yob == '0' or self.age == '0':
+        if self._yob == 0 or self._age == 0:
             if not self.cancers.is_cancer_diagnosed():
                 return False
         return True
 
     def is_target(self):
-        return False if self.target == '0' else True
+        return self._target != 0
 
 
 class Male(Person):
     ''' Male person. '''
+    __slots__ = ()
 
     def sex(self):
         return 'M'
@@ -247,6 +210,7 @@ class Male(Person):
 
 class Female(Person):
     ''' Female person. '''
+    __slots__ = ()
 
     def sex(self):
         return 'F'
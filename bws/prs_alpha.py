@@ -0,0 +1,143 @@
+"""
+PRS alpha values of the reference files, read lazily on first use rather than when the settings
+are imported, so that worker and management command start up does not read every reference
+file. Alphas can also be taken from a small index file generated with
+./manage.py prs_alpha_index, see PRS_ALPHA_INDEX.
+
+This module is imported by bws.settings, so it must not use the Django settings at import time.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections.abc import Mapping
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+_indexes = {}       # index path -> (mtime, entries)
+_lock = threading.Lock()
+
+
+def get_reference_file_path(ref_file):
+    """
+    Get the path of a PRS reference file distributed with vcf2prs.
+    @param ref_file: reference file name, e.g. BCAC_313_PRS.prs
+    @return: file path
+    """
+    import vcf2prs
+    return os.path.join(Path(vcf2prs.__file__).parent.parent, "PRSmodels_CanRisk", ref_file)
+
+
+def get_file_stamp(path):
+    """
+    Get the modification time and size of a file, used to check an index entry is up to date.
+    @param path: file path
+    @return: list of the modification time in nanoseconds and the size
+    """
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def get_index_path():
+    ''' Get the PRS alpha index file path from the Django settings, None if not used. '''
+    try:
+        from django.conf import settings
+        return getattr(settings, 'PRS_ALPHA_INDEX', None)
+    except Exception:       # e.g. settings not configured
+        return None
+
+
+def read_index(path):
+    """
+    Read a PRS alpha index file, cached until the file is modified.
+    @param path: index file path
+    @return: dictionary of the reference file name to the alpha and file stamp
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    with _lock:
+        entry = _indexes.get(path)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"PRS alpha index {path} not read: {e}")
+        entries = {}
+    with _lock:
+        _indexes[path] = (mtime, entries)
+    return entries
+
+
+def write_index(path, alphas):
+    """
+    Write a PRS alpha index file.
+    @param path: index file path
+    @param alphas: dictionary of the reference file name to alpha
+    @return: number of reference files in the index
+    """
+    entries = {ref_file: {'alpha': alpha, 'stamp': get_file_stamp(get_reference_file_path(ref_file))}
+               for ref_file, alpha in alphas.items()}
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class PrsAlpha(Mapping):
+    """
+    Mapping of the PRS name to alpha. The alpha of a reference file is taken from the index
+    file, if it is up to date, or read from the reference file when it is first used and then
+    cached.
+    """
+
+    def __init__(self, ref_files, loader):
+        """
+        @param ref_files: list of the PRS name and reference file name or dictionary with the alpha
+        @param loader: function to read the alpha from a reference file name
+        """
+        self._ref_files = dict(ref_files)
+        self._loader = loader
+        self._alphas = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._alphas[key]
+        except KeyError:
+            pass
+        ref_file = self._ref_files[key]
+        alpha = self._get_alpha(ref_file) if isinstance(ref_file, str) else ref_file['alpha']
+        self._alphas[key] = alpha
+        return alpha
+
+    def __iter__(self):
+        return iter(self._ref_files)
+
+    def __len__(self):
+        return len(self._ref_files)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self)!r})"
+
+    def _get_alpha(self, ref_file):
+        ''' Get the alpha of a reference file from the index, falling back to reading the file. '''
+        index_path = get_index_path()
+        if index_path is not None:
+            entry = read_index(index_path).get(ref_file)
+            if entry is not None:
+                try:
+                    if entry['stamp'] == get_file_stamp(get_reference_file_path(ref_file)):
+                        return entry['alpha']
+                except (ImportError, OSError, KeyError):
+                    pass
+        return self._loader(ref_file)
@@ -0,0 +1,170 @@
+"""
+Process-wide cache of parsed PRS reference models, so that the reference files are read and
+parsed once rather than on every vcf2prs request. Entries are keyed on the file path and are
+reloaded when the file modification time changes. The memory used by each parsed model is
+estimated when it is loaded and the total can be bounded with PRS_MODEL_CACHE_MAX_BYTES.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections import OrderedDict
+import copy
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+import bws.metrics as metrics
+from bws.prs_alpha import get_reference_file_path
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_prs_model(path):
+    """
+    Read and parse a PRS reference file.
+    @param path: reference file path
+    @return: vcf2prs Prs
+    """
+    from vcf2prs.prs import Prs
+    return Prs(prs_file=path)
+
+
+def get_size(obj, seen=None):
+    """
+    Estimate the memory used by an object and the objects it references.
+    @param obj: object
+    @return: size in bytes
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_size(k, seen) + get_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_size(i, seen) for i in obj)
+    elif hasattr(obj, '__dict__'):
+        size += get_size(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(get_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
+
+
+class PrsModelCache(object):
+    """
+    Cache of parsed PRS reference models keyed on the file path and modification time.
+    """
+    METRICS = ["prs_cache_hit", "prs_cache_miss"]
+
+    def __init__(self, loader=load_prs_model, max_bytes=None):
+        """
+        @keyword loader: function to read and parse a reference file
+        @keyword max_bytes: maximum estimated memory for the cached models, None for no limit
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()    # path -> (mtime, size, model), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Get a PRS model for a reference file. A copy of the cached model is returned so that
+        calculations on it do not change the cached model.
+        @param path: reference file path
+        @return: vcf2prs Prs
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self.loader(path)    # not cached, the loader reports the error
+        with self._lock:
+            entry = self._models.get(path)
+            if entry is not None and entry[0] == mtime:
+                self._models.move_to_end(path)
+                model = entry[2]
+            else:
+                model = None
+        if model is not None:
+            metrics.incr("prs_cache_hit")
+        else:
+            metrics.incr("prs_cache_miss")
+            model = self.load(path, mtime)
+        return copy.deepcopy(model)
+
+    def load(self, path, mtime=None):
+        """
+        Parse a reference file and add it to the cache.
+        @param path: reference file path
+        @keyword mtime: file modification time in nanoseconds
+        @return: cached model
+        """
+        if mtime is None:
+            mtime = os.stat(path).st_mtime_ns
+        start = time.time()
+        model = self.loader(path)
+        size = get_size(model)
+        with self._lock:
+            self._models[path] = (mtime, size, model)
+            self._models.move_to_end(path)
+            self._evict()
+        logger.info(f"PRS model cached: {path}; size={size} bytes; load time={time.time() - start:.3f}s")
+        return model
+
+    def _evict(self):
+        ''' Remove the least recently used models until within max_bytes, keeping at least one. '''
+        if self.max_bytes is None:
+            return
+        while len(self._models) > 1 and self.get_size() > self.max_bytes:
+            path, _entry = self._models.popitem(last=False)
+            logger.info(f"PRS model evicted: {path}")
+
+    def get_size(self):
+        """
+        Get the estimated memory used by the cached models.
+        @return: size in bytes
+        """
+        return sum(size for _mtime, size, _model in self._models.values())
+
+    def get_stats(self):
+        """
+        Get the cache memory accounting.
+        @return: dictionary of the number of models, total size and size of each model
+        """
+        with self._lock:
+            sizes = {path: size for path, (_mtime, size, _model) in self._models.items()}
+        return {"models": len(sizes), "bytes": sum(sizes.values()), "sizes": sizes}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def warm(self, model_settings_list):
+        """
+        Load the PRS reference files configured for the cancer models.
+        @param model_settings_list: list of model settings with PRS_REFERENCE_FILES
+        @return: number of models loaded
+        """
+        nloaded = 0
+        for model_settings in model_settings_list:
+            for ref_files in model_settings.get('PRS_REFERENCE_FILES', {}).values():
+                for _name, ref_file in ref_files:
+                    if not isinstance(ref_file, str):
+                        continue
+                    try:
+                        self.load(get_reference_file_path(ref_file))
+                        nloaded += 1
+                    except Exception as e:      # never fail start up because of a reference file
+                        logger.warning(f"PRS model not cached: {ref_file}: {e}")
+        logger.info(f"PRS model cache warmed: {nloaded} models; size={self.get_size()} bytes")
+        return nloaded
+
+
+prs_models = PrsModelCache(max_bytes=getattr(settings, 'PRS_MODEL_CACHE_MAX_BYTES', None))
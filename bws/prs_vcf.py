@@ -0,0 +1,303 @@
+"""
+Read a VCF genotype file once for several PRS reference models. The records are split in a
+single pass into the records each model can use, matched on the union of the variant keys
+(chromosome and position, or variant ID) of the selected reference files, so that vcf2prs
+only parses the header and the relevant records for each model.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import gzip
+import io
+import logging
+import os
+import re
+import threading
+import zlib
+
+from bws.vcf_index import BGZF_HEADER, VcfIndex, VcfIndexError, merge_chunks, read_chunks
+
+
+logger = logging.getLogger(__name__)
+
+REGEX_FIELD_SEP = re.compile(r'[,\s]+')
+REGEX_CHROMOSOME = re.compile(r'^(chr)?([0-9]{1,2}|X|Y|MT?)$', re.IGNORECASE)
+CHROMOSOME_ALIASES = {'23': 'X', 'X': '23', 'M': 'MT', 'MT': 'M'}
+
+
+def normalise_chromosome(chrom):
+    ''' Remove any chr prefix, e.g. chr1 -> 1 '''
+    prefix = b'chr' if isinstance(chrom, bytes) else 'chr'
+    return chrom[3:].upper() if chrom[:3].lower() == prefix else chrom.upper()
+
+
+class VariantKeys(object):
+    """
+    Variant keys of a PRS reference file, the chromosome and position of each variant and
+    the other tokens in the file, e.g. rsIDs, that may be matched against the VCF ID column.
+    """
+    __slots__ = ('positions', 'ids')
+
+    def __init__(self, positions, ids):
+        self.positions = positions
+        self.ids = ids
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Read the variant keys from a PRS reference file. Every pair of adjacent fields that look
+        like a chromosome and a position is taken as a variant position, so that the keys are a
+        superset of the variants vcf2prs can match.
+        @param path: reference file path
+        @return: L{VariantKeys} or None if no variant positions are found
+        """
+        positions = set()
+        ids = set()
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line == '' or line.startswith('#') or '=' in line:
+                    continue
+                tokens = [t for t in REGEX_FIELD_SEP.split(line) if t != '']
+                for i, token in enumerate(tokens):
+                    if token != '.':
+                        ids.add(token)
+                    if i+1 < len(tokens) and tokens[i+1].isdigit() and REGEX_CHROMOSOME.match(token):
+                        chrom = normalise_chromosome(token)
+                        positions.add((chrom, tokens[i+1]))
+                        if chrom in CHROMOSOME_ALIASES:
+                            positions.add((CHROMOSOME_ALIASES[chrom], tokens[i+1]))
+        if len(positions) == 0:
+            return None
+        return cls(frozenset(positions), frozenset(ids))
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_vcf(fileobj, encoding='utf-8', binary=False):
+    """
+    Open an uploaded VCF file as a text stream that is decoded as it is read, so that the file
+    is never held in memory. Gzip and BGZF (blocked gzip, e.g. from bgzip) files are detected
+    from the gzip magic number and decompressed as they are read.
+    @param fileobj: binary file object, e.g. an uploaded temporary file
+    @keyword encoding: text encoding
+    @keyword binary: return a binary stream that is not decoded
+    @return: text stream, detach it when finished to leave fileobj open
+    """
+    fileobj.seek(0)
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    if magic == GZIP_MAGIC:
+        # BGZF files are a series of gzip members which GzipFile reads as one stream
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return fileobj if binary else io.TextIOWrapper(fileobj, encoding=encoding)
+
+
+def read_header(vcf):
+    """
+    Read the VCF header lines, stopping at the first record.
+    @param vcf: VCF text stream or file contents
+    @return: header
+    """
+    if isinstance(vcf, str):
+        vcf = io.StringIO(vcf)
+    header = []
+    for line in vcf:
+        if not line.startswith('#'):
+            break
+        header.append(line)
+    return "".join(header)
+
+
+def get_sample_names(header):
+    """
+    Get the sample names from the VCF header line, i.e. the columns after FORMAT.
+    @param header: VCF header
+    @return: list of sample names
+    """
+    for line in io.StringIO(header):
+        if line.startswith('#CHROM'):
+            return line.rstrip('\r\n').split('\t')[9:]
+    return []
+
+
+def select_samples(line, columns):
+    """
+    Select the fixed columns and the given sample columns from a VCF header or record line.
+    @param line: VCF line
+    @param columns: indexes of the sample columns
+    @return: VCF line
+    """
+    fields = line.rstrip('\r\n').split('\t')
+    if len(fields) < 9:
+        return line
+    return "\t".join(fields[:9] + [fields[c] for c in columns if c < len(fields)]) + "\n"
+
+
+_keys_cache = {}     # path -> (mtime, VariantKeys)
+_keys_lock = threading.Lock()
+
+
+def get_variant_keys(path):
+    """
+    Get the variant keys of a PRS reference file, read once for each modification time.
+    @param path: reference file path
+    @return: L{VariantKeys} or None if the records can not be filtered for this file
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _keys_lock:
+        entry = _keys_cache.get(path)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+    try:
+        keys = VariantKeys.from_file(path)
+    except (OSError, UnicodeDecodeError):
+        keys = None     # vcf2prs reports any error reading the file
+    with _keys_lock:
+        _keys_cache[path] = (mtime, keys)
+    return keys
+
+
+def _lines(vcf, encoding='utf-8'):
+    ''' Iterate over the lines of a VCF as bytes. '''
+    if isinstance(vcf, str):
+        return io.BytesIO(vcf.encode(encoding))
+    if isinstance(vcf, io.TextIOBase):
+        return (line.encode(encoding) for line in vcf)
+    return vcf
+
+
+def _decode(line, encoding='utf-8'):
+    ''' Decode a line, with universal newlines as for a text stream. '''
+    line = line.decode(encoding)
+    return line[:-2] + '\n' if line.endswith('\r\n') else line
+
+
+def split_vcf(vcf, model_keys, samples=None, encoding='utf-8'):
+    """
+    Split a VCF file into a VCF for each PRS model in a single pass over the records. The header
+    is given to every model, and records that can not be parsed or models without variant keys
+    get all the records, so that vcf2prs reports errors as before. Records are matched on the
+    raw bytes of the CHROM, POS and ID columns and only the matching records are decoded and
+    kept when reading from a stream.
+    @param vcf: VCF binary or text stream, e.g. from L{open_vcf}, iterable of lines as bytes
+    or file contents
+    @param model_keys: list of L{VariantKeys} (or None) for each model
+    @keyword samples: list of sample names to keep, None to keep all the samples
+    @keyword encoding: text encoding
+    @return: list of VCF file contents for each model
+    @raise ValueError: if a sample is not found in the VCF header
+    """
+    header = []
+    columns = None      # sample columns kept
+    records = [[] for _k in model_keys]
+    all_records = frozenset(i for i, keys in enumerate(model_keys) if keys is None)
+
+    # union of the variant keys, mapped to the models that use each key
+    position_models = {}
+    id_models = {}
+    for i, keys in enumerate(model_keys):
+        if keys is None:
+            continue
+        for chrom, pos in keys.positions:
+            position_models.setdefault((chrom.encode(encoding), pos.encode(encoding)), set()).add(i)
+        for vid in keys.ids:
+            id_models.setdefault(vid.encode(encoding), set()).add(i)
+
+    nmodels = set(range(len(model_keys)))
+    chroms = {}         # normalised chromosome names
+    for line in _lines(vcf, encoding):
+        if line.startswith(b'#'):
+            line = _decode(line, encoding)
+            if samples is not None and line.startswith('#CHROM'):
+                names = get_sample_names(line)
+                missing = [s for s in samples if s not in names]
+                if missing:
+                    raise ValueError("Sample(s) not found in the genotype file: " + ", ".join(missing))
+                columns = [9 + names.index(s) for s in samples]
+                line = select_samples(line, columns)
+            header.append(line)
+            continue
+        fields = line.split(b'\t', 3)
+        if len(fields) < 3:
+            models = nmodels
+        else:
+            chrom = chroms.get(fields[0])
+            if chrom is None:
+                chrom = chroms[fields[0]] = normalise_chromosome(fields[0])
+            models = position_models.get((chrom, fields[1]), all_records)
+            if fields[2] in id_models:
+                models = models | id_models[fields[2]]
+            if all_records:
+                models = models | all_records
+        if not models:
+            continue
+        line = _decode(line, encoding)
+        if columns is not None:
+            line = select_samples(line, columns)
+        for i in models:
+            records[i].append(line)
+
+    header = "".join(header)
+    return [header + "".join(r) for r in records]
+
+
+def read_vcf(fileobj, model_keys, samples=None, index_file=None):
+    """
+    Read an uploaded VCF file and split it into a VCF for each PRS model. If a tabix or CSI
+    index of a BGZF compressed VCF is given, only the compressed blocks that may hold records
+    at the variant positions are read and the rest of the file is skipped. Otherwise, or if
+    the index can not be used, all the records are scanned, see L{split_vcf}.
+    @param fileobj: binary file object, e.g. an uploaded temporary file
+    @param model_keys: list of L{VariantKeys} (or None) for each model
+    @keyword samples: list of sample names to keep, None to keep all the samples
+    @keyword index_file: binary file object of the tabix or CSI index
+    @return: list of VCF file contents for each model
+    """
+    if index_file is not None and len(model_keys) > 0 and all(k is not None for k in model_keys):
+        try:
+            lines = scan_indexed(fileobj, index_file, set().union(*[k.positions for k in model_keys]))
+            return split_vcf(lines, model_keys, samples=samples)
+        except VcfIndexError as e:
+            logger.warning(f"VCF index not used: {e}")
+    return split_vcf(open_vcf(fileobj, binary=True), model_keys, samples=samples)
+
+
+def scan_indexed(fileobj, index_file, positions):
+    """
+    Read the VCF header and the records in the chunks of a BGZF compressed VCF that may
+    overlap the variant positions.
+    @param fileobj: binary file object of the BGZF compressed VCF
+    @param index_file: binary file object of the tabix or CSI index
+    @param positions: set of (chromosome, position)
+    @return: list of lines as bytes
+    @raise VcfIndexError: if the index can not be used
+    """
+    fileobj.seek(0)
+    if fileobj.read(4) != BGZF_HEADER:
+        raise VcfIndexError("the VCF file is not BGZF compressed")
+    fileobj.seek(0)
+    header = []
+    try:
+        for line in gzip.GzipFile(fileobj=fileobj, mode='rb'):
+            if not line.startswith(b'#'):
+                break
+            header.append(line)
+    except (OSError, EOFError, zlib.error) as e:
+        raise VcfIndexError(f"unable to read the VCF header: {e}")
+
+    index = VcfIndex.read(index_file, header=b"".join(header).decode('utf-8', errors='replace'))
+    tids = {normalise_chromosome(name): tid for tid, name in enumerate(index.names)}
+    chunks = []
+    for chrom, pos in positions:
+        if chrom in tids:
+            chunks.extend(index.get_chunks(tids[chrom], int(pos) - 1, int(pos)))
+    try:
+        return header + list(read_chunks(fileobj, merge_chunks(chunks)))
+    except (OSError, zlib.error) as e:
+        raise VcfIndexError(f"unable to read the indexed records: {e}")
@@ -0,0 +1,102 @@
+"""
+Fast JSON rendering of the model results, encoding with orjson, if it is installed, rather than
+the standard library json encoder used by the DRF JSONRenderer. The output decodes to the same
+values as that of the JSONRenderer and is the same byte for byte, except for floats written with
+an exponent, e.g. 1e-5 rather than 1e-05. It is used when FAST_JSON_OUTPUT is set, together with
+L{bws.serializers.fast_representation} in place of the DRF serializer representation.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import logging
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson when FAST_JSON_OUTPUT is set. Types orjson does not encode in
+    the same way as the DRF encoder (e.g. dates, decimals and lazy translation strings) are
+    passed to the DRF encoder. It falls back to the JSONRenderer if orjson is not installed,
+    indented output is requested or the data can not be encoded, e.g. a dictionary key that
+    is not a string.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or orjson is None or not getattr(settings, 'FAST_JSON_OUTPUT', False) or
+                self.ensure_ascii or
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except (TypeError, ValueError) as e:       # orjson.JSONEncodeError is a TypeError
+            logger.debug(f"orjson encoding failed, using the JSONRenderer: {e}")
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # escaped as by the JSONRenderer, see http://timelessrepo.com/json-isnt-a-javascript-subset
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+RISK_CURVES = ("cancer_risks", "baseline_cancer_risks", "lifetime_cancer_risk", "baseline_lifetime_cancer_risk",
+               "ten_yr_cancer_risk", "baseline_ten_yr_cancer_risk", "ten_yr_nhs_protocol")
+
+
+def to_columns(risks):
+    """
+    Convert a risk curve from a list of the risks at each age, e.g.
+    [{"age": 21, "breast cancer risk": {"decimal": 0.0001, "percent": 0.0}}, ...], to an array
+    of the ages and an array of the decimal risks for each cancer, e.g.
+    {"ages": [21, ...], "decimal": {"breast cancer risk": [0.0001, ...]}}. The percentages are
+    not included, they are the decimal risks x 100 rounded to 1 decimal place.
+    @param risks: list of the risks at each age
+    @return: dictionary of the ages and decimal risks
+    """
+    ages = []
+    decimals = {}
+    for row in risks:
+        for key, value in row.items():
+            if key == "age":
+                ages.append(value)
+            else:
+                decimals.setdefault(key, []).append(value["decimal"])
+    return {"ages": ages, "decimal": decimals}
+
+
+class CompactJSONRenderer(FastJSONRenderer):
+    """
+    Compact JSON format of the model results with the risk curves as columns, see L{to_columns}.
+    Selected with the Accept header, application/vnd.canrisk.compact+json, or the format query
+    parameter, ?format=compact.
+    """
+    media_type = 'application/vnd.canrisk.compact+json'
+    format = 'compact'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and isinstance(data.get("pedigree_result"), list):
+            data = dict(data)
+            data["pedigree_result"] = [
+                {k: (self.get_columns(v) if k in RISK_CURVES else v) for k, v in result.items()}
+                for result in data["pedigree_result"]
+            ]
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def get_columns(risks):
+        ''' Columns of a risk curve, a list of dictionaries or a L{bws.calc.results.RiskCurve}. '''
+        if hasattr(risks, 'to_columns'):
+            return risks.to_columns()
+        return to_columns(risks) if isinstance(risks, list) else risks
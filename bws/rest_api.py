@@ -7,33 +7,39 @@ SPDX-License-Identifier: GPL-3.0-or-later
 '''
 from copy import deepcopy
 import datetime
+import hashlib
 import logging
 import shutil
 import tempfile
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
-from django.http.response import JsonResponse
-from django.utils.translation import gettext_lazy as _
-from drf_spectacular.utils import extend_schema
+from django.http.response import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.translation import get_language, gettext_lazy as _
 from rest_framework import status, permissions, parsers
-from rest_framework.authentication import BasicAuthentication, TokenAuthentication, SessionAuthentication
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer  # , BrowsableAPIRenderer
+from rest_framework.renderers import TemplateHTMLRenderer  # , BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from bws.calc.calcs import Predictions
+from bws.authentication import CachedBasicAuthentication, CachedTokenAuthentication, has_any_perm
+from bws.calc.calcs import CostMeter, Predictions
 from bws.calc.model import ModelParams
 from bws.exceptions import ModelError, PedigreeError, CanRiskError
 from bws.pedigree_file import PedigreeFile, CanRiskPedigree, Prs
+from bws.renderers import CompactJSONRenderer, FastJSONRenderer
+import bws.result_store as result_store
+from bws.schema import ViewSchema, extend_schema
 from bws.risk_factors.bc import BCRiskFactors
 from bws.risk_factors.oc import OCRiskFactors
 from bws.risk_factors.pc import PCRiskFactors
 from bws.serializers import BwsInputSerializer, OutputSerializer, OwsInputSerializer, CombinedInputSerializer, \
-    CombinedOutputSerializer, PwsInputSerializer
-from bws.throttles import BurstRateThrottle, EndUserIDRateThrottle, SustainedRateThrottle
+    CombinedOutputSerializer, PwsInputSerializer, fast_representation
+from bws.throttles import CombinedRateThrottle, CostRateThrottle
 from bws.person import Female, Male
 
 
@@ -44,9 +50,8 @@ class RequiredAnyPermission(permissions.BasePermission):
     """ Check that one of the permissions is met in the class variable any_perms """
     def has_permission(self, request, view):
         def test_func(user):
-            for perm in view.any_perms:
-                if user.has_perm(perm):
-                    return True
+            if has_any_perm(user, view.any_perms):
+                return True
             raise PermissionDenied()
         return test_func(request.user)
 
@@ -54,15 +59,17 @@ class RequiredAnyPermission(permissions.BasePermission):
 class ModelWebServiceMixin(APIView):
 
     parser_classes = parsers.MultiPartParser, parsers.JSONParser, parsers.FormParser
-    renderer_classes = (JSONRenderer, )
-    authentication_classes = (SessionAuthentication, BasicAuthentication, TokenAuthentication, )
+    renderer_classes = (FastJSONRenderer, CompactJSONRenderer)
+    authentication_classes = (SessionAuthentication, CachedBasicAuthentication, CachedTokenAuthentication, )
+    schema = ViewSchema()      # documents the cached authentication, see bws.schema_extensions
     permission_classes = (IsAuthenticated, RequiredAnyPermission)
-    throttle_classes = [BurstRateThrottle, SustainedRateThrottle, EndUserIDRateThrottle]
+    throttle_classes = [CombinedRateThrottle, CostRateThrottle]
 
     def post_to_model(self, request, model_settings):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid(raise_exception=True):
             validated_data = serializer.validated_data
+            PedigreeFile.prevalidate(validated_data.get('pedigree_data'), model_settings['NAME'])
             pf = PedigreeFile(validated_data.get('pedigree_data'))
             params = ModelParams.factory(validated_data, model_settings)
 
@@ -83,6 +90,7 @@ class ModelWebServiceMixin(APIView):
             mname = model_settings['NAME']
             # note limit username string length used here to avoid paths too long for model code
             cwd = tempfile.mkdtemp(prefix=str(request.user)[:20]+"_", dir=settings.CWD_DIR)
+            cost_meter = CostMeter()
             try:
                 for pedi in pf.pedigrees:
                     if isinstance(pedi.get_target(), Male) and mname != "PC" and not pedi.is_carrier_probs_viable():
@@ -92,16 +100,17 @@ class ModelWebServiceMixin(APIView):
                         continue
 
                     try:
-                        pedigree_warnings = pedi.validateAll()
+                        pedigree_warnings = pedi.validateAll(collect=True)
                         warnings.extend(pedigree_warnings)
                     except CanRiskError as e:
                         # raise an error in the case of single pedigree and continue if there are multiple pedigrees
                         if len(pf.pedigrees) == 1:
                             raise
-                        m = f"{e.err}: {e.detail[e.err]}"
-                        if pedi.famid not in m:
-                            m = f"{e.err}: FamID:{pedi.famid}; {e.detail[e.err]}"
-                        errors.append(m)
+                        for err in e.errors:
+                            m = f"{err.err}: {err.detail[err.err]}"
+                            if pedi.famid not in m:
+                                m = f"{err.err}: FamID:{pedi.famid}; {err.detail[err.err]}"
+                            errors.append(m)
                         continue
 
                     risk_factor_code = 0
@@ -132,7 +141,8 @@ class ModelWebServiceMixin(APIView):
 
                     calcs = Predictions(pedi, model_params=this_params, risk_factor_code=risk_factor_code,
                                         hgt=this_hgt, mdensity=this_mdensity, prs=prs,
-                                        cwd=cwd, request=request, model_settings=model_settings)
+                                        cwd=cwd, request=request, model_settings=model_settings,
+                                        cost_meter=cost_meter)
                     target = pedi.get_target()
                     # Add input parameters and calculated results as attributes to 'this_pedigree'
                     this_pedigree = {}
@@ -176,12 +186,22 @@ class ModelWebServiceMixin(APIView):
                                     status=status.HTTP_400_BAD_REQUEST, safe=False)
             finally:
                 shutil.rmtree(cwd)
+                self.charge_cost(request, cost_meter.cost)   # including failed and timed out runs
                 # print(model_settings['NAME']+" :: "+cwd)
+            result_store.store(request.user, mname, output)
+            if settings.FAST_JSON_OUTPUT:
+                return Response(fast_representation(OutputSerializer, output), template_name='result_tab_gp.html')
             output_serialiser = OutputSerializer(output)
             return Response(output_serialiser.data, template_name='result_tab_gp.html')
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def charge_cost(self, request, cost):
+        ''' Charge the estimated CPU-seconds of the model runs to the cost based throttles. '''
+        for throttle in self.get_throttles():
+            if isinstance(throttle, CostRateThrottle):
+                throttle.charge(request, cost)
+
     def get_risk_factors(self, model_settings, risk_factor_code):
         ''' Get a dictionary of the decoded risk factor categories from the risk factor code. '''
         mname = model_settings['NAME']
@@ -268,18 +288,51 @@ class CombineModelResultsView(APIView):
     """
     renderer_classes = (TemplateHTMLRenderer, )
     serializer_class = CombinedInputSerializer
-    authentication_classes = (SessionAuthentication, BasicAuthentication, TokenAuthentication, )
+    authentication_classes = (SessionAuthentication, CachedBasicAuthentication, CachedTokenAuthentication, )
+    schema = ViewSchema()      # documents the cached authentication, see bws.schema_extensions
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (BurstRateThrottle, SustainedRateThrottle, EndUserIDRateThrottle)
+    throttle_classes = (CombinedRateThrottle, )
+    RESULTS = {'bws_result': 'BC', 'ows_result': 'OC', 'pws_result': 'PC'}     # results and model names
 
     @extend_schema(exclude=True)    # exclude from the swagger docs
     def post(self, request):
         """
         Web-service to combine results from the BOADICEA and Ovarian web-services to produce
-        HTML results.
+        HTML results. The results are posted or referenced with the result ids returned by the
+        web-services when the results are stored (RESULT_STORE_TIMEOUT).
         """
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid(raise_exception=True):
             validated_data = serializer.validated_data
-            output_serialiser = CombinedOutputSerializer(validated_data)
-            return Response(output_serialiser.data, template_name='results/tabs.html')
+            result_ids = {name: validated_data[name+'_id'] for name in self.RESULTS if name+'_id' in validated_data}
+            if not result_ids:
+                output_serialiser = CombinedOutputSerializer(validated_data)
+                return Response(output_serialiser.data, template_name='results/tabs.html')
+
+            # results stored by the server, the rendered tab is cached if all the results are stored
+            fragment_key = None
+            if not any(name in validated_data for name in self.RESULTS):
+                fragment_key = self.get_fragment_key(request, result_ids)
+                html = cache.get(fragment_key)
+                if html is not None:
+                    return HttpResponse(html)
+
+            results = {name: validated_data[name] for name in self.RESULTS if name in validated_data}
+            for name, result_id in result_ids.items():
+                output = result_store.load(request.user, result_id, self.RESULTS[name])
+                if output is None:
+                    raise ValidationError({name+'_id': "Results not found, they may have expired."})
+                results[name] = output
+            output_serialiser = CombinedOutputSerializer(results)
+            if fragment_key is None:
+                return Response(output_serialiser.data, template_name='results/tabs.html')
+            html = render_to_string('results/tabs.html', output_serialiser.data, request=request)
+            cache.set(fragment_key, html, timeout=settings.RESULT_FRAGMENT_TIMEOUT)
+            return HttpResponse(html)
+
+    @staticmethod
+    def get_fragment_key(request, result_ids):
+        ''' Cache key of the results tab rendered from stored results for the user and language. '''
+        ids = ",".join(f"{name}={result_ids[name]}" for name in sorted(result_ids))
+        digest = hashlib.sha256(f"{request.user.pk}|{get_language()}|{ids}".encode('utf-8')).hexdigest()
+        return f"bws_tabs:{digest}"
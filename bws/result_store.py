@@ -0,0 +1,63 @@
+"""
+Store of the cancer model results in the Django cache, so that the combined results tab can
+be rendered from a reference to the results (see CombineModelResultsView) rather than the
+client posting back the results. The results are stored as returned by the model, with the
+columnar risk curves (bws.calc.results), for RESULT_STORE_TIMEOUT seconds. Results are only
+returned to the user that ran the calculation.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+KEY_PREFIX = "bws_result:"
+
+
+def is_enabled():
+    ''' Check if the results are stored, i.e. RESULT_STORE_TIMEOUT is set. '''
+    return bool(getattr(settings, 'RESULT_STORE_TIMEOUT', None))
+
+
+def store(user, mname, output):
+    """
+    Store the results of a model calculation and add the result id to the output.
+    @param user: user that ran the calculation
+    @param mname: model name, e.g. 'BC'
+    @param output: model output
+    @return: result id, or None if the results are not stored
+    """
+    if not is_enabled():
+        return None
+    result_id = uuid.uuid4().hex
+    output["result_id"] = result_id
+    try:
+        cache.set(KEY_PREFIX + result_id, (user.pk, mname, output), timeout=settings.RESULT_STORE_TIMEOUT)
+    except Exception as e:      # e.g. the results are too large for the cache
+        logger.warning(f"results {result_id} not stored: {e}")
+        del output["result_id"]
+        return None
+    return result_id
+
+
+def load(user, result_id, mname=None):
+    """
+    Get stored model results.
+    @param user: user requesting the results
+    @param result_id: result id
+    @keyword mname: model name the results must be from, e.g. 'BC'
+    @return: model output, or None if not found, expired or not the user's results
+    """
+    entry = cache.get(KEY_PREFIX + result_id)
+    if entry is None:
+        return None
+    owner, model, output = entry
+    if owner != user.pk or (mname is not None and model != mname):
+        return None
+    return output
@@ -4,9 +4,27 @@ SPDX-FileCopyrightText: 2023 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 
+from bisect import bisect_left
+import operator
 import re
+
 from bws.exceptions import RiskFactorError
-import operator
+
+
+_LOOKUP_TABLES = {}       # compiled category lookup tables keyed by risk factor class and isreal
+
+
+def get_numpy():
+    """
+    Import NumPy on first use, it is only needed for the bulk L{RiskFactors.encode_many} and
+    L{RiskFactors.decode_many} and is not loaded when the web-services are imported.
+    @return: numpy module or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
 
 class RiskFactor(object):
@@ -54,30 +72,80 @@ class RiskFactor(object):
 
     @classmethod
     def get_category(cls, val, isreal=False):
-        ''' Get category for risk factor. This assumes the categories a'''
+        ''' Get category for risk factor. The categories are searched by bisection of the
+        boundaries compiled by L{get_lookup_table}; None is returned if no category matches. '''
         if isinstance(val, str):
             val = val.strip()
         if val == 'NA' or val == '-':
             return 0
         try:
             val = cls.get_num(val, isreal)
-            for idx, cat in enumerate(cls.cats):
-                if cat == '-':
-                    continue
-
-                if '-' in cat:
-                    rng = cat.split("-")
-                    if rng[0][0] not in cls.OPS:
-                        rng[0] = ">="+rng[0]
-                    if rng[1][0] not in cls.OPS:
-                        rng[1] = "<="+rng[1]
-                    if cls.eval(val, rng[0], isreal) and cls.eval(val, rng[1], isreal):
-                        return idx
-                elif cls.eval(val, cat, isreal):
-                    return idx
-        except Exception as e:
-            print(e)
+            bounds, idxs = cls.get_lookup_table(isreal)
+        except Exception:
             raise RiskFactorError("Unknown category for: "+cls.__name__)
+        if val != val:              # NaN is not in any category
+            return None
+        i = bisect_left(bounds, val)
+        if i < len(bounds) and bounds[i] == val:
+            return idxs[2*i+1]      # value on a boundary
+        return idxs[2*i]            # value between boundaries
+
+    @classmethod
+    def get_lookup_table(cls, isreal=False):
+        '''
+        Get the category lookup table, compiled once from the category strings, e.g. '<11',
+        '18.5-<25' or '>=30'. The boundaries split the number line into points and the open
+        intervals between them; each of these is assigned the first category that contains it.
+        @keyword isreal: categories with real rather than integer boundaries
+        @return: sorted boundaries and category index of the interval before, at and after each boundary
+        '''
+        key = (cls, isreal)
+        table = _LOOKUP_TABLES.get(key)
+        if table is not None:
+            return table
+
+        conditions = []
+        for idx, cat in enumerate(cls.cats):
+            if cat == '-':
+                continue
+            if '-' in cat:
+                rng = cat.split("-")
+                if rng[0][0] not in cls.OPS:
+                    rng[0] = ">="+rng[0]
+                if rng[1][0] not in cls.OPS:
+                    rng[1] = "<="+rng[1]
+                cond = [cls._parse_bound(rng[0], isreal), cls._parse_bound(rng[1], isreal)]
+            else:
+                cond = [cls._parse_bound(cat, isreal)]
+            if None not in cond:
+                conditions.append((idx, cond))
+
+        def first_match(val):
+            for idx, cond in conditions:
+                if all(op(val, num) for op, num in cond):
+                    return idx
+            return None
+
+        bounds = sorted(set(num for _idx, cond in conditions for _op, num in cond))
+        idxs = []
+        for i, b in enumerate(bounds):
+            prev = bounds[i-1] if i > 0 else b - 1
+            idxs.append(first_match((prev + b) / 2))
+            idxs.append(first_match(b))
+        idxs.append(first_match(bounds[-1] + 1 if bounds else 0))
+        table = _LOOKUP_TABLES[key] = (bounds, idxs)
+        return table
+
+    @classmethod
+    def _parse_bound(cls, expr, isreal):
+        ''' Parse an operand at the start of a string and a number, e.g. <3, into (operator, number). '''
+        for op in ('<=', '>=', '<', '>'):
+            if expr.startswith(op):
+                return (cls.OPS[op], cls.get_num(expr[len(op):], isreal))
+        try:
+            return (cls.OPS["="], cls.get_num(expr, isreal))
+        except ValueError:
+            return None
 
     @classmethod
     def get_num(cls, val, isreal):
@@ -183,10 +251,65 @@ class RiskFactors(object):
         dividend = factor
         category = []
         for i in range(n_factors):
-            category.append(int(dividend % (n_categories[i] + 1)))
-            dividend = (dividend - category[-1]) / (n_categories[i] + 1)
+            dividend, cat = divmod(dividend, n_categories[i] + 1)
+            category.append(cat)
         return category
 
+    @classmethod
+    def encode_many(cls, risk_categories):
+        '''
+        Encode rows of risk categories into risk factor codes, see L{encode}.
+        @param risk_categories: 2-d array-like with a row of categories for each code
+        @return: NumPy array of risk factor codes
+        '''
+        np = get_numpy()
+        if np is None:
+            raise RiskFactorError("NumPy is required to encode multiple risk factors.")
+        n_categories = np.array(list(cls.categories.values()), dtype=np.int64)
+        cats = np.asarray(risk_categories)
+        if cats.ndim != 2 or cats.shape[1] != len(n_categories):
+            raise RiskFactorError("Incorrect number of risk factors specified.\n" +
+                                  "Expecting {} risk factors, {} supplied.".format(
+                                      len(n_categories), cats.shape[-1] if cats.ndim > 0 else 0))
+        try:
+            cats = cats.astype(np.float64).astype(np.int64)
+        except (TypeError, ValueError):
+            raise RiskFactorError("Risk factor categories cannot be converted to integers.")
+        out_of_range = (cats < 0) | (cats > n_categories)
+        if out_of_range.any():
+            row, col = np.argwhere(out_of_range)[0]
+            raise RiskFactorError("Risk factor ({}) out of range, {} > {}".format(
+                cls.risk_factors[col].space_name(), cats[row, col], n_categories[col]))
+
+        # mixed radix: each factor is multiplied by the product of the preceding radices
+        multiplicands = np.cumprod(np.concatenate(([1], n_categories[:-1] + 1)))[:len(n_categories)]
+        return cats @ multiplicands
+
+    @classmethod
+    def decode_many(cls, factors):
+        '''
+        Decode risk factor codes into rows of risk categories, see L{decode}.
+        @param factors: 1-d array-like of risk factor codes
+        @return: NumPy array with a row of categories for each code
+        '''
+        np = get_numpy()
+        if np is None:
+            raise RiskFactorError("NumPy is required to decode multiple risk factors.")
+        n_categories = list(cls.categories.values())
+        try:
+            dividend = np.asarray(factors, dtype=np.int64).reshape(-1)
+        except (TypeError, ValueError):
+            raise RiskFactorError("Risk factor codes cannot be converted to integers.")
+        max_factor = cls.get_max_factor()
+        if dividend.size > 0 and (dividend.min() < 0 or dividend.max() > max_factor):
+            bad = dividend[(dividend < 0) | (dividend > max_factor)][0]
+            raise RiskFactorError("Error: factor out of range, {} not in 0-{}".format(bad, max_factor))
+
+        cats = np.empty((dividend.size, len(n_categories)), dtype=np.int64)
+        for i, n in enumerate(n_categories):
+            dividend, cats[:, i] = np.divmod(dividend, n + 1)
+        return cats
+
     @classmethod
     def get_max_factor(cls):
         ''' Calcaulate the maximum allowed risk factor code. '''
@@ -197,10 +320,25 @@ class RiskFactors(object):
         max_factor -= 1
         return max_factor
 
+    @classmethod
+    def get_names(cls):
+        '''
+        Get the dictionary of risk factor class names, snake case names and synonyms, see
+        L{RiskFactor.isclass}, to the index of the risk factors with that name.
+        '''
+        names = cls.__dict__.get('_names')
+        if names is None:
+            names = {}
+            for idx, rf in enumerate(cls.risk_factors):
+                for name in [rf.__name__.lower(), rf.snake_name().lower()] + list(getattr(rf, 'synonyms', [])):
+                    if idx not in names.setdefault(name, []):
+                        names[name].append(idx)
+            cls._names = names
+        return names
+
     def add_category(self, name, val):
         '''
         Given a risk factor name and value add to the category
         '''
-        for idx, rf in enumerate(self.risk_factors):
-            if rf.isclass(name):
-                self.cats[idx] = rf.get_category(val)
+        for idx in self.get_names().get(name, ()):
+            self.cats[idx] = self.risk_factors[idx].get_category(val)
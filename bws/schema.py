@@ -0,0 +1,78 @@
+"""
+OpenAPI schema annotation of the web-service views that defers importing drf_spectacular,
+which takes longer to import than the rest of the web-services, until the schema is generated.
+This keeps it out of the start up of the web workers and management commands.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections.abc import MutableMapping
+
+from rest_framework.schemas.inspectors import DefaultSchema
+
+
+class LazySchemaKwargs(MutableMapping):
+    """
+    View method kwargs, as set by drf_spectacular's extend_schema on a view method, where the
+    extended schema class is only built with drf_spectacular when the kwargs are first read.
+    """
+
+    def __init__(self, schema_kwargs):
+        """
+        @param schema_kwargs: extend_schema arguments
+        """
+        self.schema_kwargs = schema_kwargs
+        self._kwargs = None
+
+    def _get_kwargs(self):
+        if self._kwargs is None:
+            from drf_spectacular.utils import extend_schema as spectacular_extend_schema
+
+            def method():
+                pass
+            self._kwargs = spectacular_extend_schema(**self.schema_kwargs)(method).kwargs
+        return self._kwargs
+
+    def __getitem__(self, key):
+        return self._get_kwargs()[key]
+
+    def __setitem__(self, key, value):
+        self._get_kwargs()[key] = value
+
+    def __delitem__(self, key):
+        del self._get_kwargs()[key]
+
+    def __iter__(self):
+        return iter(self._get_kwargs())
+
+    def __len__(self):
+        return len(self._get_kwargs())
+
+
+def extend_schema(**kwargs):
+    """
+    Decorator of a view method with the same arguments as drf_spectacular.utils.extend_schema,
+    e.g. @extend_schema(request=BwsInputSerializer, responses=OutputSerializer) or
+    @extend_schema(exclude=True) to exclude it from the swagger docs.
+    @return: decorator
+    """
+    def decorator(f):
+        f.kwargs = LazySchemaKwargs(kwargs)
+        return f
+    return decorator
+
+
+class ViewSchema(DefaultSchema):
+    """
+    View schema, as the DRF DefaultSchema, that first registers the drf_spectacular extensions
+    of the web-service classes (see L{bws.schema_extensions}), e.g. so that the cached basic
+    authentication is documented as basicAuth. The schema is only used when it is generated.
+    """
+
+    def __get__(self, instance, owner):
+        try:
+            import bws.schema_extensions    # noqa: F401
+        except ImportError:                 # drf_spectacular not installed
+            pass
+        return super().__get__(instance, owner)
@@ -0,0 +1,14 @@
+"""
+drf_spectacular extensions for the web-service classes, registered when they are defined. They
+are imported by L{bws.schema.ViewSchema} when the schema is generated.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from drf_spectacular.authentication import BasicScheme
+
+
+class CachedBasicScheme(BasicScheme):
+    ''' Basic authentication (basicAuth) security scheme of the cached basic authentication. '''
+    target_class = 'bws.authentication.CachedBasicAuthentication'
@@ -0,0 +1,111 @@
+'''
+Benchmark the time to import the web-service modules, as in the start up of the web workers,
+using python -X importtime. Django and the REST framework are imported first, as they are by
+the web workers and management commands, so that the time reported for each module is that
+of the module and the dependencies it brings in. The modules that should only be loaded on
+first use (e.g. NumPy, drf_spectacular and vcf2prs) are reported if they are imported.
+
+Usage:
+export DJANGO_SETTINGS_MODULE=bws.settings
+python3 -m bws.scripts.benchmark_imports -r 5
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+'''
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+# web-service modules imported by the web workers
+MODULES = ('bws.rest_api', 'bws.vcf2prs_api')
+# cumulative import time budget in milliseconds, checked by bws.tests.test_imports when
+# BWS_IMPORT_BUDGET is set in the environment
+BUDGETS = {
+    'bws.rest_api': 75,
+}
+# modules imported on first use rather than when the web-services are imported
+DEFERRED = ('numpy', 'drf_spectacular.utils', 'vcf2prs.myPyVCF')
+# imported before the module being benchmarked
+PRELOAD = ('rest_framework.views', 'rest_framework.serializers', 'django.template.loader')
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    """
+    Parse the python -X importtime output.
+    @param output: stderr of the python process
+    @return: dictionary of the module name and the self and cumulative import time in microseconds
+    """
+    times = {}
+    for line in output.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            times[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return times
+
+
+def get_import_times(module, preload=PRELOAD):
+    """
+    Import a module in a new python process and get the import times.
+    @param module: module name, e.g. bws.rest_api
+    @keyword preload: modules imported before the module
+    @return: dictionary of the module name and the self and cumulative import time in microseconds
+    """
+    code = "import django; django.setup(); " + "".join(f"import {m}; " for m in preload) + f"import {module}"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
+    times = parse_importtime(proc.stderr)
+    if proc.returncode != 0 or module not in times:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise ImportError(f"unable to import {module}: {errors[-1] if errors else proc.returncode}")
+    return times
+
+
+def get_import_time(module, repeat=3):
+    """
+    Get the minimum cumulative import time of a module and the deferred modules it imports.
+    @param module: module name, e.g. bws.rest_api
+    @keyword repeat: number of times the import is measured
+    @return: import time in milliseconds and a list of the deferred modules imported
+    """
+    best = None
+    for _i in range(repeat):
+        times = get_import_times(module)
+        elapsed = times[module][1] / 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, [m for m in DEFERRED if m in times]
+
+
+def benchmark(modules, repeat):
+    """
+    Report the import times of the modules against their budgets.
+    @return: True if all the modules are imported within budget
+    """
+    ok = True
+    for module in modules:
+        try:
+            elapsed, deferred = get_import_time(module, repeat)
+        except ImportError as e:
+            print(f"{module}: not benchmarked: {e}")
+            continue
+        budget = BUDGETS.get(module)
+        over = budget is not None and elapsed > budget
+        ok = ok and not over and not deferred
+        print(f"{module}: import time={elapsed:.1f}ms" +
+              (f"; budget={budget}ms{' EXCEEDED' if over else ''}" if budget is not None else "") +
+              (f"; imported {', '.join(deferred)}" if deferred else ""))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Web-service import time benchmark")
+    parser.add_argument("modules", nargs="*", default=list(MODULES), help="modules to import")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of times each import is measured")
+    args = parser.parse_args()
+    sys.exit(0 if benchmark(args.modules, args.repeat) else 1)
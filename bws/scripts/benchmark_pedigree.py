@@ -0,0 +1,107 @@
+'''
+Memory and throughput benchmark for parsing and holding pedigrees in memory.
+A synthetic CanRisk 4 pedigree of MAX_PEDIGREE_SIZE (275) family members is
+parsed repeatedly and the parsed pedigrees are retained to measure the memory
+used per family member.
+
+Usage:
+export DJANGO_SETTINGS_MODULE=bws.settings
+python3 -m bws.scripts.benchmark_pedigree -n 2000
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+'''
+import argparse
+import gc
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+
+from bws.pedigree_file import PedigreeFile
+
+
+COLUMNS = ("##FamID\tName\tTarget\tIndivID\tFathID\tMothID\tSex\tMZtwin\tDead\tAge\tYob\t"
+           "BC1\tBC2\tOC\tPRO\tPAN\tAshkn\tBRCA1\tBRCA2\tPALB2\tATM\tCHEK2\tBARD1\tRAD51D\tRAD51C\t"
+           "BRIP1\tHOXB13\tER:PR:HER2:CK14:CK56")
+
+
+def get_pedigree_data(size=None, famid="BENCH"):
+    '''
+    Generate a CanRisk 4 pedigree with the given number of family members. Each family
+    member is given a partner and up to four children until the size is reached, so that
+    everyone is connected to the target.
+    '''
+    size = settings.MAX_PEDIGREE_SIZE if size is None else size
+    people = []
+
+    def add(sex, fathid="0", mothid="0", yob=1900):
+        pid = f"P{len(people)}"
+        idx = len(people)
+        age = 2020 - yob
+        bc1 = str(30 + idx % (age - 29)) if sex == 'F' and idx % 7 == 0 and age > 30 else "0"
+        gtest = "S:N" if idx % 11 == 0 else "0:0"
+        path = "N:N:0:0:0" if bc1 != "0" else "0:0:0:0:0"
+        people.append([famid, f"n{idx}", "0", pid, fathid, mothid, sex, "0", "0", str(age), str(yob),
+                       bc1, "0", "0", "0", "0", "0"] + [gtest] + ["0:0"] * 9 + [path])
+        return pid
+
+    queue = [(add('M'), 'M', 1900)]
+    while queue and len(people) < size - 1:
+        pid, sex, yob = queue.pop(0)
+        partner = add('F' if sex == 'M' else 'M', yob=yob)
+        fathid, mothid = (pid, partner) if sex == 'M' else (partner, pid)
+        for i in range(4):
+            if len(people) >= size:
+                break
+            child_sex = 'F' if i % 2 == 0 else 'M'
+            queue.append((add(child_sex, fathid, mothid, yob + 25 + i), child_sex, yob + 25 + i))
+    if len(people) < size:
+        add('F', fathid, mothid, yob + 29)
+    people[-1][2] = "1"             # youngest family member is the target
+    return "##CanRisk 4.0\n" + COLUMNS + "\n" + "\n".join("\t".join(p) for p in people) + "\n"
+
+
+def benchmark(npedigrees, size=None):
+    '''
+    Parse and retain npedigrees pedigrees, reporting throughput and memory used. The
+    memory is measured in a second pass as tracing allocations slows the parsing.
+    '''
+    data = get_pedigree_data(size)
+    gc.collect()
+    start = time.perf_counter()
+    pedigrees = [PedigreeFile(data).pedigrees[0] for _i in range(npedigrees)]
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in pedigrees:
+        p.validateAll()
+    validation_elapsed = time.perf_counter() - start
+    del pedigrees
+
+    gc.collect()
+    tracemalloc.start()
+    pedigrees = [PedigreeFile(data).pedigrees[0] for _i in range(npedigrees)]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    npeople = sum(len(p.people) for p in pedigrees)
+    print(f"pedigrees={npedigrees}; family members={npeople}")
+    print(f"elapsed time={elapsed:.3f}s; pedigrees/s={npedigrees/elapsed:.1f}; "
+          f"family members/s={npeople/elapsed:.0f}")
+    print(f"validation time={validation_elapsed:.3f}s; pedigrees/s={npedigrees/validation_elapsed:.1f}")
+    print(f"retained memory={current/1024/1024:.1f}MiB; peak memory={peak/1024/1024:.1f}MiB; "
+          f"bytes per family member={current/npeople:.0f}")
+    return elapsed, current, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pedigree memory and throughput benchmark")
+    parser.add_argument("-n", type=int, default=2000, help="number of pedigrees to build")
+    parser.add_argument("-s", "--size", type=int, default=None,
+                        help="pedigree size (default: MAX_PEDIGREE_SIZE)")
+    args = parser.parse_args()
+    django.setup()
+    benchmark(args.n, args.size)
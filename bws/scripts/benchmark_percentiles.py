@@ -0,0 +1,86 @@
+'''
+Benchmark the per-item cost of converting PRS z-scores to percentiles, one at a time
+with statistics.NormalDist (as each Zscore2PercentView request did) and as a list in
+a single call. If vcf2prs is installed the cost through the view is also measured.
+
+Usage:
+export DJANGO_SETTINGS_MODULE=bws.settings
+python3 -m bws.scripts.benchmark_percentiles -n 100000
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+'''
+import argparse
+import random
+from statistics import NormalDist
+import time
+
+import django
+
+from bws.percentiles import get_percentages
+
+
+def report(label, elapsed, nitems):
+    print(f"{label}: elapsed time={elapsed:.4f}s; per item={elapsed/nitems*1e6:.3f}us")
+
+
+def benchmark_view(zscores, repeat):
+    '''
+    Measure the cost per z-score through Zscore2PercentView, posting one z-score
+    per request and all the z-scores in one request.
+    '''
+    try:
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from django.contrib.auth.models import User
+        from bws.vcf2prs_api import Zscore2PercentView
+    except ImportError as e:
+        print(f"view not benchmarked: {e}")
+        return
+
+    factory = APIRequestFactory()
+    user = User(username="benchmark", is_superuser=True)
+    view = Zscore2PercentView.as_view(throttle_classes=())
+
+    def post(data):
+        request = factory.post('/zscore2percent/', data, format='json')
+        force_authenticate(request, user=user)
+        return view(request)
+
+    start = time.perf_counter()
+    for z in zscores[:repeat]:
+        post({'zscore': z})
+    report("view, one z-score per request", time.perf_counter() - start, repeat)
+
+    start = time.perf_counter()
+    post({'zscores': zscores})
+    report(f"view, {len(zscores)} z-scores in one request", time.perf_counter() - start, len(zscores))
+
+
+def benchmark(nitems, repeat=1000):
+    zscores = [random.gauss(0, 1) for _i in range(nitems)]
+
+    start = time.perf_counter()
+    [NormalDist().cdf(z) * 100.0 for z in zscores]
+    report("NormalDist, one at a time", time.perf_counter() - start, nitems)
+
+    start = time.perf_counter()
+    get_percentages(zscores)
+    report("get_percentages", time.perf_counter() - start, nitems)
+
+    alphas = [0.45] * nitems
+    start = time.perf_counter()
+    get_percentages([0.45 * z for z in zscores], alphas)
+    report("get_percentages, alpha-adjusted", time.perf_counter() - start, nitems)
+
+    benchmark_view(zscores[:min(nitems, 10000)], min(nitems, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PRS z-score to percentile benchmark")
+    parser.add_argument("-n", type=int, default=100000, help="number of z-scores")
+    parser.add_argument("-r", "--repeat", type=int, default=1000,
+                        help="number of single z-score requests to the view")
+    args = parser.parse_args()
+    django.setup()
+    benchmark(args.n, args.repeat)
@@ -11,7 +11,7 @@ import io
 from django.conf import settings
 from django.core.files.base import File
 from rest_framework import serializers
-from rest_framework.fields import JSONField
+from rest_framework.fields import JSONField, _UnvalidatedField
 
 
 class FileField(serializers.FileField):
@@ -130,16 +130,31 @@ class OutputSerializer(serializers.Serializer):
     mutation_frequency = serializers.DictField(read_only=True, help_text="Pathogenic variant frequencies")
     mutation_sensitivity = serializers.DictField(read_only=True, help_text="Test sensitivity")
     cancer_incidence_rates = serializers.CharField(read_only=True, help_text="Cancer incidence rates")
+    result_id = serializers.CharField(read_only=True, required=False,
+                                      help_text="Stored results reference, see CombineModelResultsView")
     warnings = serializers.ListField(read_only=True, required=False, help_text="Advisories")
     errors = serializers.ListField(read_only=True, required=False, help_text="Errors")
     pedigree_result = PedigreeResultSerializer(read_only=True, many=True, help_text="Results")
 
 
 class CombinedInputSerializer(serializers.Serializer):
-    ''' Results from ovarian, breast and prostate cancer models. '''
-    ows_result = serializers.JSONField(required=True)
-    bws_result = serializers.JSONField(required=True)
+    '''
+    Results from ovarian, breast and prostate cancer models, or the result ids of the results
+    stored by the server (see bws.result_store).
+    '''
+    ows_result = serializers.JSONField(required=False)
+    bws_result = serializers.JSONField(required=False)
     pws_result = serializers.JSONField(required=False)
+    ows_result_id = serializers.CharField(required=False, max_length=64)
+    bws_result_id = serializers.CharField(required=False, max_length=64)
+    pws_result_id = serializers.CharField(required=False, max_length=64)
+
+    def validate(self, attrs):
+        ''' Check the ovarian and breast cancer results or their result ids are given. '''
+        for name in ('ows_result', 'bws_result'):
+            if name not in attrs and name+'_id' not in attrs:
+                raise serializers.ValidationError({name: serializers.Field.default_error_messages['required']})
+        return attrs
 
 
 class CombinedOutputSerializer(serializers.Serializer):
@@ -147,3 +162,64 @@ class CombinedOutputSerializer(serializers.Serializer):
     ows_result = OutputSerializer(read_only=True)
     bws_result = OutputSerializer(read_only=True)
     pws_result = OutputSerializer(read_only=True, required=False)
+
+
+_representation_plans = {}
+
+
+def _get_representation_plan(serializer_class):
+    ''' Get the field name, kind of representation and nested serializer class of each readable field. '''
+    plan = _representation_plans.get(serializer_class)
+    if plan is None:
+        plan = []
+        for field in serializer_class()._readable_fields:
+            nested = None
+            if isinstance(field, serializers.ListSerializer):
+                kind, nested = 'many', type(field.child)
+            elif isinstance(field, serializers.Serializer):
+                kind, nested = 'nested', type(field)
+            elif isinstance(field, serializers.ListField) and isinstance(field.child, _UnvalidatedField):
+                kind = 'list'
+            elif isinstance(field, serializers.DictField) and isinstance(field.child, _UnvalidatedField):
+                kind = 'dict'
+            elif type(field) is serializers.CharField:
+                kind = 'str'
+            else:
+                kind = field
+            plan.append((field.field_name, kind, nested))
+        _representation_plans[serializer_class] = plan
+    return plan
+
+
+def fast_representation(serializer_class, instance):
+    """
+    Representation of a result dictionary with the fields of a read only serializer, e.g.
+    OutputSerializer, the same as serializer_class(instance).data but without calling
+    each field for the lists and dictionaries of already validated results. Columnar results
+    are not converted to lists of dictionaries, the JSON encoder uses their tolist().
+    @param serializer_class: serializer class
+    @param instance: dictionary of the results
+    @return: dictionary of primitive data types
+    """
+    ret = {}
+    for name, kind, nested in _get_representation_plan(serializer_class):
+        try:
+            value = instance[name]
+        except KeyError:
+            continue
+        if value is None:
+            ret[name] = None
+        elif kind == 'many':
+            ret[name] = [fast_representation(nested, v) for v in value]
+        elif kind == 'nested':
+            ret[name] = fast_representation(nested, value)
+        elif kind == 'list':
+            # columnar results (bws.calc.results) are kept for the renderer to encode
+            ret[name] = value if isinstance(value, list) or hasattr(value, 'tolist') else list(value)
+        elif kind == 'dict':
+            ret[name] = {str(k): v for k, v in value.items()}
+        elif kind == 'str':
+            ret[name] = str(value)
+        else:
+            ret[name] = kind.to_representation(value)
+    return ret
@@ -9,10 +9,7 @@ import os
 import re
 from pathlib import Path
 
-try:
-    import vcf2prs
-except ImportError as e:
-    pass  # module doesn't exist, deal with it.
+from bws.prs_alpha import PrsAlpha
 
 
 def line_that_contain(s1, s2, fp):
@@ -22,6 +19,10 @@ def line_that_contain(s1, s2, fp):
 def get_alpha(ref_file):
     ''' Get PRS alpha from a reference file header. '''
     alpha = ""
+    try:
+        import vcf2prs      # imported on first use rather than when the settings are loaded
+    except ImportError:
+        return alpha        # module doesn't exist, deal with it.
     try:
         moduledir = Path(vcf2prs.__file__).parent.parent
         ref_file = os.path.join(moduledir, "PRSmodels_CanRisk", ref_file)
@@ -36,13 +37,18 @@ def get_alpha(ref_file):
         pass
     return alpha
 
-def get_prs_alpha_dict(model):
-    ''' Get a dictionary of PRS name and alpha values '''
+def get_prs_alpha_dict(model, lazy=False):
+    '''
+    Get a dictionary of PRS name and alpha values. If lazy, the alphas are read from the
+    reference files when they are first used, see L{bws.prs_alpha.PrsAlpha}.
+    '''
     r = model['PRS_REFERENCE_FILES']
     ref_files = (r['EUROPEAN'] + r['AFRICAN'] + r['EAST_ASIAN'] + r['SOUTH_ASIAN'])
     rkeys = [k for k, _v in ref_files]
     # validate keys are unique
     assert len(rkeys) == len(set(rkeys)), 'PRS_REFERENCE_FILES keys are not unique'
+    if lazy:
+        return PrsAlpha(ref_files, loader=get_alpha)
     return { k: get_alpha(v) if isinstance(v, str) else v['alpha'] for k, v in ref_files }
 
 
@@ -50,6 +56,18 @@ def get_prs_alpha_dict(model):
 FORTRAN_HOME = "/home/tim/boadicea/"
 FORTRAN_TIMEOUT = 60*4   # seconds
 CWD_DIR = "/tmp"
+# content-addressed store of model parameter and batch files shared by calculations (None to disable);
+# it is only used if the directory is owned by and only writable by the web-service user
+MODEL_FILE_STORE = os.path.join(CWD_DIR, "bws_model_files")
+
+# PRS alpha index file generated with ./manage.py prs_alpha_index (None to read the reference files)
+PRS_ALPHA_INDEX = None
+
+# cache of parsed PRS reference models, loaded as they are first used, and optionally limit the memory
+# used; set PRS_MODEL_CACHE_WARM to load all the reference models when a web-server process starts (this
+# is skipped for management commands, other than runserver)
+PRS_MODEL_CACHE_WARM = False
+PRS_MODEL_CACHE_MAX_BYTES = None
 
 # Environment variables for OpenBLAS (http://www.openblas.net)
 FORTRAN_ENV = os.environ.copy()
@@ -211,7 +229,7 @@ BC_MODEL = {
     },
 }
 BC_MODEL["INCIDENCE"] = os.path.join(BC_MODEL["HOME"], 'Data') + "/incidences_"
-BC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(BC_MODEL)
+BC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(BC_MODEL, lazy=True)
 
 #
 # OVARIAN CANCER MODEL
@@ -313,7 +331,7 @@ OC_MODEL = {
     }
 }
 OC_MODEL["INCIDENCE"] = os.path.join(OC_MODEL["HOME"], 'Data') + "/incidences_"
-OC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(OC_MODEL)
+OC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(OC_MODEL, lazy=True)
 
 
 #
@@ -389,7 +407,7 @@ PC_MODEL = {
     }
 }
 PC_MODEL["INCIDENCE"] = os.path.join(PC_MODEL["HOME"], 'Data') + "/incidences_"
-PC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(PC_MODEL)
+PC_MODEL['PRS_ALPHA'] = get_prs_alpha_dict(PC_MODEL, lazy=True)
 
 # Minimum allowable BRCA1/2 mutation is set to 0.0001. We should not allow zero, because if
 # there is a mutation it will give an inconsistency, and we know that zero is unrealistic.
@@ -407,10 +425,31 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'sustained': '6000/day',
         'burst': '250/min',
-        'enduser_burst': '150/min'
+        'enduser_burst': '150/min',
+        # budget of estimated model CPU-seconds, see CostRateThrottle; not limited until MODEL_RUN_COST
+        # has been calibrated, e.g.
+        # 'cpu_seconds': '3600/day'
     }
 }
 
+# seconds to keep the model results so that the combined results tab can be rendered from the
+# result ids (see bws.result_store), None to not store the results; and seconds to cache the
+# combined results tab rendered from result ids
+RESULT_STORE_TIMEOUT = None
+RESULT_FRAGMENT_TIMEOUT = 300
+
+# render the model results with bws.serializers.fast_representation and orjson (if installed)
+# rather than the OutputSerializer and the json module, see bws.renderers.FastJSONRenderer
+FAST_JSON_OUTPUT = False
+
+# seconds to cache verified API credentials (basic and token authentication) and user
+# permissions, see bws.authentication; None to check them on every request
+AUTH_CACHE_TIMEOUT = None
+
+# estimated CPU-seconds of a model run, a fixed cost for each run and a cost for each person in the
+# pedigree for each calculation (ModelOpts), compare with the elapsed time in the CALCULATIONS log
+MODEL_RUN_COST = {'RUN': 0.1, 'PERSON_CALC': 0.002}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'CanRisk API',
     'DESCRIPTION': ("CanRisk API for models to calculate breast, ovarian and prostate cancer risks "
@@ -434,4 +473,8 @@ ALTCHA_HMAC_KEY = 'secret-hmac-key'
 ALTCHA_ALGORITHM = os.getenv('ALTCHA_ALGORITHM', 'PBKDF2/SHA-256')
 ALTCHA_COST = int(os.getenv('ALTCHA_COST', '5000'))
 ALTCHA_EXPIRY_SECONDS = int(os.getenv('ALTCHA_EXPIRY_SECONDS', '1800'))
+# number of pre-generated challenges held by each worker process, 0 to create each challenge
+# when it is requested, and the maximum age in seconds of a pooled challenge when it is issued
+ALTCHA_POOL_SIZE = int(os.getenv('ALTCHA_POOL_SIZE', '0'))
+ALTCHA_POOL_MAX_AGE = int(os.getenv('ALTCHA_POOL_MAX_AGE', '300'))
 
@@ -4,11 +4,14 @@ SPDX-FileCopyrightText: 2026 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 
+from io import StringIO
 import time
 
 import pytest
 from altcha import Challenge, Payload, solve_challenge, verify_solution
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import override_settings
 from django.test.testcases import TestCase
 from django.urls import reverse
@@ -16,6 +19,9 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from unittest.mock import patch, MagicMock
 
+from bws.altcha import ChallengePool, SpentChallenges, new_challenge, verify_payload
+import bws.metrics as metrics
+
 
 class AltchaWebServices(TestCase):
     ''' Test the altcha webservice '''
@@ -196,3 +202,118 @@ class AltchaWebServices(TestCase):
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         # Should contain error message
         self.assertIn('error', response.json())
+
+
+class ChallengePoolTests(TestCase):
+    ''' Test the pool of pre-generated challenges '''
+
+    def setUp(self):
+        metrics.reset(ChallengePool.METRICS)
+        self.now = 1000.0
+        self.pool = ChallengePool(4, 300, timer=lambda: self.now)
+
+    @pytest.mark.req_WS_CORE_202
+    def test_pool_issues_each_challenge_once(self):
+        ''' Test challenges are taken from the pool once, and the pool is refilled. '''
+        self.assertIsNone(self.pool.pop())
+        self.assertEqual(self.pool.fill(), 4)
+        challenges = [self.pool.pop() for _i in range(4)]
+        self.assertEqual(len({c['parameters']['nonce'] for c in challenges}), 4)
+        self.assertIsNone(self.pool.pop())
+        self.assertEqual(self.pool.fill(), 4)
+        self.assertEqual(self.pool.stats()['depth'], 4)
+        self.assertEqual(self.pool.stats()['generated'], 8)
+        self.assertDictEqual(metrics.get_counts(ChallengePool.METRICS),
+                             {"altcha_pool_hit": 4, "altcha_pool_miss": 2,
+                              "altcha_pool_generated": 8, "altcha_pool_discarded": 0})
+
+    @pytest.mark.req_WS_CORE_202
+    def test_pool_discards_old_challenges(self):
+        ''' Test challenges older than the maximum age are not issued. '''
+        self.pool.fill()
+        self.now += 301
+        self.assertIsNone(self.pool.pop())
+        self.assertEqual(self.pool.fill(), 4)
+        self.assertEqual(metrics.get_counts(["altcha_pool_discarded"])["altcha_pool_discarded"], 4)
+
+    @pytest.mark.req_WS_CORE_202
+    def test_pool_discards_changed_settings(self):
+        ''' Test challenges created with different settings are not issued. '''
+        self.pool.fill()
+        with override_settings(ALTCHA_COST=10):
+            self.assertIsNone(self.pool.pop())
+            self.pool.fill()
+            self.assertEqual(self.pool.pop()['parameters']['cost'], 10)
+
+    @pytest.mark.req_WS_CORE_202
+    @override_settings(ALTCHA_POOL_SIZE=4, ALTCHA_COST=10)
+    def test_challenge_view_uses_pool(self):
+        ''' Test a pooled challenge issued by the endpoint can be solved and verified. '''
+        pool = ChallengePool(4, 300)
+        pool.fill()
+        with patch('bws.altcha.get_pool', return_value=pool), patch('bws.altcha.create_challenge') as mock_create:
+            challenge = Challenge.from_dict(APIClient().get(reverse('altcha')).json())
+        mock_create.assert_not_called()
+        payload = Payload(challenge=challenge, solution=solve_challenge(challenge)).to_base64()
+        self.assertTrue(verify_solution(payload, settings.ALTCHA_HMAC_KEY).verified)
+
+    @pytest.mark.req_WS_CORE_202
+    def test_pool_stats_logged(self):
+        ''' Test the pool depth and generation rate are logged. '''
+        self.pool.fill()
+        with self.assertLogs('bws.altcha', level='INFO') as logs:
+            self.pool.log_stats()
+        self.assertRegex(logs.output[0], r"depth=4; generated=4; rate=\d+/s")
+
+    @pytest.mark.req_WS_CORE_202
+    def test_metrics_command(self):
+        ''' Test the pool counters are reported by the bws_metrics command and can be reset. '''
+        self.pool.fill()
+        self.pool.pop()
+        out = StringIO()
+        call_command('bws_metrics', '--reset', stdout=out)
+        self.assertIn("altcha_pool_generated: 4", out.getvalue())
+        self.assertIn("altcha_pool_hit: 1", out.getvalue())
+        self.assertEqual(sum(metrics.get_counts(ChallengePool.METRICS).values()), 0)
+
+
+@override_settings(ALTCHA_COST=10)
+class SpentChallengesTests(TestCase):
+    ''' Test solved challenges can not be replayed '''
+
+    def setUp(self):
+        cache.clear()
+        self.now = time.time()
+        self.store = SpentChallenges(timer=lambda: self.now)
+
+    def get_payload(self):
+        challenge = Challenge.from_dict(new_challenge())
+        return Payload(challenge=challenge, solution=solve_challenge(challenge)).to_base64()
+
+    @pytest.mark.req_WS_CORE_203
+    def test_replay_rejected(self):
+        ''' Test a solution is accepted once and other solutions are still accepted. '''
+        payload = self.get_payload()
+        self.assertTrue(verify_payload(payload, store=self.store).verified)
+        result = verify_payload(payload, store=self.store)
+        self.assertFalse(result.verified)
+        self.assertIsNotNone(result.error)
+        self.assertTrue(verify_payload(self.get_payload(), store=self.store).verified)
+
+    @pytest.mark.req_WS_CORE_203
+    def test_invalid_not_spent(self):
+        ''' Test a payload that fails verification does not spend its challenge. '''
+        payload = self.get_payload()
+        self.assertFalse(verify_payload(payload, hmac_secret='not-the-hmac-key', store=self.store).verified)
+        self.assertTrue(verify_payload(payload, store=self.store).verified)
+        self.assertFalse(verify_payload('not-a-payload', store=self.store).verified)
+
+    @pytest.mark.req_WS_CORE_203
+    def test_spent_expires_with_challenge(self):
+        ''' Test a spent challenge is kept only until the challenge expires. '''
+        challenge = Challenge.from_dict(new_challenge())
+        with patch.object(cache, 'add', wraps=cache.add) as mock_add:
+            self.assertTrue(self.store.spend(challenge))
+        self.assertFalse(self.store.spend(challenge))
+        timeout = mock_add.call_args.kwargs['timeout']
+        self.assertLessEqual(abs(timeout - settings.ALTCHA_EXPIRY_SECONDS), 2)
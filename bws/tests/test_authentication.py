@@ -0,0 +1,116 @@
+"""
+Credential and permission caching tests.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from bws.authentication import CachedBasicAuthentication, CachedTokenAuthentication, has_any_perm
+from bws.rest_api import BwsView
+
+
+@override_settings(AUTH_CACHE_TIMEOUT=60)
+class AuthCacheTests(TestCase):
+    ''' Tests for the cached basic and token authentication and permissions '''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('auth_cache_user', password='testing1')
+        self.perm = Permission.objects.get(codename='add_user')
+
+    def authenticate(self, password='testing1'):
+        with patch('django.contrib.auth.base_user.check_password', wraps=check_password) as mock_check:
+            user, _auth = CachedBasicAuthentication().authenticate_credentials('auth_cache_user', password)
+        return user, mock_check.call_count
+
+    @pytest.mark.req_UTILITIES_010
+    def test_basic_cached(self):
+        ''' Ensure the password hasher is run once for repeated basic authentication '''
+        self.assertEqual(self.authenticate(), (self.user, 1))
+        self.assertEqual(self.authenticate(), (self.user, 0))
+
+    @pytest.mark.req_UTILITIES_010
+    def test_basic_wrong_password(self):
+        ''' Ensure a wrong password is not accepted or cached '''
+        self.authenticate()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('wrong')
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('wrong')
+
+    @pytest.mark.req_UTILITIES_010
+    def test_password_change(self):
+        ''' Ensure a cached password is not accepted after the password is changed '''
+        self.authenticate()
+        self.user.set_password('testing2')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertEqual(self.authenticate('testing2'), (self.user, 1))
+
+    @pytest.mark.req_UTILITIES_010
+    @override_settings(AUTH_CACHE_TIMEOUT=None)
+    def test_disabled(self):
+        ''' Ensure credentials are checked on every request when the cache is not enabled '''
+        self.assertEqual(self.authenticate(), (self.user, 1))
+        self.assertEqual(self.authenticate(), (self.user, 1))
+
+    @pytest.mark.req_UTILITIES_010
+    def test_token(self):
+        ''' Ensure a token is looked up once and not accepted after it is deleted '''
+        token = Token.objects.create(user=self.user)
+        auth = CachedTokenAuthentication()
+        self.assertEqual(auth.authenticate_credentials(token.key), (self.user, token))
+        with patch.object(TokenAuthentication, 'authenticate_credentials') as mock_auth:
+            self.assertEqual(auth.authenticate_credentials(token.key)[0], self.user)
+        mock_auth.assert_not_called()
+        key = token.key
+        token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            auth.authenticate_credentials(key)
+
+    @pytest.mark.req_UTILITIES_010
+    def test_permissions(self):
+        ''' Ensure the cached permissions are updated when user or group permissions change '''
+        perms = ['auth.add_user']
+        self.assertFalse(has_any_perm(User.objects.get(pk=self.user.pk), perms))
+        self.user.user_permissions.add(self.perm)
+        self.assertTrue(has_any_perm(User.objects.get(pk=self.user.pk), perms))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(has_any_perm(user, perms))
+
+        self.user.user_permissions.remove(self.perm)
+        group = Group.objects.create(name='auth_cache_group')
+        self.user.groups.add(group)
+        self.assertFalse(has_any_perm(User.objects.get(pk=self.user.pk), perms))
+        group.permissions.add(self.perm)
+        self.assertTrue(has_any_perm(User.objects.get(pk=self.user.pk), perms))
+
+
+class AuthSchemaTests(SimpleTestCase):
+    ''' Test the cached authentication is documented in the OpenAPI schema '''
+
+    @pytest.mark.req_UTILITIES_010
+    def test_security_schemes(self):
+        ''' Ensure the basic and token authentication are in the schema security '''
+        from drf_spectacular.generators import SchemaGenerator
+        patterns = [path('boadicea/', BwsView.as_view())]
+        schema = SchemaGenerator(patterns=patterns).get_schema(request=None, public=True)
+        self.assertIn('basicAuth', schema['components']['securitySchemes'])
+        self.assertIn('tokenAuth', schema['components']['securitySchemes'])
+        security = schema['paths']['/boadicea/']['post']['security']
+        self.assertIn({'basicAuth': []}, security)
+        self.assertIn({'tokenAuth': []}, security)
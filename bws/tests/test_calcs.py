@@ -6,18 +6,25 @@ SPDX-FileCopyrightText: 2026 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 import os
+import shutil
+import tempfile
 
 import pytest
 from collections import OrderedDict
 from unittest.mock import MagicMock, patch, mock_open
-from django.test import TestCase, RequestFactory
+from django.conf import settings
+from django.test import TestCase, RequestFactory, override_settings
 from rest_framework.request import Request
 from rest_framework.exceptions import ValidationError
 
 from bws.exceptions import TimeOutException, ModelError
-from bws.calc.calcs import Predictions
+from bws.calc.calcs import CostMeter, Predictions
 from bws.calc.model import ModelParams, ModelOpts
-from bws.pedigree import Pedigree
+from bws.calc.results import CarrierProbabilities, RiskCurve
+import bws.calc.model_files as model_files
+from bws.cancer import Cancers
+from bws.pedigree import Pedigree, BwaPedigree
+from bws.person import Female
 
 
 # ---------------------------------------------------------------------------
@@ -435,6 +442,30 @@ class TestRun(TestCase):
                 model=PC_MODEL_SETTINGS,
             )
 
+    @pytest.mark.req_UTILITIES_009
+    @patch("bws.calc.calcs.model_files.get_param_file")
+    @patch("bws.calc.calcs.model_files.get_batch_file")
+    @patch.object(Predictions, "run", side_effect=TimeOutException())
+    def test_cost_of_timed_out_run(self, _run, _batch_file, _param_file):
+        ''' The cost of a model run is added to the request cost meter before it is run,
+            so a run that times out is included in the cost charged to the user. '''
+        p = self._make_predictions_stub()
+        p.model_settings = BC_MODEL_SETTINGS
+        p.model_params = self._base_model_params()
+        p.request = make_mock_request()
+        p.cwd = "/tmp"
+        p.niceness = 0
+        p.cost_meter = CostMeter()
+        risk = MagicMock()
+        risk.get_pedigree.return_value = make_mock_pedigree(size=10)
+        risk.type.return_value = "Risk"
+        opts = ModelOpts(probs=True, rj=False, rl=True, rr=False, ry=False)
+
+        with self.assertRaises(TimeOutException):
+            p._run_risk(risk, opts)
+        self.assertEqual(p.cost_meter.cost, opts.get_cost(10))
+        self.assertEqual(p.cost, opts.get_cost(10))
+
 
 class TestParseRisksOutput(TestCase):
     ''' Tests for the _parse_risks_output function, which takes the raw output
@@ -858,3 +889,145 @@ class TestRunRisksIntegration(TestCase):
         mock_run_risk.return_value = (None, None, None, None, None)
         p._run_risks()
         self.assertEqual(p.version, "5.0")
+
+
+class TestModelFileStore(TestCase):
+    ''' Tests for the content-addressed store of model parameter and batch files. '''
+
+    def setUp(self):
+        self.store = tempfile.mkdtemp(prefix="TEST_STORE_", dir="/tmp")
+        self.cwd = tempfile.mkdtemp(prefix="TEST_", dir="/tmp")
+        target = Female("FAM1", "F0", "001", "002", "003", target="1", age="40", yob="1985", cancers=Cancers())
+        self.pedigree = BwaPedigree(people=[target])
+        self.pedigree.add_parents(target)
+        self.override = override_settings(MODEL_FILE_STORE=self.store)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.store)
+        shutil.rmtree(self.cwd)
+
+    def _param_kwargs(self):
+        return {"model_settings": settings.BC_MODEL,
+                "mutation_freq": settings.BC_MODEL['MUTATION_FREQUENCIES']['UK'],
+                "sensitivity": settings.BC_MODEL['GENETIC_TEST_SENSITIVITY']['DEFAULT'],
+                "isashk": False}
+
+    @pytest.mark.req_WS_CORE_116
+    def test_param_file_stored_once(self):
+        ''' The same model parameters should give the same read-only file in the store with
+        the same contents as the file written by write_param_file. '''
+        path1 = model_files.get_param_file(self.pedigree, os.path.join(self.cwd, "a.params"), **self._param_kwargs())
+        path2 = model_files.get_param_file(self.pedigree, os.path.join(self.cwd, "b.params"), **self._param_kwargs())
+        self.assertEqual(path1, path2)
+        self.assertEqual(os.path.dirname(path1), self.store)
+        self.assertEqual(os.stat(path1).st_mode & 0o777, 0o444)
+        written = self.pedigree.write_param_file(filepath=os.path.join(self.cwd, "c.params"), **self._param_kwargs())
+        with open(path1) as f1, open(written) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        kwargs = dict(self._param_kwargs(), isashk=True)
+        path3 = model_files.get_param_file(self.pedigree, os.path.join(self.cwd, "d.params"), **kwargs)
+        self.assertNotEqual(path1, path3)
+
+    @pytest.mark.req_WS_CORE_116
+    def test_batch_file_shared_between_working_directories(self):
+        ''' Batch files refer to the pedigree file in the working directory, so are shared
+        between calculations with the same risk ages. '''
+        path1 = model_files.get_batch_file(self.pedigree, os.path.join(self.cwd, "Risk_risk.ped"),
+                                           os.path.join(self.cwd, "Risk_risk.bat"))
+        path2 = model_files.get_batch_file(self.pedigree, "/tmp/another/Risk_risk.ped",
+                                           "/tmp/another/Risk_risk.bat")
+        self.assertEqual(path1, path2)
+        with open(path1) as f:
+            self.assertIn("\nRisk_risk.ped\n", f.read())
+        path3 = model_files.get_batch_file(self.pedigree, os.path.join(self.cwd, "Risk_risk.ped"),
+                                           os.path.join(self.cwd, "Risk_risk.bat"), calc_ages=[50])
+        self.assertNotEqual(path1, path3)
+
+    @pytest.mark.req_WS_CORE_116
+    def test_mismatched_file_not_used(self):
+        ''' A file in the store that does not match its hash should not be used. '''
+        content = self.pedigree.get_param_file_content(**self._param_kwargs())
+        path = model_files.get_stored_file(content, ".params")
+        model_files._stored.discard(path)
+        os.chmod(path, 0o644)
+        with open(path, "w") as f:
+            f.write("tampered")
+        filepath = os.path.join(self.cwd, "a.params")
+        self.assertEqual(model_files.get_param_file(self.pedigree, filepath, **self._param_kwargs()), filepath)
+        with open(filepath) as f:
+            self.assertEqual(f.read(), content)
+
+    @pytest.mark.req_WS_CORE_116
+    def test_removed_file_written_again(self):
+        ''' A stored file that has been removed, e.g. by a tmp cleaner, should be written again. '''
+        content = self.pedigree.get_param_file_content(**self._param_kwargs())
+        path = model_files.get_stored_file(content, ".params")
+        os.remove(path)
+        self.assertEqual(model_files.get_stored_file(content, ".params"), path)
+        with open(path) as f:
+            self.assertEqual(f.read(), content)
+
+    @pytest.mark.req_WS_CORE_116
+    def test_shared_store_not_used(self):
+        ''' A store directory that other users can write to should not be used. '''
+        os.chmod(self.store, 0o777)
+        filepath = os.path.join(self.cwd, "a.params")
+        self.assertEqual(model_files.get_param_file(self.pedigree, filepath, **self._param_kwargs()), filepath)
+        self.assertEqual(os.listdir(self.store), [])
+
+    @pytest.mark.req_WS_CORE_116
+    def test_store_disabled(self):
+        ''' With the store disabled the files are written to the working directory. '''
+        with override_settings(MODEL_FILE_STORE=None):
+            filepath = os.path.join(self.cwd, "a.params")
+            self.assertEqual(model_files.get_param_file(self.pedigree, filepath, **self._param_kwargs()), filepath)
+            pedfile = os.path.join(self.cwd, "Risk_risk.ped")
+            batfile = os.path.join(self.cwd, "Risk_risk.bat")
+            self.assertEqual(model_files.get_batch_file(self.pedigree, pedfile, batfile), batfile)
+            with open(batfile) as f:
+                self.assertIn(pedfile, f.read())
+
+
+class TestColumnarResults(TestCase):
+    ''' Tests for the columnar RiskCurve and CarrierProbabilities results of the output parser,
+    which build the legacy list of dictionaries only when it is used. '''
+
+    @pytest.mark.req_WS_CORE_119
+    def test_risk_curve_columns(self):
+        ''' The parsed risks are held as arrays of the ages and decimal risks. '''
+        p = object.__new__(Predictions)
+        p.model_settings = BC_MODEL_SETTINGS
+        opts = MagicMock(spec=ModelOpts)
+        opts.rr = True
+        opts.rl = opts.ry = opts.rj = opts.probs = False
+        _rl, rr, _ry, _rj, _mp = p._parse_risks_output("## REMAINING LIFETIME RISK\n,50,0.10\n,51,0.1234\n", opts)
+        self.assertIsInstance(rr, RiskCurve)
+        self.assertEqual(rr.ages, [50, 51])
+        self.assertEqual(rr.decimals, [0.10, 0.1234])
+        self.assertIsNone(rr._rows)
+        self.assertDictEqual(rr.to_columns(), {"ages": [50, 51], "decimal": {"breast cancer risk": [0.10, 0.1234]}})
+
+    @pytest.mark.req_WS_CORE_119
+    def test_risk_curve_legacy_rows(self):
+        ''' The legacy rows are built when used and are the same as the dictionaries previously parsed. '''
+        curve = RiskCurve("breast cancer risk")
+        curve.append(50, 0.1234)
+        legacy = [OrderedDict([("age", 50), ("breast cancer risk", {"decimal": 0.1234, "percent": 12.3})])]
+        self.assertEqual(curve, legacy)
+        self.assertEqual(curve.tolist(), legacy)
+        self.assertEqual(list(curve), legacy)
+        curve.append(51, 0.2)
+        self.assertEqual(curve[-1]["age"], 51)
+        self.assertEqual(len(curve), 2)
+
+    @pytest.mark.req_WS_CORE_119
+    def test_carrier_probabilities(self):
+        ''' The carrier probabilities are held as a gene list and a probability array. '''
+        mp = Predictions._parse_probs_output(TestParseProbsOutput.BC_PROBS, BC_MODEL_SETTINGS)
+        self.assertIsInstance(mp, CarrierProbabilities)
+        self.assertEqual(mp.genes, ["no mutation"] + BC_MODEL_SETTINGS["GENES"])
+        self.assertEqual(mp.to_columns()["decimal"][0], 0.9821809)
+        self.assertEqual(mp[1], {"BRCA1": {"decimal": 0.0012713, "percent": 0.13}})
@@ -131,3 +131,17 @@ class TestCancerUnit(TestCase):
         person.cancers = Cancers(prc=Cancer('30'))
         with self.assertRaisesRegex(CancerError, "female but has been assigned an prostate cancer diagnosis"):
             Cancers.validate(person)
+
+    def test_compact_storage_string_views(self):
+        """Test that coded cancer ages and test results are read back as strings."""
+        self.assertEqual(Cancer('AU').age, 'AU')
+        self.assertEqual(Cancer().age, '-1')
+        self.assertEqual(Cancer('-2').age, '-2')
+        self.assertEqual(Cancer('abc').age, 'abc')
+        gt = GeneticTest('T', 'HOM', isHOXB13=True)
+        self.assertEqual((gt.test_type, gt.result), ('T', 'HOM'))
+        gt.result = 'X'
+        self.assertEqual(gt.result, 'X')
+        self.assertEqual(PathologyTest('1', 'N').result, 'N')
+        self.assertIs(Cancers().diagnoses.__class__, Cancers(bc1=Cancer('40')).diagnoses.__class__)
+        self.assertFalse(hasattr(Cancers(), '__dict__'))
@@ -0,0 +1,106 @@
+"""
+Test the canonical form and digest of pedigrees.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from io import StringIO
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+import pytest
+
+from bws.pedigree_file import PedigreeFile
+
+
+class CanonicalFormTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(CanonicalFormTests, cls).setUpClass()
+        with open(os.path.join(os.path.dirname(__file__), 'data', 'd7.canrisk4'), 'r') as f:
+            cls.pedigree_data = f.read()
+
+    @classmethod
+    def relabel(cls, pedigree_data, ids, names=None, reverse=False):
+        ''' Change the family, individual IDs and names, and optionally reverse the order of the rows. '''
+        header, rows = [], []
+        for line in pedigree_data.strip().split('\n'):
+            if line.startswith('##'):
+                header.append(line)
+                continue
+            cols = line.split('\t')
+            cols[0] = 'NEWFAM'
+            cols[3:6] = [ids.get(c, c) for c in cols[3:6]]
+            if names:
+                cols[1] = names.get(cols[1], cols[1])
+            rows.append('\t'.join(cols))
+        if reverse:
+            rows.reverse()
+        return '\n'.join(header + rows)
+
+    @classmethod
+    def digest(cls, pedigree_data):
+        return PedigreeFile(pedigree_data).pedigrees[0].get_digest()
+
+    @pytest.mark.req_UTILITIES_005
+    def test_digest_ignores_identifiers(self):
+        ''' Test that the digest is the same when the names, IDs and row order change. '''
+        ids = {'PB': 'a1', 'PM': 'a2', 'PF': 'a3', 'PGA': 'a4', 'PGO': 'a5'}
+        names = {'F1': 'proband', '202': 'mum', '201': 'dad'}
+        self.assertEqual(self.digest(self.pedigree_data),
+                         self.digest(self.relabel(self.pedigree_data, ids, names=names, reverse=True)))
+
+    @pytest.mark.req_UTILITIES_005
+    def test_digest_ignores_formatting(self):
+        ''' Test that the digest is the same when padding numbers and the field delimiter change. '''
+        padded = self.pedigree_data.replace('\t45\t1979\t', '\t045\t1979\t')
+        self.assertEqual(self.digest(self.pedigree_data), self.digest(padded))
+        spaces = '\n'.join(line if line.startswith('##') else line.replace('\t', '  ')
+                           for line in self.pedigree_data.split('\n'))
+        self.assertEqual(self.digest(self.pedigree_data), self.digest(spaces))
+
+    @pytest.mark.req_UTILITIES_005
+    def test_digest_differs(self):
+        ''' Test that the digest changes when the family data or risk factors change. '''
+        digest = self.digest(self.pedigree_data)
+        self.assertNotEqual(digest, self.digest(self.pedigree_data.replace('\t55\t0\t0\t0\t0\t0\tS:N\tS:P',
+                                                                           '\t56\t0\t0\t0\t0\t0\tS:N\tS:P')))
+        self.assertNotEqual(digest, self.digest(self.pedigree_data.replace('##BMI=24.58', '##BMI=30')))
+        self.assertNotEqual(digest, self.digest(self.pedigree_data.replace('##height=177', '##height=160')))
+
+    @pytest.mark.req_UTILITIES_005
+    def test_digest_structure(self):
+        ''' Test that the digest depends on the pedigree structure, here the side of the family
+        that the affected grandmother is on. '''
+        swapped = self.pedigree_data.replace('\tPM\t0\t0\t', '\tPM\tPGA\tPGO\t').replace(
+            '\tPF\tPGA\tPGO\t', '\tPF\t0\t0\t')
+        self.assertNotEqual(self.digest(self.pedigree_data), self.digest(swapped))
+
+    @pytest.mark.req_UTILITIES_005
+    def test_pedigree_duplicates_command(self):
+        ''' Test the management command reporting the duplicate rate in a directory of pedigrees. '''
+        tmpdir = tempfile.mkdtemp(prefix="canonical_")
+        try:
+            ids = {'PB': 'b1', 'PM': 'b2', 'PF': 'b3', 'PGA': 'b4', 'PGO': 'b5'}
+            files = {'a.canrisk4': self.pedigree_data,
+                     'b.canrisk4': self.relabel(self.pedigree_data, ids, reverse=True),
+                     'c.canrisk4': self.pedigree_data.replace('##BMI=24.58', '##BMI=30'),
+                     'd.txt': 'not a pedigree'}
+            for name, data in files.items():
+                with open(os.path.join(tmpdir, name), 'w') as f:
+                    f.write(data)
+            out = StringIO()
+            call_command('pedigree_duplicates', tmpdir, stdout=out)
+            output = out.getvalue()
+            self.assertIn("files: 3", output)
+            self.assertIn("skipped: 1", output)
+            self.assertIn("pedigrees: 3", output)
+            self.assertIn("unique: 2", output)
+            self.assertIn("duplicate rate: 33.3%", output)
+        finally:
+            shutil.rmtree(tmpdir)
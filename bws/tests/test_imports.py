@@ -0,0 +1,44 @@
+"""
+Test the web-service import time and that the slow to import dependencies are loaded on first use.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import os
+import unittest
+
+from django.test import TestCase
+import pytest
+from rest_framework.settings import api_settings
+
+from bws.altcha import ChallengeView
+from bws.rest_api import BwsView
+from bws.schema import LazySchemaKwargs
+from bws.scripts.benchmark_imports import BUDGETS, get_import_time
+
+
+class ImportTimeTests(TestCase):
+
+    @pytest.mark.req_UTILITIES_011
+    def test_rest_api_deferred_imports(self):
+        ''' Test importing the web-services does not load the deferred modules. '''
+        _elapsed, deferred = get_import_time('bws.rest_api', repeat=1)
+        self.assertEqual(deferred, [])
+
+    @pytest.mark.req_UTILITIES_011
+    @unittest.skipUnless(os.environ.get('BWS_IMPORT_BUDGET'), "set BWS_IMPORT_BUDGET to check the import time budget")
+    def test_rest_api_import_time(self):
+        ''' Test importing the web-services is within budget, a wall-clock check only run on request. '''
+        elapsed, _deferred = get_import_time('bws.rest_api')
+        self.assertLessEqual(elapsed, BUDGETS['bws.rest_api'])
+
+    @pytest.mark.req_UTILITIES_011
+    def test_lazy_schema(self):
+        ''' Test the view method schema is built when it is first used by the schema generator. '''
+        kwargs = BwsView.post.kwargs
+        self.assertIsInstance(kwargs, LazySchemaKwargs)
+        schema = kwargs.get('schema')
+        self.assertTrue(issubclass(schema, api_settings.DEFAULT_SCHEMA_CLASS))
+        self.assertIs(kwargs['schema'], schema)
+        self.assertIn('schema', ChallengeView.get.kwargs)
@@ -17,6 +17,7 @@ from django.conf import settings
 
 from bws.cancer import Cancers, Cancer, BWSGeneticTests, CanRiskGeneticTests, GeneticTest, PathologyTests, PathologyTest
 from bws.pedigree import BwaPedigree, CanRiskPedigree
+from bws.pedigree_file import PedigreeFile
 from bws.person import Male, Female
 from bws.risk_factors.ethnicity import ONSEthnicity
 from bws.risk_factors.mdensity import Volpara, Birads, Stratus
@@ -436,3 +437,63 @@ class PedigreeInitializationTests(TestCase):
         self.assertTrue(father.pid.startswith("001"))
         self.assertTrue(mother.pid.startswith("001"))
         self.assertEqual(len(pedigree.people), 3)
+
+
+class PedigreeFileRendererTests(TestCase):
+    """Test the fortran pedigree files are identical to the reference files in data/fortran."""
+
+    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+    FORTRAN_DIR = os.path.join(DATA_DIR, 'fortran')
+    PEDIGREES = ['d2.canrisk', 'd3.bwa', 'd7.canrisk4', 'd9.canrisk4', 'd10.canrisk4', 'd11.canrisk4',
+                 'male.canrisk3', os.path.join('multi', 'd0.213x.canrisk2'), os.path.join('fortran', 'au.canrisk4')]
+    MODELS = [settings.BC_MODEL, settings.OC_MODEL, settings.PC_MODEL]
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp(prefix="TEST_", dir="/tmp")
+
+    def tearDown(self):
+        TestCase.tearDown(self)
+        shutil.rmtree(self.cwd)
+
+    @classmethod
+    def write_pedigree_file(cls, fname, model_settings, filepath):
+        """ Write the fortran pedigree file for the first pedigree in a test data file. """
+        with open(os.path.join(cls.DATA_DIR, fname), 'r') as f:
+            pedigree = PedigreeFile(f.read()).pedigrees[0]
+        mname = model_settings['NAME']
+        rfcode = pedigree.get_rfcode(mname) if isinstance(pedigree, CanRiskPedigree) else '0'
+        return pedigree.write_pedigree_file(risk_factor_code=rfcode if rfcode is not None else '0',
+                                            hgt=getattr(pedigree, 'hgt', -1),
+                                            mdensity=getattr(pedigree, 'mdensity', None) if mname == 'BC' else None,
+                                            prs=(pedigree.get_prs(mname)
+                                                 if isinstance(pedigree, CanRiskPedigree) else None),
+                                            filepath=filepath, model_settings=model_settings)
+
+    @classmethod
+    def reference_name(cls, fname, model_settings):
+        return os.path.basename(fname) + '.' + model_settings['NAME'].lower() + '.ped'
+
+    @pytest.mark.req_WS_CORE_201
+    def test_byte_equality(self):
+        """Test the pedigree files for each model are byte for byte identical to the reference files."""
+        for fname in self.PEDIGREES:
+            for model_settings in self.MODELS:
+                ref = os.path.join(self.FORTRAN_DIR, self.reference_name(fname, model_settings))
+                with self.subTest(ref=ref):
+                    result = self.write_pedigree_file(fname, model_settings, os.path.join(self.cwd, "test.ped"))
+                    with open(result, 'rb') as f1, open(ref, 'rb') as f2:
+                        self.assertEqual(f1.read(), f2.read())
+
+    @pytest.mark.req_WS_CORE_201
+    def test_rendered_in_memory(self):
+        """Test the rendered pedigree file string matches the written file."""
+        from bws.pedigree_renderer import PedigreeFileFormat
+        with open(os.path.join(self.DATA_DIR, 'd7.canrisk4'), 'r') as f:
+            pedigree = PedigreeFile(f.read()).pedigrees[0]
+        fmt = PedigreeFileFormat.get(settings.BC_MODEL)
+        self.assertIs(fmt, PedigreeFileFormat.get(settings.BC_MODEL))
+        rendered = fmt.render(pedigree, risk_factor_code=pedigree.bc_risk_factor_code, hgt=pedigree.hgt)
+        result = pedigree.write_pedigree_file(risk_factor_code=pedigree.bc_risk_factor_code, hgt=pedigree.hgt,
+                                              filepath=os.path.join(self.cwd, "test.ped"))
+        with open(result, 'r') as f:
+            self.assertEqual(f.read(), rendered)
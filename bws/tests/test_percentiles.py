@@ -0,0 +1,35 @@
+"""
+Test the conversion of PRS z-scores to percentiles.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from statistics import NormalDist
+
+from django.test import TestCase
+import pytest
+
+from bws.percentiles import get_percentage, get_percentages
+
+
+class PercentilesTests(TestCase):
+    ZSCORES = [-8.0, -2.5, -1.0, -0.1, 0.0, 0.3, 1.0, 1.96, 4.0, 8.0]
+
+    @pytest.mark.req_WS_VALIDATION_266
+    def test_normal_dist(self):
+        ''' Test the percentages match statistics.NormalDist. '''
+        expected = [NormalDist().cdf(z) * 100.0 for z in self.ZSCORES]
+        self.assertListEqual(get_percentages(self.ZSCORES), expected)
+        self.assertListEqual([get_percentage(z) for z in self.ZSCORES], expected)
+        self.assertEqual(get_percentage(0), 50.0)
+
+    @pytest.mark.req_WS_VALIDATION_266
+    def test_alpha_adjusted(self):
+        ''' Test alpha-adjusted scores are converted back to z-scores. '''
+        alphas = [0.45, 0.5, 0.8]
+        scores = [a * z for a, z in zip(alphas, [-1.0, 0.3, 1.96])]
+        for p, z in zip(get_percentages(scores, alphas), [-1.0, 0.3, 1.96]):
+            self.assertAlmostEqual(p, NormalDist().cdf(z) * 100.0)
+        with self.assertRaises(ValueError):
+            get_percentages(scores, alphas[:2])
@@ -188,4 +188,29 @@ class PersonAshknFlagValidationTests(TestCase):
         apedigree = pf.pedigrees[0]
         person = apedigree.get_person_by_name('F1')
         person.ashkn = '1'
-        person.validate(apedigree)
\ No newline at end of file
+        person.validate(apedigree)
+
+
+class PersonCompactStorageTests(TestCase):
+    """ Tests for the slotted, integer coded storage of Person fields. """
+
+    @pytest.mark.req_WS_VALIDATION_259
+    def test_no_instance_dict(self):
+        """ Male and Female instances are slotted and have no instance dictionary. """
+        self.assertFalse(hasattr(Male('FAM1', 'M1', 'P01', '0', '0'), '__dict__'))
+        self.assertFalse(hasattr(Female('FAM1', 'F1', 'P02', '0', '0'), '__dict__'))
+
+    @pytest.mark.req_WS_VALIDATION_259
+    def test_string_views(self):
+        """ Integer coded fields are read back as the strings they were given as. """
+        p = Female('FAM1', 'F1', 'P01', '0', '0', target='1', dead='1', age='45', yob='1970', ashkn='0')
+        self.assertEqual((p.target, p.dead, p.age, p.yob, p.ashkn), ('1', '1', '45', '1970', '0'))
+        p.age = 78
+        self.assertEqual(p.age, '78')
+
+    @pytest.mark.req_WS_VALIDATION_259
+    def test_non_canonical_values_kept(self):
+        """ Values that are not canonical integers are kept as given for validation. """
+        p = Female('FAM1', 'F1', 'P01', '0', '0', age='045', yob='19x0')
+        self.assertEqual(p.age, '045')
+        self.assertEqual(p.yob, '19x0')
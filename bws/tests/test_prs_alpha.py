@@ -0,0 +1,67 @@
+"""
+Test the lazily read PRS alpha values and the PRS alpha index file.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+import pytest
+
+from bws.prs_alpha import PrsAlpha, write_index
+
+
+class PrsAlphaTests(TestCase):
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp(prefix="TEST_PRS_ALPHA_", dir="/tmp")
+        self.loads = []
+        for name in ("A.prs", "B.prs"):
+            with open(os.path.join(self.cwd, name), 'w') as f:
+                f.write("alpha = 0.5\n")
+        self.ref_files = [('A', 'A.prs'), ('B', 'B.prs'), ('C', {'alpha': 0.25})]
+
+    def tearDown(self):
+        shutil.rmtree(self.cwd)
+
+    def loader(self, ref_file):
+        self.loads.append(ref_file)
+        return 0.5
+
+    def ref_path(self, ref_file):
+        return os.path.join(self.cwd, ref_file)
+
+    @pytest.mark.req_UTILITIES_007
+    def test_lazy(self):
+        ''' Test the reference files are only read when the alpha is first used. '''
+        alphas = PrsAlpha(self.ref_files, loader=self.loader)
+        self.assertListEqual(self.loads, [])
+        self.assertListEqual(list(alphas.keys()), ['A', 'B', 'C'])
+        self.assertEqual(alphas['C'], 0.25)
+        self.assertEqual(alphas['A'], 0.5)
+        self.assertEqual(alphas['A'], 0.5)
+        self.assertListEqual(self.loads, ['A.prs'])
+        self.assertEqual(alphas, {'A': 0.5, 'B': 0.5, 'C': 0.25})
+        self.assertListEqual(self.loads, ['A.prs', 'B.prs'])
+        with self.assertRaises(KeyError):
+            alphas['D']
+
+    @pytest.mark.req_UTILITIES_007
+    def test_index(self):
+        ''' Test the alphas are taken from the index unless the reference file has changed. '''
+        index = os.path.join(self.cwd, "index.json")
+        with patch('bws.prs_alpha.get_reference_file_path', side_effect=self.ref_path), \
+                override_settings(PRS_ALPHA_INDEX=index):
+            self.assertEqual(write_index(index, {'A.prs': 0.4, 'B.prs': 0.6}), 2)
+            with open(self.ref_path('B.prs'), 'a') as f:
+                f.write("1,100,A,T,0.1\n")
+            alphas = PrsAlpha(self.ref_files, loader=self.loader)
+            self.assertEqual(alphas['A'], 0.4)
+            self.assertEqual(alphas['B'], 0.5)     # modified since the index was written
+        self.assertListEqual(self.loads, ['B.prs'])
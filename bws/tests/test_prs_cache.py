@@ -0,0 +1,113 @@
+"""
+Test the cache of parsed PRS reference models.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+import pytest
+
+from bws.apps import is_management_command
+import bws.metrics as metrics
+from bws.prs_cache import PrsModelCache, get_size
+
+
+class FakePrs(object):
+    ''' Stands in for a vcf2prs Prs parsed from a reference file. '''
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            self.snps = [line.strip() for line in f]
+        self.raw_PRS = []
+
+
+class PrsModelCacheTests(TestCase):
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp(prefix="TEST_PRS_", dir="/tmp")
+        self.loads = []
+        self.cache = PrsModelCache(loader=self.loader)
+        self.ref_file = self.write_ref_file("ref1.prs", ["rs1", "rs2"])
+        metrics.reset(PrsModelCache.METRICS)
+
+    def tearDown(self):
+        shutil.rmtree(self.cwd)
+
+    def loader(self, path):
+        self.loads.append(path)
+        return FakePrs(path)
+
+    def write_ref_file(self, name, snps, mtime=None):
+        path = os.path.join(self.cwd, name)
+        with open(path, 'w') as f:
+            f.write("\n".join(snps))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    @pytest.mark.req_UTILITIES_006
+    def test_parsed_once(self):
+        ''' Test the reference file is parsed once and a copy of the model is returned. '''
+        prs1 = self.cache.get(self.ref_file)
+        prs1.raw_PRS.append(1.2)
+        prs2 = self.cache.get(self.ref_file)
+        self.assertEqual(len(self.loads), 1)
+        self.assertIsNot(prs1, prs2)
+        self.assertListEqual(prs2.raw_PRS, [])
+        self.assertListEqual(prs2.snps, ["rs1", "rs2"])
+        self.assertDictEqual(metrics.get_counts(PrsModelCache.METRICS), {"prs_cache_hit": 1, "prs_cache_miss": 1})
+
+    @pytest.mark.req_UTILITIES_006
+    def test_reload_on_mtime_change(self):
+        ''' Test the reference file is parsed again when it is modified. '''
+        self.write_ref_file("ref1.prs", ["rs1", "rs2"], mtime=1000000)
+        self.cache.get(self.ref_file)
+        self.write_ref_file("ref1.prs", ["rs3"], mtime=2000000)
+        self.assertListEqual(self.cache.get(self.ref_file).snps, ["rs3"])
+        self.assertEqual(len(self.loads), 2)
+        self.assertEqual(self.cache.get_stats()["models"], 1)
+
+    @pytest.mark.req_UTILITIES_006
+    def test_memory_accounting(self):
+        ''' Test the memory used by each model is recorded and the total limited by max_bytes. '''
+        ref_file2 = self.write_ref_file("ref2.prs", ["rs%d" % i for i in range(100)])
+        self.cache.get(self.ref_file)
+        self.cache.get(ref_file2)
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["models"], 2)
+        self.assertGreater(stats["sizes"][self.ref_file], get_size([]))
+        self.assertGreater(stats["sizes"][ref_file2], stats["sizes"][self.ref_file])
+        self.assertEqual(stats["bytes"], sum(stats["sizes"].values()))
+
+        # least recently used model is evicted
+        self.cache.max_bytes = stats["sizes"][ref_file2]
+        self.cache.get(ref_file2)
+        self.cache.load(self.ref_file)
+        self.assertListEqual(list(self.cache.get_stats()["sizes"].keys()), [self.ref_file])
+
+    @pytest.mark.req_UTILITIES_006
+    def test_warm(self):
+        ''' Test warming the cache with the configured reference files. '''
+        model_settings = {'PRS_REFERENCE_FILES': {'EUROPEAN': [('A', 'ref1.prs'), ('B', 'missing.prs')],
+                                                  'AFRICAN': [('C', {'alpha': 0.5})]}}
+        with patch('bws.prs_cache.get_reference_file_path', side_effect=lambda f: os.path.join(self.cwd, f)):
+            self.assertEqual(self.cache.warm([model_settings]), 1)
+        self.cache.get(self.ref_file)
+        self.assertEqual(len(self.loads), 1)        # loaded when warming the cache
+        self.assertEqual(self.cache.get_stats()["models"], 1)
+
+
+    @pytest.mark.req_UTILITIES_006
+    def test_no_warm_for_management_commands(self):
+        ''' The cache is only warmed at start up of the web-services, not for management commands. '''
+        self.assertTrue(is_management_command(['manage.py', 'migrate']))
+        self.assertTrue(is_management_command(['/usr/bin/django-admin', 'prs_alpha_index']))
+        self.assertTrue(is_management_command(['/usr/lib/python3/site-packages/django/__main__.py', 'shell']))
+        self.assertFalse(is_management_command(['manage.py', 'runserver']))
+        self.assertFalse(is_management_command(['/usr/bin/gunicorn', 'boadicea_auth.wsgi']))
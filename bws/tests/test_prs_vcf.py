@@ -0,0 +1,198 @@
+"""
+Test splitting a VCF file for several PRS reference models in a single pass.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+from django.test import TestCase
+import pytest
+
+from bws.prs_vcf import VariantKeys, get_sample_names, get_variant_keys, open_vcf, read_header, read_vcf, \
+    scan_indexed, split_vcf
+from bws.vcf_index import VcfIndex, VcfIndexError, reg2bins
+
+
+HEADER = ("##fileformat=VCFv4.1\n"
+          "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\tS2\n")
+
+
+def record(chrom, pos, vid='.'):
+    return f"{chrom}\t{pos}\t{vid}\tA\tT\t.\tPASS\t.\tGT\t0/1\t1/1\n"
+
+
+class SplitVcfTests(TestCase):
+
+    def setUp(self):
+        self.cwd = tempfile.mkdtemp(prefix="TEST_PRS_VCF_", dir="/tmp")
+
+    def tearDown(self):
+        shutil.rmtree(self.cwd)
+
+    def write_ref_file(self, name, lines):
+        path = os.path.join(self.cwd, name)
+        with open(path, 'w') as f:
+            f.write("\n".join(["alpha = 0.45", "Chromosome,Position,Reference_Allele,Effect_Allele,Log_Odds_Ratio"] +
+                              lines))
+        return path
+
+    @pytest.mark.req_WS_VALIDATION_262
+    def test_variant_keys(self):
+        ''' Test reading the chromosome and position of the variants in a reference file. '''
+        keys = VariantKeys.from_file(self.write_ref_file("bc.prs", ["1,100,A,T,0.03", "chr23,200,C,G,-0.01"]))
+        self.assertSetEqual(set(keys.positions), {('1', '100'), ('23', '200'), ('X', '200')})
+        self.assertIsNone(VariantKeys.from_file(self.write_ref_file("none.prs", ["rs1:100,A,T,0.03"])))
+
+    @pytest.mark.req_WS_VALIDATION_262
+    def test_split_vcf(self):
+        ''' Test each model gets the header and only the records matching its variants. '''
+        bc = get_variant_keys(self.write_ref_file("bc.prs", ["1,100,A,T,0.03", "2,200,C,G,0.01"]))
+        oc = get_variant_keys(self.write_ref_file("oc.prs", ["2,200,C,G,0.02", "X,300,A,G,0.01"]))
+        pc = get_variant_keys(self.write_ref_file("pc.prs", ["rs5,A,G,0.01"]))
+        vcf = HEADER + record(1, 100) + record('chr2', 200) + record(23, 300) + record(4, 400, 'rs5') + record(5, 500)
+        bc_vcf, oc_vcf, pc_vcf = split_vcf(vcf, [bc, oc, pc])
+        self.assertEqual(bc_vcf, HEADER + record(1, 100) + record('chr2', 200))
+        self.assertEqual(oc_vcf, HEADER + record('chr2', 200) + record(23, 300))
+        self.assertEqual(pc_vcf, vcf)   # no variant positions found so all records are used
+
+    @pytest.mark.req_WS_VALIDATION_262
+    def test_split_vcf_id(self):
+        ''' Test records are matched on the variant ID and unparsed records go to every model. '''
+        bc = VariantKeys(frozenset([('1', '100')]), frozenset(['rs9']))
+        oc = VariantKeys(frozenset([('3', '300')]), frozenset())
+        vcf = HEADER + record(7, 700, 'rs9') + "not a vcf record\n"
+        bc_vcf, oc_vcf = split_vcf(vcf, [bc, oc])
+        self.assertEqual(bc_vcf, vcf)
+        self.assertEqual(oc_vcf, HEADER + "not a vcf record\n")
+        self.assertListEqual(split_vcf("not a valid vcf file\n", [bc, oc]), ["not a valid vcf file\n"]*2)
+
+    @pytest.mark.req_WS_VALIDATION_264
+    def test_split_vcf_samples(self):
+        ''' Test selecting the sample columns when splitting a VCF file. '''
+        self.assertListEqual(get_sample_names(HEADER), ['S1', 'S2'])
+        keys = VariantKeys(frozenset([('1', '100')]), frozenset())
+        vcf = HEADER + record(1, 100) + record(2, 200)
+        selected, = split_vcf(vcf, [keys], samples=['S2'])
+        self.assertListEqual(get_sample_names(selected), ['S2'])
+        self.assertEqual(selected.splitlines()[-1], "1\t100\t.\tA\tT\t.\tPASS\t.\tGT\t1/1")
+        with self.assertRaisesRegex(ValueError, 'S3'):
+            split_vcf(vcf, [keys], samples=['S1', 'S3'])
+
+
+class OpenVcfTests(TestCase):
+    VCF = HEADER + record(1, 100) + record(2, 200)
+
+    def read(self, content):
+        with tempfile.TemporaryFile() as f:
+            f.write(content)
+            stream = open_vcf(f)
+            vcf = stream.read()
+            stream.detach()
+            self.assertFalse(f.closed)
+        return vcf
+
+    @pytest.mark.req_WS_VALIDATION_263
+    def test_plain(self):
+        ''' Test reading an uncompressed VCF file. '''
+        self.assertEqual(self.read(self.VCF.encode('utf-8')), self.VCF)
+
+    @pytest.mark.req_WS_VALIDATION_263
+    def test_gzip(self):
+        ''' Test reading gzip and BGZF compressed VCF files. '''
+        self.assertEqual(self.read(gzip.compress(self.VCF.encode('utf-8'))), self.VCF)
+        # BGZF is a series of gzip blocks
+        blocks = [HEADER, record(1, 100), record(2, 200)]
+        self.assertEqual(self.read(b"".join(gzip.compress(b.encode('utf-8')) for b in blocks)), self.VCF)
+
+    @pytest.mark.req_WS_VALIDATION_263
+    def test_stream(self):
+        ''' Test splitting a VCF stream and reading only the header. '''
+        with tempfile.TemporaryFile() as f:
+            f.write(gzip.compress(self.VCF.encode('utf-8')))
+            keys = VariantKeys(frozenset([('2', '200')]), frozenset())
+            self.assertListEqual(split_vcf(open_vcf(f), [keys]), [HEADER + record(2, 200)])
+            self.assertEqual(read_header(open_vcf(f)), HEADER)
+
+    @pytest.mark.req_WS_VALIDATION_263
+    def test_corrupt(self):
+        ''' Test a truncated gzip file raises an error when read. '''
+        with self.assertRaises(EOFError):
+            self.read(gzip.compress(self.VCF.encode('utf-8'))[:-10])
+
+
+def bgzf_block(data):
+    ''' Compress data as a BGZF block. '''
+    compress = zlib.compressobj(6, zlib.DEFLATED, -15)
+    cdata = compress.compress(data) + compress.flush()
+    bsize = len(cdata) + 25
+    return (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' + struct.pack('<H', bsize) + cdata +
+            struct.pack('<II', zlib.crc32(data), len(data)))
+
+
+class IndexedVcfTests(TestCase):
+    ''' Test reading only the records at the variant positions using a tabix index. '''
+    RECORDS = [('chr1', 100), ('chr1', 20000), ('chr1', 40000), ('chr2', 100), ('chr2', 50000)]
+
+    def setUp(self):
+        # BGZF VCF with each record in its own block and a tabix index of the blocks
+        self.vcf = HEADER.replace('#CHROM', '##contig=<ID=chr1>\n##contig=<ID=chr2>\n#CHROM')
+        blocks = [bgzf_block(self.vcf.encode('utf-8'))]
+        offset = len(blocks[0])
+        bins = {'chr1': {}, 'chr2': {}}
+        for chrom, pos in self.RECORDS:
+            line = record(chrom, pos)
+            self.vcf += line
+            blocks.append(bgzf_block(line.encode('utf-8')))
+            bins[chrom][4681 + ((pos-1) >> 14)] = [(offset << 16, (offset + len(blocks[-1])) << 16)]
+            offset += len(blocks[-1])
+        blocks.append(bgzf_block(b''))
+        self.bgzf = b"".join(blocks)
+
+        names = b"chr1\x00chr2\x00"
+        tbi = b"TBI\x01" + struct.pack('<8i', 2, 2, 1, 2, 0, ord('#'), 0, len(names)) + names
+        for chrom in ('chr1', 'chr2'):
+            tbi += struct.pack('<i', len(bins[chrom]))
+            for bin_no, chunks in bins[chrom].items():
+                tbi += struct.pack('<Ii', bin_no, len(chunks)) + b"".join(struct.pack('<QQ', *c) for c in chunks)
+            tbi += struct.pack('<i', 0)
+        self.tbi = gzip.compress(tbi)
+
+    @pytest.mark.req_WS_VALIDATION_265
+    def test_reg2bins(self):
+        ''' Test the bins overlapping a region include the level 5 bin of the position. '''
+        self.assertIn(4681 + (19999 >> 14), reg2bins(19999, 20000))
+        self.assertEqual(len(reg2bins(19999, 20000)), 6)
+
+    @pytest.mark.req_WS_VALIDATION_265
+    def test_scan_indexed(self):
+        ''' Test only the header and the blocks of the variant positions are read. '''
+        with tempfile.TemporaryFile() as f, tempfile.TemporaryFile() as idx:
+            f.write(self.bgzf)
+            idx.write(self.tbi)
+            index = VcfIndex.read(idx)
+            self.assertListEqual(index.names, ['chr1', 'chr2'])
+            lines = scan_indexed(f, idx, {('1', '20000'), ('2', '100'), ('3', '100')})
+            self.assertEqual(b"".join(lines).decode('utf-8'),
+                             self.vcf[:self.vcf.index('chr1\t')] + record('chr1', 20000) + record('chr2', 100))
+
+            keys = [VariantKeys(frozenset([('1', '20000')]), frozenset()),
+                    VariantKeys(frozenset([('2', '100'), ('2', '50000')]), frozenset())]
+            self.assertListEqual(read_vcf(f, keys, index_file=idx), split_vcf(self.vcf, keys))
+
+    @pytest.mark.req_WS_VALIDATION_265
+    def test_index_not_used(self):
+        ''' Test all the records are scanned if the index can not be used. '''
+        keys = [VariantKeys(frozenset([('1', '40000')]), frozenset())]
+        with tempfile.TemporaryFile() as f, tempfile.TemporaryFile() as idx:
+            f.write(gzip.compress(self.vcf.encode('utf-8')))      # gzip but not BGZF
+            idx.write(self.tbi)
+            with self.assertRaises(VcfIndexError):
+                scan_indexed(f, idx, keys[0].positions)
+            self.assertListEqual(read_vcf(f, keys, index_file=idx), split_vcf(self.vcf, keys))
@@ -21,7 +21,7 @@ from rest_framework.exceptions import ValidationError
 from types import SimpleNamespace
 
 from bws.rest_api import RequiredAnyPermission, ModelWebServiceMixin, BwsView, OwsView, PwsView, CombineModelResultsView
-from bws.exceptions import ModelError, PedigreeError
+from bws.exceptions import ModelError, PedigreeError, TimeOutException
 from bws.serializers import CombinedInputSerializer
 from django.conf import settings
 
@@ -440,6 +440,45 @@ class TestModelWebServiceMixinIntegration(TestCase):
         # Should contain error details
         self.assertIn('Test model error', str(json.loads(response.content)))
 
+    @pytest.mark.req_UTILITIES_009
+    @patch('bws.rest_api.Predictions')
+    @patch('bws.rest_api.PedigreeFile')
+    @patch('bws.rest_api.ModelParams')
+    @patch('tempfile.mkdtemp')
+    @patch('shutil.rmtree')
+    def test_post_to_model_timeout_charged(self, mock_rmtree, mock_mkdtemp, mock_model_params, mock_pedigree_file,
+                                           mock_predictions):
+        """Test the cost of model runs that time out is charged to the cost based throttle."""
+        class MockView(ModelWebServiceMixin):
+            serializer_class = MagicMock()
+            any_perms = ['boadicea_auth.can_risk']
+
+        view = MockView()
+        request = APIRequestFactory().post('/', {'user_id': 'test', 'pedigree_data': 'test_data'}, format='json')
+        request.user = self.user
+        mock_serializer = MagicMock()
+        mock_serializer.is_valid.return_value = True
+        mock_serializer.validated_data = {'pedigree_data': 'test_data', 'user_id': 'test'}
+        view.serializer_class.return_value = mock_serializer
+
+        mock_pedi = MagicMock()
+        mock_pedi.get_target.return_value = SimpleNamespace(age='50', pid='1')
+        mock_pedi.ethnicity = None
+        mock_pedi.is_ashkn.return_value = False
+        mock_pedigree_file.return_value.pedigrees = [mock_pedi]
+        mock_model_params.factory.return_value = MagicMock(population='UK', cancer_rates='UK')
+        mock_mkdtemp.return_value = '/tmp/test'
+
+        def run_model(*args, cost_meter=None, **kwargs):
+            cost_meter.add(2.5)     # cost added before the model is run
+            raise TimeOutException()
+        mock_predictions.side_effect = run_model
+        request.data = {'user_id': 'test', 'pedigree_data': mock_pedigree_file}
+        with patch.object(MockView, 'charge_cost') as mock_charge:
+            with self.assertRaises(TimeOutException):
+                view.post_to_model(request, settings.BC_MODEL)
+        mock_charge.assert_called_once_with(request, 2.5)
+
     @pytest.mark.req_WS_CORE_112
     @patch('bws.rest_api.PedigreeFile')
     def test_post_to_model_invalid_model_settings(self, mock_pedigree_file):
@@ -0,0 +1,88 @@
+"""
+Tests for the stored model results and the combined results tab rendered from them.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from bws.calc.results import RiskCurve
+from bws.rest_api import CombineModelResultsView
+import bws.result_store as result_store
+
+
+def get_output(ctype):
+    curve = RiskCurve(ctype + " cancer risk")
+    for age in range(65, 81):
+        curve.append(age, 0.001 * (age - 64))
+    return {
+        "version": "6.0.0",
+        "mutation_frequency": {"UK": {"BRCA1": 0.0006394}},
+        "mutation_sensitivity": {"BRCA1": 0.89},
+        "cancer_incidence_rates": "UK",
+        "pedigree_result": [{"family_id": "XXXX", "proband_id": "ch1", "cancer_risks": curve}]
+    }
+
+
+@override_settings(RESULT_STORE_TIMEOUT=60)
+class ResultStoreTests(TestCase):
+    ''' Tests for storing results and combining the stored results '''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('result_user', password='testing1')
+        self.other = User.objects.create_user('other_user', password='testing1')
+        self.factory = APIRequestFactory()
+
+    def post(self, data, user=None):
+        request = self.factory.post('/combine/', data, format='json')
+        force_authenticate(request, user=user or self.user)
+        return CombineModelResultsView.as_view(throttle_classes=())(request)
+
+    @pytest.mark.req_WS_CORE_120
+    def test_store_and_load(self):
+        ''' Results are returned only to the user that ran the calculation and for the model. '''
+        output = get_output("breast")
+        result_id = result_store.store(self.user, "BC", output)
+        self.assertEqual(output["result_id"], result_id)
+        self.assertEqual(result_store.load(self.user, result_id, "BC")["pedigree_result"][0]["cancer_risks"],
+                         output["pedigree_result"][0]["cancer_risks"])
+        self.assertIsNone(result_store.load(self.other, result_id, "BC"))
+        self.assertIsNone(result_store.load(self.user, result_id, "OC"))
+        with override_settings(RESULT_STORE_TIMEOUT=None):
+            self.assertIsNone(result_store.store(self.user, "BC", get_output("breast")))
+
+    @pytest.mark.req_WS_CORE_120
+    def test_combine_stored_results(self):
+        ''' The results tab is rendered from the stored results and then from the fragment cache. '''
+        ids = {"bws_result_id": result_store.store(self.user, "BC", get_output("breast")),
+               "ows_result_id": result_store.store(self.user, "OC", get_output("ovarian"))}
+        with patch('bws.rest_api.render_to_string', return_value="<div>tabs</div>") as mock_render:
+            response = self.post(ids)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, b"<div>tabs</div>")
+            context = mock_render.call_args.args[1]
+            risks = context["bws_result"]["pedigree_result"][0]["cancer_risks"]
+            self.assertEqual(risks[0], {"age": 65, "breast cancer risk": {"decimal": 0.001, "percent": 0.1}})
+
+            self.assertEqual(self.post(ids).content, b"<div>tabs</div>")
+            self.assertEqual(mock_render.call_count, 1)
+
+            # the fragment is not shared with other users
+            self.assertEqual(self.post(ids, user=self.other).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @pytest.mark.req_WS_CORE_120
+    def test_combine_missing_results(self):
+        ''' Expired or unknown results and missing results are rejected. '''
+        ows_result_id = result_store.store(self.user, "OC", get_output("ovarian"))
+        self.assertEqual(self.post({"bws_result_id": "unknown", "ows_result_id": ows_result_id}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post({"ows_result_id": ows_result_id}).status_code, status.HTTP_400_BAD_REQUEST)
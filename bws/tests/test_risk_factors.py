@@ -5,20 +5,24 @@ SPDX-License-Identifier: GPL-3.0-or-later
 """
 import pytest
 from bws.exceptions import RiskFactorError
-from bws.risk_factors import bc, oc
+from bws.risk_factors import bc, oc, rfs
 from bws.risk_factors.bc import BCRiskFactors, MenarcheAge, AgeOfFirstLiveBirth
 from bws.risk_factors.oc import OCRiskFactors
 from bws.risk_factors.pc import PCRiskFactors
 from bws.risk_factors.rfs import RiskFactor
 from bws.pedigree_file import PedigreeFile
 from django.contrib.auth.models import User, Permission
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
+from io import StringIO
 import json
 import os
+import tempfile
+import unittest
 from bws.risk_factors.mdensity import Birads, Stratus, Volpara
 from bws.risk_factors.ethnicity import ONSEthnicity, UKBioBankEthnicty
 from django.utils.encoding import force_str
@@ -406,6 +410,37 @@ class RiskFactorsCategoryTests(TestCase):
         self.assertEqual(bc.AgeOfMenopause.get_value(">54"), '55')
         self.assertEqual(bc.AgeOfMenopause.get_value("<40"), '39')
 
+    @pytest.mark.req_WS_RISK_153
+    def test_category_boundaries(self):
+        ''' Check values on and either side of the compiled category boundaries. '''
+        self.assertEqual(bc.BMI.get_category(18.4999), 1)
+        self.assertEqual(bc.BMI.get_category("18.5"), 2)
+        self.assertEqual(bc.BMI.get_category(24.9999), 2)
+        self.assertEqual(bc.AlcoholIntake.get_category(0), 1)       # '0' before '<5'
+        self.assertEqual(bc.AlcoholIntake.get_category(0.5), 2)
+        self.assertEqual(bc.AlcoholIntake.get_category(45), 7)
+        self.assertEqual(bc.AgeOfFirstLiveBirth.get_category(24), 2)
+        self.assertEqual(bc.AgeOfFirstLiveBirth.get_category(25), 3)
+        self.assertIsNone(bc.Parity.get_category(-1))               # not in any category
+        self.assertRaises(RiskFactorError, bc.Parity.get_category, "x")
+        bounds, _idxs = bc.BMI.get_lookup_table(isreal=True)
+        self.assertListEqual(bounds, [18.5, 25.0, 30.0])
+        self.assertIs(bc.BMI.get_lookup_table(isreal=True)[0], bounds)
+
+    @pytest.mark.req_WS_RISK_153
+    def test_risk_factor_names(self):
+        ''' Check risk factors are found by class name, snake case name and synonym. '''
+        names = BCRiskFactors.get_names()
+        self.assertListEqual(names['menarche'], [0])
+        self.assertListEqual(names['age_of_first_live_birth'], [2])
+        self.assertListEqual(names['bmi'], [5])
+        self.assertNotIn('height', names)
+        self.assertListEqual(OCRiskFactors.get_names()['oc_use'], [1])
+        bc_rfs = BCRiskFactors()
+        bc_rfs.add_category('alcohol', '36.8')
+        bc_rfs.add_category('height', '177')
+        self.assertListEqual(bc_rfs.cats, [0, 0, 0, 0, 0, 0, 6, 0])
+
 
 class RiskFactorsCodeTests(TestCase):
 
@@ -544,6 +579,55 @@ class RiskFactorsCodeTests(TestCase):
         self.assertRaises(RiskFactorError, BCRiskFactors.decode, 'a')
 
 
+@unittest.skipIf(rfs.get_numpy() is None, "NumPy not installed")
+class RiskFactorsBulkCodeTests(TestCase):
+    ''' Test encoding and decoding multiple risk factor codes. '''
+
+    @pytest.mark.req_WS_RISK_154
+    def test_decode_many(self):
+        ''' Test decoding multiple codes gives the same categories as decoding each code. '''
+        for rfs_cls in (BCRiskFactors, OCRiskFactors):
+            codes = list(range(0, rfs_cls.get_max_factor()+1, 97)) + [rfs_cls.get_max_factor()]
+            cats = rfs_cls.decode_many(codes)
+            self.assertListEqual(cats.tolist(), [rfs_cls.decode(c) for c in codes])
+            self.assertListEqual(rfs_cls.encode_many(cats).tolist(), codes)
+
+    @pytest.mark.req_WS_RISK_154
+    def test_encode_many(self):
+        ''' Test encoding multiple rows of categories gives the same codes as encoding each row. '''
+        rows = [[3, 2, 4, 2, 1, 2, 3, 1], [0]*8, list(BCRiskFactors.categories.values())]
+        self.assertListEqual(BCRiskFactors.encode_many(rows).tolist(), [BCRiskFactors.encode(r) for r in rows])
+
+    @pytest.mark.req_WS_RISK_154
+    def test_bulk_errors(self):
+        ''' Test that an error is raised for out of bounds or non numeric values. '''
+        max_factor = BCRiskFactors.get_max_factor()
+        self.assertRaises(RiskFactorError, BCRiskFactors.decode_many, [0, max_factor+1])
+        self.assertRaises(RiskFactorError, BCRiskFactors.decode_many, [-1])
+        self.assertRaises(RiskFactorError, BCRiskFactors.decode_many, ['a'])
+        category = list(BCRiskFactors.categories.values())
+        category[0] += 1
+        self.assertRaises(RiskFactorError, BCRiskFactors.encode_many, [category])
+        self.assertRaises(RiskFactorError, BCRiskFactors.encode_many, [[0, 0]])
+        self.assertRaises(RiskFactorError, BCRiskFactors.encode_many, [['a']*8])
+
+    @pytest.mark.req_WS_RISK_154
+    def test_decode_risk_factors_command_stream(self):
+        ''' Test the decode_risk_factors command streaming codes from a file to CSV. '''
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("112005\n\n0\n")
+        try:
+            out = StringIO()
+            call_command('decode_risk_factors', '--input', f.name, '--chunk-size', '1', stdout=out)
+        finally:
+            os.remove(f.name)
+        lines = out.getvalue().strip().split('\n')
+        self.assertEqual(lines[0], "code," + ",".join(BCRiskFactors.categories.keys()))
+        self.assertEqual(lines[1], "112005," + ",".join(str(c) for c in BCRiskFactors.decode(112005)))
+        self.assertEqual(lines[2], "0," + ",".join(["0"]*len(BCRiskFactors.categories)))
+        self.assertEqual(len(lines), 3)
+
+
 class WSRiskFactors(TestCase):
     ''' Test the risk factors webservice '''
     TEST_BASE_DIR = os.path.dirname(os.path.dirname(__file__))
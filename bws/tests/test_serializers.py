@@ -5,21 +5,34 @@ Unit tests for bws.serializers — field-level validation and edge cases.
 SPDX-FileCopyrightText: 2026 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
+from collections import OrderedDict
+from copy import deepcopy
+import datetime
 import io
+import json
 import pytest
 
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 
+from bws.calc.results import RiskCurve
+from bws.renderers import CompactJSONRenderer, FastJSONRenderer
 from bws.serializers import (
     BaseInputSerializer,
     BwsInputSerializer,
     FileField,
+    OutputSerializer,
     OwsInputSerializer,
     PRSField,
     PwsInputSerializer,
+    fast_representation,
 )
 
 
@@ -143,3 +156,110 @@ class GetMutationFrequencyFieldTests(TestCase):
         actual_choices = list(field.choices.keys())
         for key in expected_choices:
             self.assertIn(key, actual_choices)
+
+
+class FastRepresentationTests(TestCase):
+    """ Tests for fast_representation() and FastJSONRenderer. """
+
+    def get_output(self):
+        def risks(ctype):
+            return [OrderedDict([("age", a), (ctype + " cancer risk", {"decimal": 0.0123 * a, "percent": round(1.23 * a, 1)})])
+                    for a in range(41, 81)]
+        pedigree = {
+            "family_id": "XXX", "proband_id": 1,
+            "risk_factors": {_('Height (cm)'): 174.0, 'parity': "1 child"},
+            "prs": {'alpha': 0.45, 'zscore': 1.2},
+            "mutation_frequency": {"UK": {"BRCA1": 0.0006394, "BRCA2": 0.00102}},
+            "cancer_risks": risks("breast"),
+            "baseline_cancer_risks": risks("breast"),
+            "lifetime_cancer_risk": [OrderedDict([("age", 80), ("breast cancer risk", {"decimal": 0.1, "percent": 10.0})])],
+            "mutation_probabilties": [{"no mutation": {"decimal": 0.98, "percent": 98.0}},
+                                      {"BRCA1": {"decimal": 0.0123, "percent": 1.23}}],
+        }
+        return {
+            "version": "6.0.0",
+            "timestamp": datetime.datetime(2026, 10, 19, 12, 30, 15, 123456),
+            "mutation_frequency": {"UK": {"BRCA1": 0.0006394}},
+            "mutation_sensitivity": {"BRCA1": 0.7},
+            "cancer_incidence_rates": "UK",
+            "warnings": ["famid: ‘ADV’ – non-ASCII warning "],
+            "pedigree_result": [pedigree, dict(pedigree, family_id="YYY", ethnicity=None)],
+        }
+
+    @pytest.mark.req_WS_CORE_117
+    def test_same_as_serializer(self):
+        """ The fast representation equals the OutputSerializer representation. """
+        output = self.get_output()
+        self.assertEqual(fast_representation(OutputSerializer, output), OutputSerializer(output).data)
+
+    @pytest.mark.req_WS_CORE_117
+    @override_settings(FAST_JSON_OUTPUT=True)
+    def test_json_byte_compatible(self):
+        """ The fast rendered JSON is byte for byte the same as that of the serializer and JSONRenderer. """
+        output = self.get_output()
+        expected = JSONRenderer().render(OutputSerializer(output).data)
+        fast = FastJSONRenderer().render(fast_representation(OutputSerializer, output))
+        self.assertEqual(fast, expected)
+        self.assertEqual(json.loads(fast), json.loads(expected))
+
+    @pytest.mark.req_WS_CORE_119
+    @override_settings(FAST_JSON_OUTPUT=True)
+    def test_columnar_results(self):
+        """ Columnar results are rendered the same as the legacy lists of dictionaries. """
+        output = self.get_output()
+        columnar = deepcopy(output)
+        for result in columnar["pedigree_result"]:
+            curve = RiskCurve("breast cancer risk")
+            for row in result["cancer_risks"]:
+                curve.append(row["age"], row["breast cancer risk"]["decimal"])
+            result["cancer_risks"] = curve
+        # the compact format does not build the legacy rows
+        self.assertEqual(CompactJSONRenderer().render(fast_representation(OutputSerializer, columnar)),
+                         CompactJSONRenderer().render(OutputSerializer(output).data))
+        self.assertIsNone(columnar["pedigree_result"][0]["cancer_risks"]._rows)
+
+        expected = JSONRenderer().render(OutputSerializer(output).data)
+        self.assertEqual(JSONRenderer().render(OutputSerializer(columnar).data), expected)
+        self.assertEqual(FastJSONRenderer().render(fast_representation(OutputSerializer, columnar)), expected)
+
+    @pytest.mark.req_WS_CORE_117
+    @override_settings(FAST_JSON_OUTPUT=True)
+    def test_json_fallback(self):
+        """ Data orjson does not encode, e.g. an integer dictionary key, or indented JSON is rendered by the JSONRenderer. """
+        data = {"mutation_frequency": {1: 0.0006394}}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, renderer_context={'indent': 2}),
+                         JSONRenderer().render(data, renderer_context={'indent': 2}))
+
+
+class CompactJSONRendererTests(TestCase):
+    """ Tests for the compact columnar format of the risk curves. """
+
+    @pytest.mark.req_WS_CORE_118
+    def test_columns(self):
+        """ Risk curves are rendered as arrays of the ages and decimal risks. """
+        output = FastRepresentationTests().get_output()
+        compact = json.loads(CompactJSONRenderer().render(OutputSerializer(output).data))
+        legacy = json.loads(JSONRenderer().render(OutputSerializer(output).data))
+        for result, legacy_result in zip(compact["pedigree_result"], legacy["pedigree_result"]):
+            curve = result["cancer_risks"]
+            self.assertEqual(curve["ages"], [r["age"] for r in legacy_result["cancer_risks"]])
+            decimals = curve["decimal"]["breast cancer risk"]
+            self.assertEqual([round(d * 100, 1) for d in decimals],
+                             [r["breast cancer risk"]["percent"] for r in legacy_result["cancer_risks"]])
+            self.assertEqual(result["mutation_probabilties"], legacy_result["mutation_probabilties"])
+        data = OutputSerializer(output).data
+        self.assertLess(len(CompactJSONRenderer().render(data)), len(JSONRenderer().render(data)) / 2)
+
+    @pytest.mark.req_WS_CORE_118
+    def test_negotiation(self):
+        """ The compact format is selected with the format query parameter or the Accept header. """
+        renderers = [FastJSONRenderer(), CompactJSONRenderer()]
+        negotiation = DefaultContentNegotiation()
+        factory = APIRequestFactory()
+        for request, expected in [
+                (factory.post('/'), FastJSONRenderer),
+                (factory.post('/?format=compact'), CompactJSONRenderer),
+                (factory.post('/', HTTP_ACCEPT='application/vnd.canrisk.compact+json'), CompactJSONRenderer)]:
+            renderer, _media_type = negotiation.select_renderer(Request(request), renderers)
+            self.assertIsInstance(renderer, expected)
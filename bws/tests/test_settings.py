@@ -35,6 +35,23 @@ class SettingsTests(TestCase):
         alpha_dict = settings.get_prs_alpha_dict(model)
         self.assertEqual(alpha_dict, {'BCAC 313': 0.501, 'BCAC 307': 2.5})
 
+    def test_get_prs_alpha_dict_lazy(self):
+        ''' Test that the lazy PRS alpha mapping reads the same alpha values when they are used. '''
+        model = {
+            'PRS_REFERENCE_FILES': {
+                'EUROPEAN': [
+                    ('BCAC 313', 'BCAC_313_PRS.prs'),
+                    ('BCAC 307', {'alpha': 2.5})
+                ],
+                'AFRICAN': [],
+                'EAST_ASIAN': [],
+                'SOUTH_ASIAN': []
+            }
+        }
+        alpha_dict = settings.get_prs_alpha_dict(model, lazy=True)
+        self.assertEqual(dict(alpha_dict), settings.get_prs_alpha_dict(model))
+        self.assertEqual(alpha_dict['BCAC 313'], 0.501)
+
     def test_get_prs_alpha_dict_rejects_duplicate_keys(self):
         ''' Test that get_prs_alpha_dict raises an error when duplicate keys are present in the PRS reference files. '''
         model = {
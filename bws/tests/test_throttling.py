@@ -13,7 +13,9 @@ from rest_framework.test import APIRequestFactory, APIClient, force_authenticate
 from django.core.cache import cache
 from unittest.mock import patch, MagicMock
 
-from bws.throttles import EndUserIDRateThrottle, BurstRateThrottle, SustainedRateThrottle
+from bws.throttles import EndUserIDRateThrottle, BurstRateThrottle, SustainedRateThrottle, \
+    CombinedRateThrottle, CostRateThrottle, CacheRecord
+from bws.calc.model import ModelOpts
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authentication import BasicAuthentication
@@ -183,3 +185,165 @@ class SustainedRateThrottleTests(TestCase):
         # Check that throttle can process request
         result = throttle.allow_request(request, None)
         self.assertTrue(result)
+
+
+class MockCombinedRateThrottle(CombinedRateThrottle):
+    THROTTLE_RATES = {'burst': '5/min', 'sustained': '100/hour', 'enduser_burst': '3/min'}
+    now = 1000.0
+
+    def timer(self):
+        return MockCombinedRateThrottle.now
+
+
+class MockView_CombinedThrottling(APIView):
+    throttle_classes = (MockCombinedRateThrottle,)
+
+    def post(self, request):
+        return Response('combined_response')
+
+
+class CombinedRateThrottleTests(TestCase):
+    ''' Tests for CombinedRateThrottle '''
+
+    def setUp(self):
+        cache.clear()
+        MockCombinedRateThrottle.now = 1000.0
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user('combined_user', email='combined@test.com',
+                                             password='testing1')
+
+    def post(self, data=None):
+        request = self.factory.post('/', data=data if data is not None else {})
+        force_authenticate(request, user=self.user)
+        return MockView_CombinedThrottling.as_view()(request)
+
+    @pytest.mark.req_UTILITIES_008
+    def test_burst(self):
+        ''' Ensure the user burst rate is applied and recovers at the rate '''
+        for _i in range(5):
+            self.assertEqual(self.post().status_code, status.HTTP_200_OK)
+        response = self.post()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '12')
+        MockCombinedRateThrottle.now += 12
+        self.assertEqual(self.post().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @pytest.mark.req_UTILITIES_008
+    def test_end_user(self):
+        ''' Ensure the end user rate is applied to each end user and the user rate to all '''
+        for _i in range(3):
+            self.assertEqual(self.post({"user_id": "A"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post({"user_id": "A"}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.post({"user_id": "B"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post({"user_id": "C"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post({"user_id": "C"}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # end users are removed from the record when their limit has recovered
+        MockCombinedRateThrottle.now += 60
+        self.post({"user_id": "B"})
+        record = cache.get(MockCombinedRateThrottle.cache_format % {'ident': self.user.pk})[1]
+        self.assertListEqual(list(record['e'].keys()), ['B'])
+
+    @pytest.mark.req_UTILITIES_008
+    def test_cache_round_trips(self):
+        ''' Ensure a request reads the throttle record once and writes it once '''
+        self.post({"user_id": "A"})
+        with patch.object(MockCombinedRateThrottle, 'cache', wraps=cache) as mock_cache:
+            self.assertEqual(self.post({"user_id": "A"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_cache.get.call_count, 1)
+        self.assertEqual(mock_cache.add.call_count, 1)
+        self.assertEqual(mock_cache.set.call_count, 1)
+
+    @pytest.mark.req_UTILITIES_008
+    def test_compare_and_set(self):
+        ''' Ensure a record changed since it was read is not overwritten '''
+        record1 = CacheRecord(cache, 'test_record')
+        record2 = CacheRecord(cache, 'test_record')
+        record1.get()
+        record2.get()
+        self.assertTrue(record1.compare_and_set({'u': [1]}, 60))
+        self.assertFalse(record2.compare_and_set({'u': [2]}, 60))
+        self.assertEqual(record2.get(), {'u': [1]})
+        self.assertTrue(record2.compare_and_set({'u': [2]}, 60))
+
+    @pytest.mark.req_UTILITIES_008
+    def test_compare_and_set_absent(self):
+        ''' Ensure one writer creates an absent record and it can be created again once it has expired '''
+        record1 = CacheRecord(cache, 'test_record')
+        record2 = CacheRecord(cache, 'test_record')
+        self.assertIsNone(record1.get())
+        self.assertIsNone(record2.get())
+        self.assertTrue(record1.compare_and_set({'u': [1]}, 60))
+        self.assertFalse(record2.compare_and_set({'u': [2]}, 60))
+        cache.delete('test_record')     # expired
+        self.assertIsNone(record2.get())
+        self.assertTrue(record2.compare_and_set({'u': [2]}, 60))
+        self.assertEqual(record1.get(), {'u': [2]})
+
+
+class MockCostRateThrottle(CostRateThrottle):
+    THROTTLE_RATES = {'cpu_seconds': '60/hour'}
+    now = 1000.0
+
+    def timer(self):
+        return MockCostRateThrottle.now
+
+
+class MockView_CostThrottling(APIView):
+    throttle_classes = (MockCostRateThrottle,)
+
+    def post(self, request):
+        for throttle in self.get_throttles():
+            throttle.charge(request, float(request.data.get('cost', 0)))
+        return Response('cost_response')
+
+
+class CostRateThrottleTests(TestCase):
+    ''' Tests for CostRateThrottle '''
+
+    def setUp(self):
+        cache.clear()
+        MockCostRateThrottle.now = 1000.0
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user('cost_user', email='cost@test.com', password='testing1')
+
+    def post(self, cost):
+        request = self.factory.post('/', data={'cost': cost})
+        force_authenticate(request, user=self.user)
+        return MockView_CostThrottling.as_view()(request)
+
+    @pytest.mark.req_UTILITIES_009
+    def test_budget(self):
+        ''' Ensure requests are admitted until the CPU-second budget is used and it recovers over the period '''
+        self.assertEqual(self.post(40).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post(30).status_code, status.HTTP_200_OK)     # overruns the budget by 10s
+        response = self.post(1)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '600')                    # 10 CPU-seconds at 60/hour
+        MockCostRateThrottle.now += 600
+        self.assertEqual(self.post(1).status_code, status.HTTP_200_OK)
+
+    @pytest.mark.req_UTILITIES_009
+    def test_cheap_requests(self):
+        ''' Ensure many cheap requests are admitted where a few costly requests are throttled '''
+        for _i in range(121):
+            self.assertEqual(self.post(0.5).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.post(0.5).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @pytest.mark.req_UTILITIES_009
+    def test_charge_after_expiry(self):
+        ''' Ensure a request is charged when the record of a small charge has just expired '''
+        self.assertEqual(self.post(0.1).status_code, status.HTTP_200_OK)     # record expires after 6s
+        key = MockCostRateThrottle.cache_format % {'ident': self.user.pk}
+        cache.delete(key)
+        self.assertEqual(self.post(0.1).status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(CacheRecord(cache, key).get(), MockCostRateThrottle.now + 6)
+
+    @pytest.mark.req_UTILITIES_009
+    def test_model_opts_cost(self):
+        ''' Ensure the estimated cost of a model run increases with the pedigree size and calculations '''
+        probs = ModelOpts(probs=True, rj=False, rl=False, rr=False, ry=False)
+        risks = ModelOpts(probs=True, rj=True, rl=True, rr=True, ry=True)
+        self.assertLess(probs.get_cost(10), probs.get_cost(100))
+        self.assertLess(probs.get_cost(100), risks.get_cost(100))
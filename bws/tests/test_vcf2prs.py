@@ -138,3 +138,48 @@ class Vcf2PrsWebServices(TestCase):
         self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
         self.assertIn('No samples found in the genotype file.', response.data['error'])
         self.assertIn(response.data.get('samples'), (None, []))
+
+    @pytest.mark.req_WS_VALIDATION_213
+    def test_prs_batch(self):
+        ''' Test POSTing a multi-sample vcf file to get the PRS of every sample. '''
+        data = {'vcf_file': self.vcf_data, 'bc_prs_reference_file': self.prs_reference_file}
+        Vcf2PrsWebServices.drf_client.credentials(HTTP_AUTHORIZATION='Token ' + Vcf2PrsWebServices.token.key)
+        response = Vcf2PrsWebServices.drf_client.post(reverse('prs_batch'), data, format='multipart',
+                                                  HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(force_str(response.content))
+        samples = [row['sample'] for row in content['samples']]
+        self.assertIn('t0.9', samples)
+        self.assertIn('breast_cancer_prs', content['timing'])
+        self.assertIn('Server-Timing', response)
+
+        prs = Prs(prs_file=self.prs_file_name)
+        prs.calculate_prs_from_vcf(self.vcf_file, 't0.9')
+        prs.calculate_z_from_raw(prs.raw_PRS)
+        row = content['samples'][samples.index('t0.9')]
+        self.assertAlmostEqual(prs.z_Score[0], row['breast_cancer_prs']['zscore'])
+
+    @pytest.mark.req_WS_VALIDATION_213
+    def test_prs_batch_csv(self):
+        ''' Test POSTing a vcf file to get the PRS of selected samples as CSV. '''
+        data = {'vcf_file': self.vcf_data, 'sample_names': ['t0.9', 't0.5'],
+                'bc_prs_reference_file': self.prs_reference_file}
+        Vcf2PrsWebServices.drf_client.credentials(HTTP_AUTHORIZATION='Token ' + Vcf2PrsWebServices.token.key)
+        response = Vcf2PrsWebServices.drf_client.post(reverse('prs_batch'), data, format='multipart',
+                                                  HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = force_str(response.content).splitlines()
+        self.assertEqual(lines[0], 'sample,breast_cancer_prs_alpha,breast_cancer_prs_zscore,breast_cancer_prs_percent')
+        self.assertListEqual([line.split(',')[0] for line in lines[1:]], ['t0.9', 't0.5'])
+
+    @pytest.mark.req_WS_VALIDATION_213
+    def test_prs_batch_invalid_sample_name(self):
+        ''' Test POSTing a vcf file with an invalid sample name in the batch. '''
+        data = {'vcf_file': self.vcf_data, 'sample_names': ['t0.5', 'invalid_sample'],
+                'bc_prs_reference_file': self.prs_reference_file}
+        Vcf2PrsWebServices.drf_client.credentials(HTTP_AUTHORIZATION='Token ' + Vcf2PrsWebServices.token.key)
+        response = Vcf2PrsWebServices.drf_client.post(reverse('prs_batch'), data, format='multipart',
+                                                  HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertIn('invalid_sample', response.data['error'])
+        self.assertIn('t0.5', response.data['samples'])
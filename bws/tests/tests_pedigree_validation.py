@@ -16,10 +16,12 @@ import pytest
 from bws.cancer import GeneticTest, PathologyTest, PathologyTests, BWSGeneticTests, \
     Genes, Cancers
 from bws.exceptions import PathologyError, PedigreeError, GeneticTestError, \
-    CancerError, PersonError, PedigreeFileError
+    CancerError, PersonError, PedigreeFileError, CanRiskErrors
+import bws.metrics as metrics
 from bws.pedigree import BwaPedigree, CanRiskPedigree
 from bws.pedigree_file import PedigreeFile
 from bws.person import Male, Female
+import bws.validation as validation
 from django.conf import settings
 from django.test import TestCase
 from django.test.utils import override_settings
@@ -1119,3 +1121,147 @@ class PathologyTestTests(TestCase, ErrorTests):
             her2=PathologyTest(PathologyTest.HER2_TEST, result="N"),
             ck14=PathologyTest(PathologyTest.CK14_TEST, result="P"),
             ck56=PathologyTest(PathologyTest.CK56_TEST, result="P"))), " 6 ")
+
+
+class CollectAllValidationTests(TestCase, ErrorTests):
+    """ Tests for collecting all the validation errors found in a single pass of the pedigree. """
+
+    def setUp(self):
+        ''' Read in pedigree data. '''
+        super().setUpErrorTests()
+
+    def _add_errors(self, apedigree):
+        ''' Add a person, cancer and genetic test error to different family members. '''
+        apedigree.get_person_by_name('F1').dead = "2"
+        apedigree.get_person_by_name('F2').cancers.diagnoses.bc1.age = "abc"
+        apedigree.get_person_by_name('M2').gtests.brca2.result = "X"
+
+    @pytest.mark.req_WS_VALIDATION_260
+    def test_collect_all_errors(self):
+        ''' Test that all the errors are reported from a single pass of the pedigree. '''
+        apedigree = deepcopy(self.pedigree_file).pedigrees[0]
+        self._add_errors(apedigree)
+        report = validation.validate_pedigree(apedigree)
+        self.assertFalse(report.is_valid())
+        self.assertEqual([type(e) for e in report.errors], [PersonError, CancerError, GeneticTestError])
+
+        with self.assertRaises(CanRiskErrors) as cm:
+            apedigree.validateAll(collect=True)
+        self.assertEqual(len(cm.exception.errors), 3)
+        self.assertEqual(cm.exception.err, PersonError.err)
+        self.assertEqual(len(cm.exception.detail['errors']), 3)
+        self.assertIn("invalid vital status", cm.exception.detail[PersonError.err])
+        self.assertIn("age at cancer diagnosis", cm.exception.detail[CancerError.err])
+
+    @pytest.mark.req_WS_VALIDATION_260
+    def test_first_error_raised(self):
+        ''' Test that by default the first error found is raised, as when stopping at the first error. '''
+        apedigree = deepcopy(self.pedigree_file).pedigrees[0]
+        self._add_errors(apedigree)
+        with self.assertRaisesRegex(PersonError, r"invalid vital status"):
+            apedigree.validateAll()
+
+        # single error is raised as is when collecting errors
+        apedigree = deepcopy(self.pedigree_file).pedigrees[0]
+        apedigree.get_person_by_name('M2').dead = "2"
+        with self.assertRaises(PersonError) as cm:
+            apedigree.validateAll(collect=True)
+        self.assertEqual(cm.exception.errors, [cm.exception])
+
+    @pytest.mark.req_WS_VALIDATION_260
+    def test_valid_pedigree(self):
+        ''' Test a valid pedigree has no errors and returns the pathology warnings. '''
+        apedigree = deepcopy(self.pedigree_file).pedigrees[0]
+        report = validation.validate_pedigree(apedigree)
+        self.assertTrue(report.is_valid())
+        self.assertEqual(report.warnings, apedigree.validateAll(collect=True))
+
+    @pytest.mark.req_WS_VALIDATION_260
+    def test_index(self):
+        ''' Test the lookups shared by the validation rules. '''
+        apedigree = deepcopy(self.pedigree_file).pedigrees[0]
+        m2 = apedigree.get_person_by_name('M2')
+        apedigree.people.append(Male(m2.famid, "M1A", "111", "0", "0"))
+        index = validation.PedigreeIndex(apedigree)
+        self.assertEqual(index.unconnected(), ["111"])
+        self.assertEqual(index.get_person("111").name, "M1A")
+        self.assertIsNone(index.get_person("999"))
+        for p in apedigree.people:
+            self.assertEqual(index.get_siblings(p), apedigree.get_siblings(p))
+
+
+class PrevalidationTests(TestCase, ErrorTests):
+    """ Tests for the checks made on the raw pedigree data before it is parsed. """
+
+    def setUp(self):
+        ''' Read in pedigree data and reset the rejection metrics. '''
+        super().setUpErrorTests()
+        metrics.reset(PedigreeFile.PREVALIDATION_METRICS)
+
+    def assertRejected(self, reason):
+        counts = metrics.get_counts(PedigreeFile.PREVALIDATION_METRICS)
+        self.assertEqual(counts.pop("prevalidation_"+reason), 1)
+        self.assertEqual(sum(counts.values()), 0)
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_valid(self):
+        ''' Test valid pedigree files are not rejected. '''
+        for pd in [self.pedigree_data, self.canrisk1_data, self.canrisk2_data, self.canrisk4_data]:
+            PedigreeFile.prevalidate(pd, "BC")
+        self.assertEqual(sum(metrics.get_counts(PedigreeFile.PREVALIDATION_METRICS).values()), 0)
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_header(self):
+        ''' Test an unexpected header is rejected. '''
+        pd = self.canrisk1_data.replace('CanRisk ', 'CanRiska ', 1)
+        with self.assertRaisesRegex(PedigreeFileError, r"header record in the pedigree file has unexpected characters"):
+            PedigreeFile.prevalidate(pd)
+        self.assertRejected("header")
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_num_cols(self):
+        ''' Test records with an unexpected number of data items are rejected. '''
+        pd = self.canrisk1_data.replace('CanRisk 1', 'CanRisk 2', 1)
+        with self.assertRaisesRegex(PedigreeFileError,
+                                    r"CanRisk format 2 and 3 pedigree files should have 27 data items per line."):
+            PedigreeFile.prevalidate(pd)
+        self.assertRejected("fields")
+
+    @pytest.mark.req_WS_VALIDATION_261
+    @override_settings(MAX_PEDIGREE_SIZE=3)
+    def test_size(self):
+        ''' Test oversized pedigrees are rejected. '''
+        with self.assertRaisesRegex(PedigreeError, r"unexpected number of family members"):
+            PedigreeFile.prevalidate(self.canrisk1_data)
+        self.assertRejected("size")
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_target(self):
+        ''' Test pedigrees without a single target are rejected. '''
+        pd = self.canrisk1_data.replace('NICE\tF1\t1\t', 'NICE\tF1\t0\t', 1)
+        with self.assertRaisesRegex(PedigreeError, r"Only one target can be specified"):
+            PedigreeFile.prevalidate(pd)
+        self.assertRejected("target")
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_target_value(self):
+        ''' Test a target value other than 0 or 1 is rejected with the error of the parser. '''
+        pd = self.canrisk1_data.replace('NICE\tF1\t1\t', 'NICE\tF1\t2\t', 1)
+        msg = r"A value in the Target data column has been set to '2'"
+        with self.assertRaisesRegex(PedigreeError, msg):
+            PedigreeFile(pd)
+        with self.assertRaisesRegex(PedigreeError, msg):
+            PedigreeFile.prevalidate(pd)
+        self.assertRejected("target")
+
+    @pytest.mark.req_WS_VALIDATION_261
+    def test_target_viability(self):
+        ''' Test a single pedigree is rejected if the target's risks or probabilities can not be calculated. '''
+        pd = self.canrisk1_data.replace('\t54\t1967\t', '\t54\t0\t', 1)
+        PedigreeFile.prevalidate(pd)        # only checked for a model
+        with self.assertRaisesRegex(PedigreeError, r"This person must be assigned a valid year of birth"):
+            PedigreeFile.prevalidate(pd, "BC")
+        self.assertRejected("viability")
+
+        # female target is not used by the prostate cancer model
+        PedigreeFile.prevalidate(pd, "PC")
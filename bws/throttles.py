@@ -6,7 +6,12 @@ SPDX-FileCopyrightText: 2023 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 import logging
-from rest_framework.throttling import UserRateThrottle, SimpleRateThrottle
+import random
+import time
+
+from django.core.cache import cache as default_cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, UserRateThrottle, SimpleRateThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -58,3 +63,218 @@ class EndUserIDRateThrottle(LogThrottleMixin, SimpleRateThrottle):
             }
         except TypeError:
             return None
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF rate, e.g. '250/min', into the number of requests and the period.
+    @param rate: rate string
+    @return: tuple of the number of requests and the period in seconds
+    """
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class MultiWindowRateThrottle(BaseThrottle):
+    """
+    Evaluate all the rate limits of a user and of the end user (user_id) in one throttle.
+    Each limit uses the generic cell rate algorithm (GCRA), so it is held as a single
+    theoretical arrival time (TAT) rather than a list of request times. The TATs of the user
+    and of its active end users are kept in one cache record, which is read once and written
+    with a compare-and-set, see L{CacheRecord}. A throttled request does not use up any of
+    the limits.
+    """
+    cache = default_cache
+    cache_format = 'throttle_windows_%(ident)s'
+    user_scopes = ('burst', 'sustained')
+    enduser_scopes = ('enduser_burst', )
+    timer = time.time
+    cas_retries = 2
+    THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+
+    def __init__(self):
+        rates = self.THROTTLE_RATES
+        self.user_rates = [parse_rate(rates[s]) for s in self.user_scopes if rates.get(s) is not None]
+        self.enduser_rates = [parse_rate(rates[s]) for s in self.enduser_scopes if rates.get(s) is not None]
+        self.duration = max([p for _n, p in self.user_rates + self.enduser_rates], default=0)
+        self.wait_time = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = str(request.user.pk)
+        else:
+            ident = str(self.get_ident(request))
+        return self.cache_format % {'ident': ident}
+
+    def get_enduser(self, request):
+        ''' End user id, None if not given. '''
+        try:
+            enduser = request.data.get('user_id')
+        except AttributeError:
+            return None
+        return enduser if isinstance(enduser, str) else None
+
+    @staticmethod
+    def check(tats, rates, now):
+        """
+        Apply the GCRA to each limit.
+        @param tats: theoretical arrival time for each limit, or None
+        @param rates: list of the number of requests and period of each limit
+        @param now: current time
+        @return: new TATs if the request is allowed, and the time to wait
+        """
+        new_tats = []
+        wait = 0
+        for i, (num, period) in enumerate(rates):
+            interval = period / num
+            tat = max(tats[i] if tats is not None and i < len(tats) else now, now)
+            allow_at = tat + interval - period      # TAT - burst tolerance
+            if now < allow_at:
+                wait = max(wait, allow_at - now)
+            new_tats.append(tat + interval)
+        return (new_tats if wait == 0 else None), wait
+
+    def allow_request(self, request, view):
+        if not self.user_rates and not self.enduser_rates:
+            return True
+        key = self.get_cache_key(request, view)
+        enduser = self.get_enduser(request) if self.enduser_rates else None
+        record = CacheRecord(self.cache, key)
+        for _i in range(self.cas_retries + 1):
+            now = self.timer()
+            state = record.get() or {}
+            user_tats, user_wait = self.check(state.get('u'), self.user_rates, now)
+            endusers = {k: v for k, v in state.get('e', {}).items() if max(v) > now}    # still active
+            enduser_wait = 0
+            if enduser is not None:
+                enduser_tats, enduser_wait = self.check(endusers.get(enduser), self.enduser_rates, now)
+            if user_wait or enduser_wait:
+                self.wait_time = max(user_wait, enduser_wait)
+                return False
+            if enduser is not None:
+                endusers[enduser] = enduser_tats
+            new_state = {'u': user_tats}
+            if endusers:
+                new_state['e'] = endusers
+            if record.compare_and_set(new_state, self.duration):
+                return True
+        logger.warning(f"throttle record {key} not updated after {self.cas_retries} retries")
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class CombinedRateThrottle(LogThrottleMixin, MultiWindowRateThrottle):
+    """ Throttle requests from a user and end user for the burst, sustained and end user rates. """
+    pass
+
+
+class CostRateThrottle(BaseThrottle):
+    """
+    Limit the model CPU-seconds used by a user, as the cost of a request depends on the pedigree
+    size and the calculations requested rather than on the number of requests. The budget is
+    the 'cpu_seconds' rate, e.g. '3600/day', and is held as a GCRA theoretical arrival time
+    (TAT) advanced by the cost of each request. A request is admitted while the user has
+    budget left; the estimated cost of its model runs, see L{ModelOpts.get_cost}, is charged
+    with L{charge} once they have been run, so a user can overrun the budget by one request
+    before being throttled.
+    """
+    cache = default_cache
+    cache_format = 'throttle_cost_%(ident)s'
+    scope = 'cpu_seconds'
+    timer = time.time
+    cas_retries = 2
+    THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+
+    def __init__(self):
+        rate = self.THROTTLE_RATES.get(self.scope)
+        self.budget, self.period = parse_rate(rate) if rate is not None else (None, None)
+        self.wait_time = None
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = str(request.user.pk)
+        else:
+            ident = str(self.get_ident(request))
+        return self.cache_format % {'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.budget is None:
+            return True
+        now = self.timer()
+        tat = CacheRecord(self.cache, self.get_cache_key(request)).get()
+        if tat is not None and tat - self.period > now:
+            self.wait_time = tat - self.period - now
+            logger.warning(f"Request throttled ({self.__class__.__name__}); USER: {request.user}")
+            return False
+        return True
+
+    def charge(self, request, cost):
+        """
+        Charge the cost of a request to the user's budget.
+        @param request: request
+        @param cost: CPU-seconds used by the request
+        """
+        if self.budget is None or cost <= 0:
+            return
+        key = self.get_cache_key(request)
+        record = CacheRecord(self.cache, key)
+        for _i in range(self.cas_retries + 1):
+            now = self.timer()
+            tat = max(record.get() or now, now) + cost * self.period / self.budget
+            if record.compare_and_set(tat, tat - now):
+                return
+        logger.warning(f"throttle record {key} not charged after {self.cas_retries} retries")
+
+    def wait(self):
+        return self.wait_time
+
+
+class CacheRecord(object):
+    """
+    A cache record that is read once and then written only if it has not changed since it was
+    read. Memcached (pymemcache) gets/cas are used if the cache supports them. Otherwise the
+    record holds a random version and a writer first claims the version it read with cache.add,
+    which is atomic in the Django cache backends, so only one of several concurrent writers
+    succeeds.
+    """
+    CLAIM_TIMEOUT = 10
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.token = None
+        self.version = None
+
+    def _client(self):
+        ''' Memcached client supporting gets and cas, or None. '''
+        client = getattr(self.cache, '_cache', None)
+        return client if hasattr(client, 'gets') and hasattr(client, 'cas') else None
+
+    def get(self):
+        client = self._client()
+        if client is not None:
+            value, self.token = client.gets(self.cache.make_and_validate_key(self.key))
+            return value
+        value = self.cache.get(self.key)
+        if value is None:
+            self.version = None
+            return None
+        self.version, value = value
+        return value
+
+    def compare_and_set(self, value, timeout):
+        client = self._client()
+        if client is not None:
+            key = self.cache.make_and_validate_key(self.key)
+            expire = self.cache.get_backend_timeout(timeout)
+            if self.token is None:
+                return bool(client.add(key, value, expire=expire, noreply=False))
+            return bool(client.cas(key, value, self.token, expire=expire, noreply=False))
+        if self.version is None:    # absent when read, so adding the record is the claim
+            return bool(self.cache.add(self.key, (random.getrandbits(48), value), timeout=timeout))
+        if not self.cache.add(f"{self.key}:claim:{self.version}", 1, timeout=self.CLAIM_TIMEOUT):
+            return False        # written by another request since it was read
+        self.cache.set(self.key, (random.getrandbits(48), value), timeout=timeout)
+        return True
@@ -0,0 +1,606 @@
+"""
+Pedigree validation rules and the engine that applies them.
+
+The rules are applied in a single pass over the pedigree using lookups that are
+built once per pedigree (people by IndivID, sibships, MZ twins and the family
+members connected to the target). Each rule raises a L{CanRiskError} for a problem
+it finds and may return a list of warnings. The engine collects every error and
+warning in a L{ValidationReport} rather than stopping at the first error.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+import bws.cancer as cancer
+import bws.consts as consts
+from bws.exceptions import CanRiskError, CancerError, GeneticTestError, PathologyError, PedigreeError, \
+    PersonError
+from bws.risk_factors.mdensity import Volpara, Stratus
+
+
+class PedigreeIndex():
+    """
+    Lookups shared by the validation rules, built once per pedigree.
+    """
+
+    def __init__(self, pedigree):
+        """
+        @param pedigree: the pedigree to index
+        """
+        self.pedigree = pedigree
+        self.people = {}                        # IndivID -> first family member with that IndivID
+        self.sibships = defaultdict(list)       # (FathID, MothID) -> children
+        self.twins = {}                         # MZ twin character -> family members
+        for p in pedigree.people:
+            self.people.setdefault(p.pid, p)
+            if p.fathid != "0" and p.mothid != "0":
+                self.sibships[(p.fathid, p.mothid)].append(p)
+            if p.mztwin != "0":
+                self.twins.setdefault(p.mztwin, []).append(p)
+        self.target = pedigree.get_target()
+
+    def get_person(self, pid):
+        """
+        Get a person in the pedigree by their IndivID.
+        @return: the requested person or None
+        """
+        return self.people.get(pid)
+
+    def get_siblings(self, person):
+        """
+        Get the siblings of the given person, see L{Pedigree.get_siblings}.
+        @return: siblings and siblings with the same year of birth
+        """
+        if person.fathid == "0" or person.mothid == "0":
+            return ([], [])
+        siblings = [p for p in self.sibships[(person.fathid, person.mothid)] if p.pid != person.pid]
+        return (siblings, [p for p in siblings if p.yob == person.yob])
+
+    def unconnected(self):
+        """
+        Determines those people connected to the target through their parents, and
+        identifies those individuals that are not connected.
+        @return: a list of individuals that aren't connected to the target
+        """
+        relatives = defaultdict(list)
+        for p in self.pedigree.people:
+            for parent in (p.mothid, p.fathid):
+                if parent != '0':
+                    relatives[p.pid].append(parent)
+                    relatives[parent].append(p.pid)
+
+        connected = {self.target.pid}
+        stack = [self.target.pid]
+        while stack:
+            for pid in relatives[stack.pop()]:
+                if pid not in connected:
+                    connected.add(pid)
+                    stack.append(pid)
+        return [p.pid for p in self.pedigree.people if p.pid not in connected]
+
+
+class ValidationReport():
+    """
+    Errors and warnings collected by applying validation rules.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+
+    def apply(self, rules, obj, index=None):
+        """
+        Apply each rule to an object collecting errors and warnings.
+        @param rules: list of rules
+        @param obj: pedigree, person or MZ twins the rules apply to
+        @keyword index: L{PedigreeIndex} of the pedigree
+        """
+        for rule in rules:
+            try:
+                warnings = rule(obj, index)
+                if warnings:
+                    self.warnings.extend(warnings)
+            except CanRiskError as e:
+                self.errors.append(e)
+        return self
+
+    def is_valid(self):
+        return len(self.errors) == 0
+
+    def raise_first(self):
+        """
+        Raise the first error found.
+        @return: warnings if no errors were found
+        """
+        if self.errors:
+            raise self.errors[0]
+        return self.warnings
+
+
+def _is_age(age):
+    return consts.REGEX_AGE.match(age) is not None
+
+
+#
+# Pedigree rules
+def famid_rule(pedigree, index):
+    famid = pedigree.famid
+    if(len(famid) > settings.MAX_LENGTH_PEDIGREE_NUMBER_STR or
+       not consts.REGEX_ALPHANUM_HYPHENS.match(famid) or        # must be alphanumeric plus hyphen
+       consts.REGEX_ONLY_HYPHENS.match(famid) or                # but not just hyphens
+       consts.REGEX_ONLY_ZEROS.match(famid)):                   # and not just zeros
+        raise PedigreeError(
+            "Family ID (1st data column) has been set to '" + famid +
+            "'. Family IDs must be specified with between 1 and "+str(settings.MAX_LENGTH_PEDIGREE_NUMBER_STR) +
+            " non-zero number or alphanumeric characters.", famid)
+
+
+def connected_rule(pedigree, index):
+    unconnected = index.unconnected()
+    if len(unconnected) > 0:
+        raise PedigreeError("Pedigree (" + pedigree.famid + ") family members are not physically " +
+                            "connected to the target: " + str(unconnected), pedigree.famid)
+
+
+def target_yob_rule(pedigree, index):
+    target = index.target
+    if target.yob == '0':
+        raise PedigreeError("The target's year of birth has been set to '" + target.yob +
+                            "'. This person must be assigned a valid year of birth.", target.famid)
+
+
+def target_age_rule(pedigree, index):
+    target = index.target
+    if target.age == '0':
+        raise PedigreeError("The target's age has been set to '" + target.age +
+                            "'. This person must be assigned an age.", target.famid)
+
+
+def viable_rule(pedigree, index):
+    ''' Check that carrier probabilities / cancer risks can be computed. '''
+    target = index.target
+    try:
+        carrier_probs = pedigree.is_carrier_probs_viable(target=target)
+        cancer_risks = pedigree.is_risks_calc_viable(target=target)
+    except ValueError:
+        return          # invalid target age or year of birth, reported by the person rules
+    if(not carrier_probs and not cancer_risks):
+        raise PedigreeError(
+            "BOADICEA cannot compute mutation carrier probabilities because the target '" + target.pid +
+            "' has a positive genetic test. Also BOADICEA cannot compute breast and ovarian cancer "
+            "risks because the target is: (1) over " + str(settings.MAX_AGE_FOR_RISK_CALCS) +
+            " years old or (2) male, or (3) an affected female who has developed contralateral "
+            "breast cancer, ovarian cancer or pancreatic cancer, or (4) deceased.", target.famid)
+
+
+def mdensity_ethnicity_rule(pedigree, index):
+    ''' Volpara and Stratus are currently not configured for all ethnic groups. '''
+    ons_ethnicity = getattr(pedigree, 'ons_ethnicity', None)
+    mdensity = getattr(pedigree, 'mdensity', None)
+    if ons_ethnicity is not None and mdensity is not None:
+        if ons_ethnicity.ethnicity != 'white' and isinstance(mdensity, (Volpara, Stratus)):
+            raise PedigreeError("Volpara and Stratus are currently not configured for all ethnic groups.")
+
+
+def mztwin_pairs_rule(pedigree, index):
+    ''' Check the maximum number of MZ twin pairs per pedigree has not been exceeded. '''
+    if len(index.twins) > settings.MAX_NUMBER_MZ_TWIN_PAIRS:
+        raise PedigreeError("Maximum number of MZ twin pairs has been exceeded. Input pedigrees must have a "
+                            "maximum of " + str(settings.MAX_NUMBER_MZ_TWIN_PAIRS) + " MZ twin pairs.",
+                            pedigree.famid)
+
+
+#
+# MZ twin rules, applied to the family members sharing an MZ twin character
+def mztwin_count_rule(twins, index):
+    ''' Check that MZ siblings are only specified as twins, no identical triplets etc. '''
+    if len(twins) != 2:
+        raise PedigreeError(
+            "MZ twin identifier [mztwin=" + str(twins[0].mztwin) + "] does not appear twice in the pedigree file. "
+            "Only MZ twins are permitted in the pedigree, MZ triplets or quads are not allowed.",
+            twins[0].famid)
+
+
+def mztwin_char_rule(twins, index):
+    t = twins[0].mztwin
+    if len(t) != 1 or t not in settings.UNIQUE_TWIN_IDS:
+        raise PedigreeError("Invalid MZ twin character '" + t + "'. MZ twins must be identified using one " +
+                            "of the following ASCII characters: " + str(settings.UNIQUE_TWIN_IDS) + ".",
+                            twins[0].famid)
+
+
+def mztwin_consistent_rule(twins, index):
+    ''' Check that monozygotic (MZ) twin data are consistent. '''
+    if len(twins) != 2:
+        return
+    t = twins[0].mztwin
+    if(twins[0].mothid != twins[1].mothid or
+       twins[0].fathid != twins[1].fathid):
+        raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
+                            "parents. MZ twins must have the same parents.", twins[0].famid)
+    if(twins[0].yob != twins[1].yob):
+        raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
+                            "years of birth. MZ twins must have the same year of birth.", twins[0].famid)
+
+    # Check that living MZ twins have the same age at last follow up
+    if(twins[0].dead == '0' and twins[1].dead == '0' and twins[0].age != twins[1].age):
+        raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have different "
+                            "ages. If both MZ twins are alive, they must have the same age at last follow up.",
+                            twins[0].famid)
+
+    if twins[0].sex() != twins[1].sex():
+        raise PedigreeError("Monozygotic (MZ) twins identified with the character '" + t + "' have a different "
+                            "sex. MZ twins must have the same sex.", twins[0].famid)
+
+
+def mztwin_genetic_tests_rule(twins, index):
+    ''' Check that the MZ twins have the same genetic status. '''
+    if len(twins) == 2 and not cancer.GeneticTest.compareTestResults(twins[0], twins[1]):
+        raise PedigreeError("Monozygotic (MZ) twins have both had a genetic test, but the genetic test results "
+                            "for these individuals are different. Under these circumstances, the genetic test "
+                            "results must be the same.", twins[0].famid)
+
+
+#
+# Person rules
+def name_rule(person, index):
+    if(person.name == '' or
+       not consts.REGEX_ALPHANUM_HYPHENS.match(person.name)):
+        raise PersonError("A name '"+person.name+"' is unspecified or is not an alphanumeric string.", person.famid)
+
+
+def pid_rule(person, index):
+    if(len(person.pid) < settings.MIN_FAMILY_ID_STR_LENGTH or
+       len(person.pid) > settings.MAX_FAMILY_ID_STR_LENGTH or
+       consts.REGEX_ONLY_ZEROS.match(person.pid) or
+       not consts.REGEX_ALPHANUM_HYPHENS.match(person.pid)):
+        raise PersonError("An individual identifier (IndivID column) was specified as '" + person.pid +
+                          ". Individual identifiers must be alphanumeric strings with a maximum of " +
+                          str(settings.MAX_FAMILY_ID_STR_LENGTH)+"characters.", person.famid)
+
+
+def parent_ids_rule(person, index):
+    if(len(person.fathid) < settings.MIN_FAMILY_ID_STR_LENGTH or
+       len(person.fathid) > settings.MAX_FAMILY_ID_STR_LENGTH or
+       not consts.REGEX_ALPHANUM_HYPHENS.match(person.fathid)):
+        raise PersonError("Father identifier ('" + person.fathid + "', FathID column) has unexpected characters. "
+                          "It must be alphanumeric strings with a maximum of " +
+                          str(settings.MAX_FAMILY_ID_STR_LENGTH) + " characters", person.famid)
+
+    if(len(person.mothid) < settings.MIN_FAMILY_ID_STR_LENGTH or
+       len(person.mothid) > settings.MAX_FAMILY_ID_STR_LENGTH or
+       not consts.REGEX_ALPHANUM_HYPHENS.match(person.mothid)):
+        raise PersonError("Mother identifier ('" + person.mothid + "', MothID column) has unexpected characters. "
+                          "It must be alphanumeric strings with a maximum of " +
+                          str(settings.MAX_FAMILY_ID_STR_LENGTH) + " characters", person.famid)
+
+
+def parents_rule(person, index):
+    if(person.fathid == '0' and person.mothid != '0') or (person.fathid != '0' and person.mothid == '0'):
+        raise PersonError("Family member '"+person.name+"' has only one parent specified. All family members must "
+                          "have no parents specified (i.e. they must be founders) or both parents specified.",
+                          person.famid)
+
+    # check for missing parents
+    mother = index.get_person(person.mothid) if person.mothid != '0' else None
+    father = index.get_person(person.fathid) if person.fathid != '0' else None
+    if person.mothid != '0' and mother is None:
+        raise PersonError("The mother '"+person.mothid+"' of family member '" + person.pid +
+                          "' is missing from the pedigree.", person.famid)
+    elif person.fathid != '0' and father is None:
+        raise PersonError("The father '"+person.fathid+"' of family member '" + person.pid +
+                          "' is missing from the pedigree.", person.famid)
+
+    # check all fathers are male
+    if father is not None and father.sex() != 'M':
+        raise PersonError("The father of family member '" + person.pid + "' is not specified as male. " +
+                          "All fathers in the pedigree must have sex specified as 'M'.", person.famid)
+    # check all mothers are female
+    if mother is not None and mother.sex() != 'F':
+        raise PersonError("The mother of family member '" + person.pid + "' is not specified as female. " +
+                          "All mothers in the pedigree must have sex specified as 'F'.", person.famid)
+
+
+def dead_rule(person, index):
+    if person.dead != '0' and person.dead != '1':
+        raise PersonError("The family member '" + person.pid + "' has an invalid vital status " +
+                          "(alive must be specified as '0', and dead specified as '1')", person.famid)
+
+
+def age_rule(person, index):
+    ''' Check that age of last follow up set to either 0 (unknown) or in range 1-110. '''
+    if not _is_age(person.age) or int(person.age) > settings.MAX_AGE:
+        raise PersonError("The age specified for family member '" + person.pid + "' has unexpected " +
+                          "characters. Ages must be specified with as '0' for unknown, or in the " +
+                          "range 1-" + str(settings.MAX_AGE), person.famid)
+
+
+def yob_rule(person, index):
+    current_year = date.today().year
+    if person.yob != "0":
+        if(not consts.REGEX_YEAR_OF_BIRTH.match(person.yob) or
+           int(person.yob) < settings.MIN_YEAR_OF_BIRTH or
+           int(person.yob) > current_year):
+            raise PersonError("The year of birth '" + person.yob + "' specified for family member '" + person.pid +
+                              "' is out of range. Years of birth must be in the range " +
+                              str(settings.MIN_YEAR_OF_BIRTH) + "-" + str(current_year))
+
+
+def ashkn_rule(person, index):
+    if(not consts.REGEX_ASHKENAZI_STATUS.match(person.ashkn)):
+        raise PersonError("Family member '" + person.pid + "' has been assigned an invalid Ashkenazi "
+                          "origin parameter. The Ashkenazi origin parameter must be set to '1' "
+                          "for Ashkenazi origin, or '0' for not Ashkenazi origin.")
+
+
+def siblings_rule(person, index):
+    (siblings, siblings_same_yob) = index.get_siblings(person)
+    if len(siblings) > settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY:
+        raise PersonError("Family member '" + person.pid + "' exceeded the maximum number of siblings (" +
+                          str(settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY) + ".")
+    # Check has siblings with the same year of birth
+    if len(siblings_same_yob) > settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY_WITH_SAME_YOB:
+        raise PersonError("Family member '" + person.pid + "' exceeded the maximum number of siblings " +
+                          "with the same year of birth exceeded (" +
+                          str(settings.MAX_NUMBER_OF_SIBS_PER_NUCLEAR_FAMILY_WITH_SAME_YOB) + ")")
+
+
+#
+# Cancer diagnosis rules
+def diagnosis_age_rule(person, index):
+    ''' Check that the age at cancer diagnosis is an unsigned integer or set to 'AU'
+    and is within range i.e. 0-110 (-1 for unaffected) '''
+    for ctype, diagnosis in zip(cancer.CANCER_TYPES, person.cancers.diagnoses):
+        dage = diagnosis.age
+        if((not _is_age(dage) and dage != 'AU' and dage != '-1') or
+           (_is_age(dage) and int(dage) > settings.MAX_AGE)):
+            raise CancerError(_("Family member \"%(id)s\" has an age at cancer diagnosis (%(ctype)s) "
+                                "specified as %(dage)s. Age at cancer diagnosis " +
+                                "must be set to '0' for unaffected, 'AU' for affected at unknown age, or " +
+                                "specified with an integer in the range 1-%(max_age)s.")
+                              % {'id': person.pid, 'ctype': ctype, 'dage': dage,
+                                 'max_age': settings.MAX_AGE}, person.famid)
+
+
+def diagnosis_follow_up_rule(person, index):
+    ''' Check that the age at last follow up is greater or equal to that of all cancer diagnoses. '''
+    if not _is_age(person.age):
+        return
+    for diagnosis in person.cancers.diagnoses:
+        dage = diagnosis.age
+        if _is_age(dage) and int(person.age) < int(dage):
+            raise CancerError(_("Family member \"%(id)s\" has been assigned an age at cancer " +
+                                "diagnosis that exceeds age at last follow up. An age at cancer " +
+                                "diagnosis must not exceed an age at last follow up.")
+                              % {'id': person.pid}, person.famid)
+
+
+def diagnosis_sex_rule(person, index):
+    diagnoses = person.cancers.diagnoses
+    # Check that males don't have an ovarian cancer diagnosis
+    if person.sex() == 'M' and diagnoses.oc.age != '-1':
+        raise CancerError(_("Family member \"%(id)s\" is male but has been assigned an " +
+                            "ovarian cancer diagnosis.")
+                          % {'id': person.pid}, person.famid)
+
+    # Check that females don't have a prostate cancer diagnosis
+    if person.sex() == 'F' and diagnoses.prc.age != '-1':
+        raise CancerError(_("Family member \"%(id)s\" is female but has been assigned an " +
+                            "prostate cancer diagnosis.")
+                          % {'id': person.pid}, person.famid)
+
+
+def diagnosis_yob_rule(person, index):
+    ''' Check that individuals who have cancer have a year of birth. '''
+    if person.cancers.is_cancer_diagnosed() and person.yob == '0':
+        raise CancerError(_("Family member \"%(id)s\" has been diagnosed with cancer but " +
+                            "has no year of birth specified. All family members with cancer must " +
+                            "have a valid year of birth. If an affected family member's year of " +
+                            "birth is unknown, it is always better to provide some estimate of " +
+                            "it so that risks are not underestimated.")
+                          % {'id': person.pid}, person.famid)
+
+
+def contralateral_rule(person, index):
+    ''' Check that the age of a second breast cancer exceeds that of the first. '''
+    diagnoses = person.cancers.diagnoses
+    bc1 = getattr(diagnoses, "bc1", None)
+    bc2 = getattr(diagnoses, "bc2", None)
+    if bc1 is None or bc2 is None:
+        return
+    if(_is_age(bc2.age) and bc2.age != '-1'):
+        if bc1.age == '-1':
+            raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
+                                "but the age at diagnosis of the first breast cancer is missing.")
+                              % {'id': person.pid}, person.famid)
+        elif(_is_age(bc1.age) and int(bc1.age) > int(bc2.age)):
+            raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
+                                "but the age at diagnosis of the first breast cancer exceeds that " +
+                                "of the second breast cancer.")
+                              % {'id': person.pid}, person.famid)
+
+    # Check that a 2BC set to affected unknown (AU) is accompanied by a 1BC
+    if(bc2.age == 'AU' and bc1.age == '-1'):
+        raise CancerError(_("Family member \"%(id)s\" has had contralateral breast cancer, " +
+                            "but the age at diagnosis of the first breast cancer is missing.")
+                          % {'id': person.pid}, person.famid)
+
+
+#
+# Pathology rules
+def pathology_status_rule(person, index):
+    ''' Check that the pathology results are correctly set (0, N, P). '''
+    for t in person.pathology:
+        if not t.is_valid_result():
+            raise PathologyError("Family member '" + person.pid + "' has been assigned an invalid " + t.test_type +
+                                 " status. It must be 'N' for negative, 'P' for positive, or '0' for unknown.",
+                                 person.famid)
+
+
+def pathology_bc_rule(person, index):
+    ''' Check that pathology test results are only provided for family members with a first breast cancer. '''
+    if person.cancers.diagnoses.bc1.age != '-1':
+        return
+    for t in person.pathology:
+        if t.result != '0' and t.is_valid_result():
+            raise PathologyError("Family member '" + person.pid + "' has not developed breast cancer but has " +
+                                 "been assigned a breast cancer pathology test result (" + t.test_type + "). " +
+                                 "Pathology test results can only be assigned to family members who have " +
+                                 "developed breast cancer.", person.famid)
+
+
+def pathology_warnings_rule(person, index):
+    ''' Warn about breast cancer pathology data that will not be taken into account. '''
+    warnings = []
+    # if the individual has had breast cancer
+    if person.cancers.diagnoses.bc1.age == "-1":
+        return warnings
+    tests = person.pathology
+    rules = _("Please note the following rules for breast cancer pathology data: "
+              "(1) if an individual's ER status is unspecified, no pathology information for that individual "
+              "will be taken into account in the calculation; "
+              "(2) if a breast cancer is ER positive, no other pathology information for that individual will "
+              "be taken into account in the calculation; "
+              "(3) if a breast cancer is ER negative, information on PR and HER2 are only employed jointly: "
+              "i.e. either the cancer is triple negative (ER-/PR-/HER2-) or it's not (i.e. ER-/PR-/HER2+ or "
+              "ER-/PR+/HER2- or ER-/PR+/HER2+), no other options are considered; and "
+              "(4) an individual's CK14 and CK5/6 status will only be taken into account in the calculation "
+              "if both CK14 and CK5/6 are specified and the breast cancer is triple negative (ER negative, PR "
+              "negative and HER2 negative). ")
+
+    # If ER is unspecified but another pathology parameter has been specified,
+    # report that no pathology data will be used
+    if(tests.er.result == "0" and (tests.pr.result != "0" or tests.her2.result != "0" or
+                                   tests.ck14.result != "0" or tests.ck56.result != "0")):
+        warnings.append(
+            _("Incomplete data record in the pedigree: family member \"%(id)s\" has an unspecified ER status, "
+              "but another pathology parameter (PR, HER2, CK14 or CK5/6) has been specified. %(rules)s As a "
+              "result, this individual's pathology information will not be taken into account in this case.")
+            % {'id': person.pid, 'rules': rules})
+
+    # If ER negative and PR status is specified but HER2 status is unspecified (or vice versa) report a warning
+    if(tests.er.result == "N" and
+       (tests.pr.result != "0" and tests.her2.result == "0") or
+       (tests.pr.result == "0" and tests.her2.result != "0")):
+        warnings.append(
+            _("Incomplete data record in the pedigree: family member \"%(id)s\" has a breast cancer "
+              "pathology where PR status is specified but HER2 status is unspecified (or vice versa). %(rules)s"
+              "As a result, PR and HER2 status will not be taken into account in this case.")
+            % {'id': person.pid, 'rules': rules})
+
+    # If either CK14 or CK5/6 has been specified (one without the other) generate a warning
+    if((tests.ck14.result != "0" and tests.ck56.result == "0") or
+       (tests.ck14.result == "0" and tests.ck56.result != "0")):
+        warnings.append(
+            _("Incomplete data record in the pedigree: family member \"%(id)s\" has a breast cancer "
+              "pathology where only CK14 or CK5/6 status has been specified. %(rules)s As a result, CK14 and "
+              "CK5/6 status will not be taken into account in this case.")
+            % {'id': person.pid, 'rules': rules})
+
+    # If not Triple Negative but CK14 and CK5/6 are specified generate a warning
+    if((tests.er.result != "N" or tests.pr.result != "N" or tests.her2.result != "N") and
+       (tests.ck14.result != "0" and tests.ck56.result != "0")):
+        warnings.append(
+            _("Incomplete data record in your pedigree: family member \"%(id)s\" has a breast cancer "
+              "pathology where CK14 or CK5/6 status is specified but the breast cancer pathology is not triple "
+              "negative (ER negative, PR negative and HER2 negative). %(rules)s As a result, CK14 and CK5/6 "
+              "status will not be taken into account in this case.")
+            % {'id': person.pid, 'rules': rules})
+
+    # If ER positive, and PR or HER2 or CK14 or CK5/6 specified generate a warning
+    if(tests.er.result == "P" and (tests.pr.result != "0" or tests.her2.result != "0" or
+                                   tests.ck14.result != "0" or tests.ck56.result != "0")):
+        warnings.append(
+            _("Incomplete data record in your pedigree: family member \"%(id)s\" has a breast cancer pathology "
+              "that is ER positive, where an additional pathology parameter (PR, HER2, CK14 or CK5/6) "
+              "has been specified. %(rules)s As a result, only ER positive status will be taken into account "
+              "in this case.")
+            % {'id': person.pid, 'rules': rules})
+    return warnings
+
+
+#
+# Genetic test rules
+def gtest_type_rule(person, index):
+    ''' Check that the genetic test type is valid. '''
+    for t in person.gtests:
+        if not t.is_valid_type():
+            raise GeneticTestError(_("Family member \"%(id)s\" has been assigned an invalid "
+                                     "genetic test type. It must be specified with '0' for untested, "
+                                     "'S' for mutation search or 'T' for direct gene test.")
+                                   % {'id': person.pid}, person.famid)
+
+
+def gtest_result_rule(person, index):
+    ''' Check that the mutation status is valid. '''
+    for t in person.gtests:
+        if not t.is_valid_result():
+            raise GeneticTestError(_("Family member \"%(id)s\" has been assigned an invalid "
+                                     "genetic test result. Genetic test results must be '0' for untested, "
+                                     "'N' for no mutation, 'P' mutation detected.")
+                                   % {'id': person.pid}, person.famid)
+
+
+def gtest_complete_rule(person, index):
+    ''' Check that a genetic test has both a type and result. '''
+    for t in person.gtests:
+        if not t.is_valid_type() or not t.is_valid_result():
+            continue
+        # If tested, check that there us a test result
+        if t.test_type != "0" and t.result == '0':
+            raise GeneticTestError(_("Family member \"%(id)s\" has had a genetic test but the "
+                                     "corresponding test result has not been specified.")
+                                   % {'id': person.pid}, person.famid)
+        # If there is a genetic test result check the test type is specified
+        if t.test_type == "0" and t.result != '0':
+            raise GeneticTestError(_("Family member \"%(id)s\" has been assigned a genetic test " +
+                                   "result, but the corresponding genetic test type has not been specified.")
+                                   % {'id': person.pid}, person.famid)
+
+
+PEDIGREE_RULES = [famid_rule, connected_rule, target_yob_rule, target_age_rule, viable_rule,
+                  mdensity_ethnicity_rule, mztwin_pairs_rule]
+MZTWIN_RULES = [mztwin_count_rule, mztwin_char_rule, mztwin_consistent_rule, mztwin_genetic_tests_rule]
+PERSON_RULES = [name_rule, pid_rule, parent_ids_rule, parents_rule, dead_rule, age_rule, yob_rule,
+                ashkn_rule, siblings_rule]
+CANCER_RULES = [diagnosis_age_rule, diagnosis_follow_up_rule, diagnosis_sex_rule, diagnosis_yob_rule,
+                contralateral_rule]
+PATHOLOGY_RULES = [pathology_status_rule, pathology_bc_rule, pathology_warnings_rule]
+GENETIC_TEST_RULES = [gtest_type_rule, gtest_result_rule, gtest_complete_rule]
+
+
+def check(rules, obj, index=None):
+    """
+    Apply a set of rules, raising the first error found.
+    @param rules: list of rules
+    @param obj: pedigree, person or MZ twins the rules apply to
+    @keyword index: L{PedigreeIndex} of the pedigree
+    @return: list of warnings
+    """
+    return ValidationReport().apply(rules, obj, index).raise_first()
+
+
+def validate_pedigree(pedigree, index=None):
+    """
+    Validate the pedigree and the people, cancers, pathology and genetic tests in it
+    in a single pass, collecting all errors and warnings.
+    @param pedigree: the pedigree to validate
+    @keyword index: L{PedigreeIndex} of the pedigree
+    @return: L{ValidationReport}
+    """
+    index = PedigreeIndex(pedigree) if index is None else index
+    report = ValidationReport()
+    report.apply(PEDIGREE_RULES, pedigree, index)
+    for twins in index.twins.values():
+        report.apply(MZTWIN_RULES, twins, index)
+
+    person_rules = PERSON_RULES + CANCER_RULES + PATHOLOGY_RULES + GENETIC_TEST_RULES
+    for p in pedigree.people:
+        report.apply(person_rules, p, index)
+    return report
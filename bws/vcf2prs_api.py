@@ -6,33 +6,33 @@ SPDX-FileCopyrightText: 2023 University of Cambridge
 SPDX-License-Identifier: GPL-3.0-or-later
 """
 
+import csv
 import io
 import logging
-import os
-from pathlib import Path
-from statistics import NormalDist
 import time
 import traceback
+import zlib
 
-from drf_spectacular.utils import extend_schema
 from rest_framework import serializers, status, parsers
-from rest_framework.authentication import BasicAuthentication, \
-    SessionAuthentication, TokenAuthentication
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import NotAcceptable, ValidationError
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.serializers import FileField
 from rest_framework.views import APIView
-from vcf2prs import myPyVCF
-import vcf2prs
 from vcf2prs.exception import Vcf2PrsError
-from vcf2prs.prs import Prs
 
+from bws.authentication import CachedBasicAuthentication, CachedTokenAuthentication
+import bws.percentiles as percentiles
+from bws.prs_alpha import get_reference_file_path
+from bws.prs_cache import prs_models
+from bws.prs_vcf import get_sample_names, get_variant_keys, open_vcf, read_header, read_vcf
 from bws.rest_api import RequiredAnyPermission
+from bws.schema import ViewSchema, extend_schema
 from bws.serializers import PRSField
 from bws.settings import BC_MODEL, OC_MODEL, PC_MODEL
-from bws.throttles import BurstRateThrottle, EndUserIDRateThrottle, SustainedRateThrottle
+from bws.throttles import CombinedRateThrottle
 
 
 #from django.conf import settings
@@ -42,8 +42,11 @@ logger = logging.getLogger(__name__)
 class Vcf2PrsInputSerializer(serializers.Serializer):
     ''' Vcf2Prs input. '''
     vcf_file = FileField(required=True, help_text=(
-        "VCF genotype file. The file should be VCF format v4.0 or v4.1. It can contain "
-        "both additional samples and variants not used in the PRS and are ignored."))
+        "VCF genotype file. The file should be VCF format v4.0 or v4.1 and may be gzip or "
+        "BGZF compressed. It can contain both additional samples and variants not used in the PRS and are ignored."))
+    vcf_index = FileField(required=False, help_text=(
+        "Tabix (.tbi) or CSI (.csi) index of a BGZF compressed and coordinate-sorted VCF file, used to "
+        "read only the records at the PRS variant positions."))
     sample_name = serializers.CharField(min_length=1, max_length=40, required=False,
                                         help_text="Name of the sample in the genotype file to be used to calculate the PRS")
 
@@ -77,6 +80,42 @@ class Vcf2PrsOutputSerializer(serializers.Serializer):
     prostate_cancer_prs = PRSField(read_only=True)
 
 
+class Vcf2PrsBatchInputSerializer(Vcf2PrsInputSerializer):
+    ''' Vcf2Prs batch input. '''
+    sample_name = None
+    sample_names = serializers.ListField(child=serializers.CharField(min_length=1, max_length=40), required=False,
+                                         allow_empty=False,
+                                         help_text="Names of the samples in the genotype file, defaults to all samples")
+
+
+class PrsCsvRenderer(BaseRenderer):
+    """
+    Render a batch PRS table as CSV with a row for each sample, e.g. the column
+    breast_cancer_prs_zscore holds the breast cancer PRS z-score.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        if isinstance(data, dict) and 'error' not in data and isinstance(data.get('samples'), list):
+            columns = []
+            for row in data['samples']:
+                for name, prs in row.items():
+                    if name != 'sample':
+                        columns.extend(f"{name}_{k}" for k in prs.keys() if f"{name}_{k}" not in columns)
+            writer.writerow(['sample'] + columns)
+            for row in data['samples']:
+                values = {f"{name}_{k}": v for name, prs in row.items() if name != 'sample' for k, v in prs.items()}
+                writer.writerow([row['sample']] + [values.get(c, '') for c in columns])
+        elif isinstance(data, dict):
+            for k, v in data.items():       # e.g. an error
+                writer.writerow([k, v])
+        return buf.getvalue().encode(self.charset)
+
+
 class Vcf2PrsView(APIView):
     any_perms = ['boadicea_auth.can_risk',
                  'boadicea_auth.commercial_api_breast',
@@ -85,9 +124,10 @@ class Vcf2PrsView(APIView):
     parser_classes = [parsers.MultiPartParser]
     renderer_classes = (JSONRenderer, BrowsableAPIRenderer, )
     serializer_class = Vcf2PrsInputSerializer
-    authentication_classes = (SessionAuthentication, BasicAuthentication, TokenAuthentication, )
+    authentication_classes = (SessionAuthentication, CachedBasicAuthentication, CachedTokenAuthentication, )
+    schema = ViewSchema()      # documents the cached authentication, see bws.schema_extensions
     permission_classes = (IsAuthenticated, RequiredAnyPermission)
-    throttle_classes = (BurstRateThrottle, SustainedRateThrottle, EndUserIDRateThrottle)
+    throttle_classes = (CombinedRateThrottle, )
 
     def post(self, request):
         """
@@ -99,33 +139,12 @@ class Vcf2PrsView(APIView):
             validated_data = serializer.validated_data
             vcf_file = validated_data.get("vcf_file")
 
-            moduledir = Path(vcf2prs.__file__).parent.parent
-            bc_prs_ref_file = validated_data.get("bc_prs_reference_file", None)
-            oc_prs_ref_file = validated_data.get("oc_prs_reference_file", None)
-            pc_prs_ref_file = validated_data.get("pc_prs_reference_file", None)
-            if bc_prs_ref_file is None and oc_prs_ref_file is None and pc_prs_ref_file is None:
-                raise ValidationError('No breast, ovarian or prostate cancer PRS reference file provided')
-            else:
-                if bc_prs_ref_file is not None:
-                    bc_prs_ref_file = os.path.join(moduledir, "PRSmodels_CanRisk", bc_prs_ref_file)
-                if oc_prs_ref_file is not None:
-                    oc_prs_ref_file = os.path.join(moduledir, "PRSmodels_CanRisk", oc_prs_ref_file)
-                if pc_prs_ref_file is not None:
-                    pc_prs_ref_file = os.path.join(moduledir, "PRSmodels_CanRisk", pc_prs_ref_file)
-
+            ref_files = Vcf2PrsView.get_ref_files(validated_data)
             sample_name = validated_data.get("sample_name", None)
 
             try:
-                data = {}
-                vcfStr = io.TextIOWrapper(vcf_file.file).read()
-                if bc_prs_ref_file is not None:
-                    data['breast_cancer_prs'] = Vcf2PrsView.get_prs(vcfStr, bc_prs_ref_file, sample_name)
-
-                if oc_prs_ref_file is not None:
-                    data['ovarian_cancer_prs'] = Vcf2PrsView.get_prs(vcfStr, oc_prs_ref_file, sample_name)
-
-                if pc_prs_ref_file is not None:
-                    data['prostate_cancer_prs'] = Vcf2PrsView.get_prs(vcfStr, pc_prs_ref_file, sample_name)
+                data = Vcf2PrsView.get_prs_many(vcf_file.file, ref_files, sample_name,
+                                                index_file=Vcf2PrsView.get_index_file(validated_data))
 
                 prs_serializer = Vcf2PrsOutputSerializer(data)
                 logger.info("PRS elapsed time=" + str(time.time() - start))
@@ -134,16 +153,55 @@ class Vcf2PrsView(APIView):
                 logger.debug(ex)
                 data = {
                     'error': str(ex),
-                    'samples': self.get_samples(vcfStr)
+                    'samples': self.get_samples(vcf_file.file)
                 }
                 raise NotAcceptable(data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def get_ref_files(validated_data):
+        """
+        Get the paths of the selected PRS reference files.
+        @param validated_data: validated input data
+        @return: dictionary of the result name and reference file path
+        """
+        ref_files = {'breast_cancer_prs': validated_data.get("bc_prs_reference_file", None),
+                     'ovarian_cancer_prs': validated_data.get("oc_prs_reference_file", None),
+                     'prostate_cancer_prs': validated_data.get("pc_prs_reference_file", None)}
+        if all(v is None for v in ref_files.values()):
+            raise ValidationError('No breast, ovarian or prostate cancer PRS reference file provided')
+        return {k: get_reference_file_path(v) for k, v in ref_files.items() if v is not None}
+
+    @staticmethod
+    def get_index_file(validated_data):
+        ''' Get the uploaded VCF index file object, if one is provided. '''
+        vcf_index = validated_data.get("vcf_index", None)
+        return vcf_index.file if vcf_index is not None else None
+
+    @staticmethod
+    def get_prs_many(vcf, ref_files, sample_name, index_file=None):
+        """
+        Calculate the PRS for several reference files reading the VCF records once. Each model
+        is given the VCF header and the records matching its reference file variants.
+        @param vcf: binary file object of the uploaded VCF
+        @param ref_files: dictionary of the result name and reference file path
+        @param sample_name: sample name or None
+        @keyword index_file: binary file object of the tabix or CSI index of the VCF
+        @return: dictionary of the result name and PRS
+        """
+        names = list(ref_files.keys())
+        try:
+            vcfs = read_vcf(vcf, [get_variant_keys(ref_files[n]) for n in names], index_file=index_file)
+        except (OSError, EOFError, zlib.error, UnicodeDecodeError) as ex:
+            # e.g. a corrupt or truncated gzip file
+            raise Vcf2PrsError(f"Unable to read the VCF file: {ex}")
+        return {n: Vcf2PrsView.get_prs(v, ref_files[n], sample_name) for n, v in zip(names, vcfs)}
+
     @staticmethod
     def get_prs(vcfStr, ref_file, sample_name):
         try:
             vcf_stream = io.StringIO(vcfStr)
-            prs = Prs(prs_file=ref_file)
+            prs = prs_models.get(ref_file)
             prs.calculate_prs_from_vcf(vcf_stream, sample_name)
             if sample_name is None and len(prs.raw_PRS) > 1:
                 raise Vcf2PrsError("Please select a sample name to use")
@@ -156,9 +214,15 @@ class Vcf2PrsView(APIView):
         return {'alpha': alpha, 'zscore': zscore, 'percent': Zscore2PercentView.get_percentage(zscore)}
 
     def get_samples(self, vcf_file):
-        """ Get the samples in the VCF file. """
+        """ Get the samples in the VCF file from its header. """
+        from vcf2prs import myPyVCF     # imported on first use, only needed for an error response
         try:
-            fsock = io.StringIO(vcf_file)
+            vcf_stream = open_vcf(vcf_file)
+            try:
+                header = read_header(vcf_stream)
+            finally:
+                vcf_stream.detach()
+            fsock = io.StringIO(header)
             vcf_content = myPyVCF.Reader(fsock)
             samples = vcf_content.samples
             fsock.close()
@@ -167,9 +231,100 @@ class Vcf2PrsView(APIView):
             logging.warn(traceback.format_exc())
 
 
+class Vcf2PrsBatchView(Vcf2PrsView):
+    """
+    Calculate PRS for every sample, or a selected set of samples, in a multi-sample VCF file
+    with a single pass over the file. The results are returned as a table with a row for each
+    sample, as JSON or as CSV (Accept: text/csv or ?format=csv), along with the time taken by
+    each stage, which is also given in the Server-Timing header.
+    """
+    renderer_classes = (JSONRenderer, PrsCsvRenderer, BrowsableAPIRenderer, )
+    serializer_class = Vcf2PrsBatchInputSerializer
+
+    def post(self, request):
+        """
+        Calculate PRS for the samples in a VCF file.
+        """
+        start = time.time()
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated_data = serializer.validated_data
+        vcf_file = validated_data.get("vcf_file")
+        ref_files = Vcf2PrsView.get_ref_files(validated_data)
+        try:
+            rows, timing = Vcf2PrsBatchView.get_prs_batch(vcf_file.file, ref_files,
+                                                          validated_data.get("sample_names", None),
+                                                          index_file=Vcf2PrsView.get_index_file(validated_data))
+        except Vcf2PrsError as ex:
+            logger.debug(ex)
+            raise NotAcceptable({'error': str(ex), 'samples': self.get_samples(vcf_file.file)})
+        timing['total'] = time.time() - start
+        logger.info(f"PRS batch samples={len(rows)}; elapsed time={timing['total']}")
+        response = Response({'samples': rows, 'timing': timing})
+        response['Server-Timing'] = ", ".join(f"{k};dur={v*1000:.1f}" for k, v in timing.items())
+        return response
+
+    @staticmethod
+    def get_prs_batch(vcf, ref_files, sample_names=None, index_file=None):
+        """
+        Calculate the PRS of each sample for several reference files reading the VCF records once.
+        @param vcf: binary file object of the uploaded VCF
+        @param ref_files: dictionary of the result name and reference file path
+        @keyword sample_names: list of sample names, None for all the samples in the VCF
+        @keyword index_file: binary file object of the tabix or CSI index of the VCF
+        @return: list of the PRS of each sample and dictionary of the time taken by each stage
+        """
+        timing = {}
+        start = time.time()
+        names = list(ref_files.keys())
+        try:
+            vcfs = read_vcf(vcf, [get_variant_keys(ref_files[n]) for n in names], samples=sample_names,
+                            index_file=index_file)
+        except ValueError as ex:
+            raise Vcf2PrsError(str(ex))
+        except (OSError, EOFError, zlib.error, UnicodeDecodeError) as ex:
+            raise Vcf2PrsError(f"Unable to read the VCF file: {ex}")
+        timing['read_vcf'] = time.time() - start
+
+        samples = get_sample_names(read_header(vcfs[0])) if vcfs else []
+        if len(samples) == 0:
+            raise Vcf2PrsError("No samples found in the genotype file.")
+        rows = [{'sample': s} for s in samples]
+        for n, v in zip(names, vcfs):
+            start = time.time()
+            vcf_stream = io.StringIO(v)
+            try:
+                prs = prs_models.get(ref_files[n])
+                prs.calculate_prs_from_vcf(vcf_stream, None)
+                prs.calculate_z_from_raw(prs.raw_PRS)
+            finally:
+                vcf_stream.close()
+            if len(prs.z_Score) != len(samples):
+                raise Vcf2PrsError(f"PRS calculated for {len(prs.z_Score)} of {len(samples)} samples")
+            percents = percentiles.get_percentages(prs.z_Score)
+            for row, zscore, percent in zip(rows, prs.z_Score, percents):
+                row[n] = {'alpha': prs.alpha, 'zscore': zscore, 'percent': percent}
+            timing[n] = time.time() - start
+        return rows, timing
+
+
 class ZscoreInputSerializer(serializers.Serializer):
-    ''' Zscore2Percent input. '''
-    zscore = serializers.FloatField(required=True)
+    ''' Zscore2Percent input, a z-score or a list of z-scores. '''
+    zscore = serializers.FloatField(required=False)
+    zscores = serializers.ListField(child=serializers.FloatField(), required=False, allow_empty=False,
+                                    max_length=10000)
+    alphas = serializers.ListField(child=serializers.FloatField(), required=False,
+                                   help_text="Alpha of each score, if the zscores are alpha-adjusted (alpha * z-score)")
+
+    def validate(self, attrs):
+        if ("zscore" in attrs) == ("zscores" in attrs):
+            raise ValidationError("Provide either a zscore or a list of zscores")
+        if "alphas" in attrs:
+            if "zscores" not in attrs or len(attrs["alphas"]) != len(attrs["zscores"]):
+                raise ValidationError("Provide an alpha for each of the zscores")
+            if any(a <= 0 for a in attrs["alphas"]):
+                raise ValidationError("Alphas must be greater than zero")
+        return attrs
 
 
 class ZscoreOutputSerializer(serializers.Serializer):
@@ -177,6 +332,11 @@ class ZscoreOutputSerializer(serializers.Serializer):
     percent = serializers.FloatField(min_value=0, max_value=100, read_only=True)
 
 
+class ZscoresOutputSerializer(serializers.Serializer):
+    """ PRS of each z-score represented as a percentage of those with a lower PRS. """
+    percents = serializers.ListField(child=serializers.FloatField(min_value=0, max_value=100), read_only=True)
+
+
 class Zscore2PercentView(APIView):
     any_perms = ['boadicea_auth.can_risk',
                  'boadicea_auth.commercial_api_breast',
@@ -184,9 +344,10 @@ class Zscore2PercentView(APIView):
                  'boadicea_auth.commercial_api_prostate']   # for RequiredAnyPermission
     renderer_classes = (JSONRenderer, BrowsableAPIRenderer, )
     serializer_class = ZscoreInputSerializer
-    authentication_classes = (SessionAuthentication, BasicAuthentication, TokenAuthentication, )
+    authentication_classes = (SessionAuthentication, CachedBasicAuthentication, CachedTokenAuthentication, )
+    schema = ViewSchema()      # documents the cached authentication, see bws.schema_extensions
     permission_classes = (IsAuthenticated, RequiredAnyPermission)
-    throttle_classes = (BurstRateThrottle, SustainedRateThrottle, EndUserIDRateThrottle)
+    throttle_classes = (CombinedRateThrottle, )
 
     @extend_schema(exclude=True)        # exclude from the swagger docs
     def post(self, request):
@@ -195,17 +356,21 @@ class Zscore2PercentView(APIView):
         """
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid(raise_exception=True):
-            zscore = serializer.validated_data.get("zscore")
+            validated_data = serializer.validated_data
+            if "zscores" in validated_data:
+                percents = percentiles.get_percentages(validated_data["zscores"], validated_data.get("alphas"))
+                return Response(ZscoresOutputSerializer({"percents": percents}).data)
+            zscore = validated_data.get("zscore")
             return Response(ZscoreOutputSerializer({"percent": Zscore2PercentView.get_percentage(zscore)}).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @classmethod
     def get_percentage(cls, load):
         """
-        Use NormalDist to compute cumulative standard normal distribution,
+        Compute the cumulative standard normal distribution, as statistics.NormalDist().cdf,
         https://stackoverflow.com/questions/809362/how-to-calculate-cumulative-normal-distribution
         @param: standard normal PRS which is normally distributed in the general population with mean
         of 0 and standard deviation of 1
         @return: PRS represented as a percentage of those with a lower PRS
         """
-        return NormalDist().cdf(load) * 100.0
+        return percentiles.get_percentage(load)
@@ -0,0 +1,216 @@
+"""
+Read tabix (.tbi) and CSI (.csi) indexes of BGZF compressed, coordinate-sorted VCF files, so
+that only the records at the PRS variant positions are read and decompressed rather than the
+whole file. See the SAMv1 specification for the BGZF, tabix and CSI formats.
+
+© 2026 University of Cambridge
+SPDX-FileCopyrightText: 2026 University of Cambridge
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+import gzip
+import struct
+import zlib
+
+
+TBI_MAGIC = b'TBI\x01'
+CSI_MAGIC = b'CSI\x01'
+BGZF_HEADER = b'\x1f\x8b\x08\x04'
+
+
+class VcfIndexError(Exception):
+    ''' Raised for an index that can not be read or used. '''
+    pass
+
+
+def reg2bins(beg, end, min_shift=14, depth=5):
+    """
+    Get the bins that may overlap a region.
+    @param beg: region start, 0-based
+    @param end: region end, exclusive
+    @keyword min_shift: log2 of the smallest bin size
+    @keyword depth: number of levels of bins
+    @return: list of bin numbers
+    """
+    bins = []
+    end -= 1
+    s = min_shift + depth*3
+    t = 0
+    for level in range(depth+1):
+        bins.extend(range(t + (beg >> s), t + (end >> s) + 1))
+        s -= 3
+        t += 1 << (level*3)
+    return bins
+
+
+class _Reader(object):
+    ''' Read little-endian values from the decompressed index. '''
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def read(self, fmt):
+        values = struct.unpack_from('<' + fmt, self.data, self.offset)
+        self.offset += struct.calcsize('<' + fmt)
+        return values if len(values) > 1 else values[0]
+
+    def read_bytes(self, n):
+        b = self.data[self.offset:self.offset+n]
+        self.offset += n
+        return b
+
+
+class VcfIndex(object):
+    """
+    Tabix or CSI index, the chunks of the compressed file for the bins of each sequence.
+    """
+
+    def __init__(self, names, bins, linear, min_shift, depth):
+        """
+        @param names: sequence names
+        @param bins: for each sequence, dictionary of bin number to list of chunks (virtual offsets)
+        @param linear: for each sequence, list of the minimum virtual offset of each 16kb window
+        @param min_shift: log2 of the smallest bin size
+        @param depth: number of levels of bins
+        """
+        self.names = names
+        self.bins = bins
+        self.linear = linear
+        self.min_shift = min_shift
+        self.depth = depth
+
+    @classmethod
+    def read(cls, fileobj, header=None):
+        """
+        Read a tabix or CSI index.
+        @param fileobj: binary file object of the (BGZF compressed) index
+        @keyword header: VCF header, used for the sequence names if these are not in the index
+        @return: L{VcfIndex}
+        @raise VcfIndexError: if the index can not be read
+        """
+        try:
+            fileobj.seek(0)
+            data = gzip.GzipFile(fileobj=fileobj, mode='rb').read()
+            r = _Reader(data)
+            magic = r.read_bytes(4)
+            if magic == TBI_MAGIC:
+                min_shift, depth = 14, 5
+                n_ref = r.read('i')
+                names = cls._read_names(r)
+            elif magic == CSI_MAGIC:
+                min_shift, depth, l_aux = r.read('iii')
+                aux = _Reader(r.read_bytes(l_aux))
+                names = cls._read_names(aux) if l_aux >= 28 else []
+                n_ref = r.read('i')
+            else:
+                raise VcfIndexError("not a tabix or CSI index")
+            pseudo_bin = ((1 << (depth*3 + 3)) - 1) // 7 + 1
+
+            bins = []
+            linear = []
+            for _i in range(n_ref):
+                ref_bins = {}
+                for _j in range(r.read('i')):
+                    if magic == TBI_MAGIC:
+                        bin_no, n_chunk = r.read('Ii')
+                    else:
+                        bin_no, _loffset, n_chunk = r.read('IQi')
+                    chunks = [r.read('QQ') for _k in range(n_chunk)]
+                    if bin_no != pseudo_bin:
+                        ref_bins[bin_no] = chunks
+                bins.append(ref_bins)
+                linear.append([r.read('Q') for _j in range(r.read('i'))] if magic == TBI_MAGIC else [])
+        except (OSError, EOFError, zlib.error, struct.error) as e:
+            raise VcfIndexError(f"unable to read the index: {e}")
+
+        if len(names) == 0 and header is not None:
+            names = [line.split('ID=', 1)[1].split(',')[0].rstrip('>') for line in header.splitlines()
+                     if line.startswith('##contig=<') and 'ID=' in line]
+        if len(names) != n_ref:
+            raise VcfIndexError("sequence names not found for the index")
+        return cls(names, bins, linear, min_shift, depth)
+
+    @staticmethod
+    def _read_names(r):
+        ''' Read the tabix header fields and the sequence names. '''
+        _fmt, _col_seq, _col_beg, _col_end, _meta, _skip, l_nm = r.read('iiiiiii')
+        return [n.decode('utf-8') for n in r.read_bytes(l_nm).split(b'\x00') if n != b'']
+
+    def get_chunks(self, tid, beg, end):
+        """
+        Get the chunks of the compressed file that may contain records overlapping a region.
+        @param tid: sequence index
+        @param beg: region start, 0-based
+        @param end: region end, exclusive
+        @return: list of (start, end) virtual offsets
+        """
+        ref_bins = self.bins[tid]
+        linear = self.linear[tid]
+        window = beg >> self.min_shift
+        min_offset = linear[min(window, len(linear)-1)] if linear else 0
+        return [c for b in reg2bins(beg, end, self.min_shift, self.depth) for c in ref_bins.get(b, [])
+                if c[1] > min_offset]
+
+
+def merge_chunks(chunks):
+    """
+    Sort and merge overlapping or adjacent chunks.
+    @param chunks: list of (start, end) virtual offsets
+    @return: list of (start, end) virtual offsets
+    """
+    merged = []
+    for beg, end in sorted(chunks):
+        if merged and beg <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((beg, end))
+    return merged
+
+
+def read_bgzf_block(fileobj, coffset):
+    """
+    Read and decompress a BGZF block.
+    @param fileobj: binary file object of the BGZF file
+    @param coffset: offset of the block in the compressed file
+    @return: decompressed data and the offset of the next block
+    """
+    fileobj.seek(coffset)
+    header = fileobj.read(12)
+    if len(header) < 12 or header[:4] != BGZF_HEADER:
+        raise VcfIndexError(f"no BGZF block at offset {coffset}")
+    xlen = struct.unpack('<H', header[10:12])[0]
+    extra = fileobj.read(xlen)
+    bsize = None
+    i = 0
+    while i + 4 <= len(extra):
+        slen = struct.unpack('<H', extra[i+2:i+4])[0]
+        if extra[i:i+2] == b'BC' and slen == 2:
+            bsize = struct.unpack('<H', extra[i+4:i+6])[0]
+        i += 4 + slen
+    if bsize is None:
+        raise VcfIndexError(f"no BGZF block size at offset {coffset}")
+    cdata = fileobj.read(bsize - xlen - 19)
+    return zlib.decompress(cdata, -15), coffset + bsize + 1
+
+
+def read_chunks(fileobj, chunks):
+    """
+    Read the records in chunks of a BGZF file.
+    @param fileobj: binary file object of the BGZF file
+    @param chunks: list of (start, end) virtual offsets, in file order and not overlapping
+    @return: generator of record lines
+    """
+    last = (None, None, None)       # last block read, shared by adjacent chunks
+    for vbeg, vend in chunks:
+        coffset, ubeg = vbeg >> 16, vbeg & 0xffff
+        cend, uend = vend >> 16, vend & 0xffff
+        data = []
+        while coffset <= cend:
+            if last[0] != coffset:
+                last = (coffset,) + read_bgzf_block(fileobj, coffset)
+            _coffset, block, next_coffset = last
+            data.append(block[ubeg:uend] if coffset == cend else block[ubeg:])
+            ubeg = 0
+            coffset = next_coffset
+        yield from b"".join(data).splitlines(keepends=True)